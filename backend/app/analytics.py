@@ -0,0 +1,160 @@
+"""
+Sales analytics: top products, ABC classification, revenue by category and margins
+
+Each source is pulled as NumPy columns with one streamed query:
+detalle_venta joined to venta for the date range (plus archived months, see
+archive.py), lote for purchase costs and producto_categoria for categories. Everything else is group-by arithmetic on
+the arrays (np.unique + np.bincount), and results are cached per date range
+and `venta` table version, which batch sales dated before today and archive
+runs bump.
+"""
+
+from datetime import date
+
+import numpy as np
+from sqlalchemy import select, cast, Integer, func
+from sqlalchemy.orm import Session
+
+from . import archive, crud
+from .cache import TTLCache, MISSING
+from .columnar import stream_columns
+from .models import Venta, DetalleVenta, Lote, ProductoCategoria, Categoria, Producto
+
+
+# Cumulative revenue share limits for the A and B classes (rest is C)
+LIMITE_A = 0.80
+LIMITE_B = 0.95
+TOP_N = 10
+
+# Ranges that include today still receive sales, so they expire sooner
+_cache = TTLCache(maxsize=64, ttl=3600)
+TTL_RANGO_ABIERTO = 60
+
+
+def cargar_detalles(db: Session, desde: date, hasta: date):
+    """(id_producto, cantidad, subtotal in cents) for every sale line in the range,
+    hot and archived"""
+    id_min, id_max = crud.get_rango_ids_venta(db, desde, hasta)
+    stmt = select(
+        DetalleVenta.id_producto,
+        DetalleVenta.cantidad,
+        cast(func.round(DetalleVenta.subtotal * 100), Integer)
+    ).join(Venta, Venta.id_venta == DetalleVenta.id_venta).where(
+        Venta.fecha_venta.between(desde, hasta),
+        DetalleVenta.id_venta.between(id_min, id_max)
+    )
+    productos, cantidades, subtotales = stream_columns(db, stmt, (np.int64, np.int64, np.int64))
+    _, productos_archivo, cantidades_archivo, subtotales_archivo = archive.cargar_detalles(db, desde, hasta)
+    return (
+        np.concatenate([productos, productos_archivo]),
+        np.concatenate([cantidades, cantidades_archivo]),
+        np.concatenate([subtotales, subtotales_archivo]),
+    )
+
+
+def cargar_costos(db: Session):
+    """(id_producto, cantidad_recibida, costo_unitario_compra) per lot"""
+    stmt = select(Lote.id_producto, Lote.cantidad_recibida, Lote.costo_unitario_compra)
+    return stream_columns(db, stmt, (np.int64, np.float64, np.float64))
+
+
+def cargar_categorias(db: Session):
+    stmt = select(ProductoCategoria.id_producto, ProductoCategoria.id_categoria)
+    return stream_columns(db, stmt, (np.int64, np.int64))
+
+
+def calcular_resumen(producto_ids, cantidades, subtotales, lote_productos, lote_cantidades, lote_costos,
+                     categoria_productos, categoria_ids, top_n: int = TOP_N):
+    """Pure NumPy computation over the columnar inputs (amounts in cents)"""
+    productos, inverso = np.unique(producto_ids, return_inverse=True)
+    n = len(productos)
+    cantidad = np.bincount(inverso, weights=cantidades, minlength=n)
+    ingresos = np.bincount(inverso, weights=subtotales, minlength=n)
+
+    # Weighted average lot cost per sold product (NaN when it has no lots)
+    costo_unitario = np.full(n, np.nan)
+    if len(lote_productos) and n:
+        posiciones = np.minimum(np.searchsorted(productos, lote_productos), n - 1)
+        con_venta = productos[posiciones] == lote_productos
+        unidades = np.bincount(posiciones[con_venta], weights=lote_cantidades[con_venta], minlength=n)
+        valor = np.bincount(
+            posiciones[con_venta], weights=(lote_cantidades * lote_costos)[con_venta], minlength=n
+        )
+        con_lotes = unidades > 0
+        costo_unitario[con_lotes] = valor[con_lotes] / unidades[con_lotes]
+    costo = cantidad * costo_unitario * 100  # cents
+    con_costo = ~np.isnan(costo)
+    margen = np.where(con_costo, ingresos - np.nan_to_num(costo), np.nan)
+
+    # ABC on the share of revenue accumulated before each product (descending
+    # order), so the product that crosses a limit still belongs to the upper class
+    orden = np.argsort(-ingresos, kind="stable")
+    total = ingresos.sum()
+    ordenados = ingresos[orden]
+    previo = (np.cumsum(ordenados) - ordenados) / total if total else np.zeros(n)
+    clase = np.empty(n, dtype="<U1")
+    clase[orden] = np.where(previo < LIMITE_A, "A", np.where(previo < LIMITE_B, "B", "C"))
+
+    # Revenue and margin by category (a product in several categories counts in each)
+    categorias = []
+    if len(categoria_productos) and n:
+        posiciones = np.minimum(np.searchsorted(productos, categoria_productos), n - 1)
+        con_venta = productos[posiciones] == categoria_productos
+        ids, inverso_cat = np.unique(categoria_ids[con_venta], return_inverse=True)
+        filas = posiciones[con_venta]
+        ingresos_cat = np.bincount(inverso_cat, weights=ingresos[filas], minlength=len(ids))
+        margen_cat = np.bincount(inverso_cat, weights=np.nan_to_num(margen[filas]), minlength=len(ids))
+        categorias = [
+            {"id_categoria": int(i), "ingresos": float(r) / 100, "margen": float(m) / 100}
+            for i, r, m in zip(ids, ingresos_cat, margen_cat)
+        ]
+        categorias.sort(key=lambda c: c["ingresos"], reverse=True)
+
+    top = orden[:top_n]
+    return {
+        "ingresos_total": float(total) / 100,
+        "costo_total": float(np.nansum(costo)) / 100,
+        "margen_total": float(np.nansum(margen)) / 100,
+        "ingresos_sin_costo": float(ingresos[~con_costo].sum()) / 100,
+        "productos_vendidos": int(n),
+        "abc": {c: int((clase == c).sum()) for c in ("A", "B", "C")},
+        "top_productos": [
+            {
+                "id_producto": int(productos[i]),
+                "cantidad": int(cantidad[i]),
+                "ingresos": float(ingresos[i]) / 100,
+                "margen": None if np.isnan(margen[i]) else float(margen[i]) / 100,
+                "clase_abc": str(clase[i]),
+            }
+            for i in top
+        ],
+        "categorias": categorias,
+    }
+
+
+def get_resumen_ventas(db: Session, desde: date, hasta: date, top_n: int = TOP_N):
+    key = (desde, hasta, top_n, crud.get_version_tabla(db, "venta"))
+    resumen = _cache.get(key)
+    if resumen is not MISSING:
+        return resumen
+
+    resumen = calcular_resumen(
+        *cargar_detalles(db, desde, hasta),
+        *cargar_costos(db),
+        *cargar_categorias(db),
+        top_n=top_n,
+    )
+    resumen.update(desde=desde, hasta=hasta)
+
+    # Names only for the handful of ids shown
+    nombres = dict(db.query(Producto.id_producto, Producto.nombre_comercial).filter(
+        Producto.id_producto.in_([p["id_producto"] for p in resumen["top_productos"]])
+    ).all()) if resumen["top_productos"] else {}
+    for producto in resumen["top_productos"]:
+        producto["nombre_comercial"] = nombres.get(producto["id_producto"])
+    categorias = dict(db.query(Categoria.id_categoria, Categoria.nombre_categoria).all())
+    for categoria in resumen["categorias"]:
+        categoria["nombre_categoria"] = categorias.get(categoria["id_categoria"])
+
+    _cache.set(key, resumen, ttl=TTL_RANGO_ABIERTO if hasta >= date.today() else None)
+    return resumen
@@ -1,10 +1,19 @@
-from fastapi import FastAPI, Depends, HTTPException
+from fastapi import FastAPI, Depends, HTTPException, Header, Response, Request, Query
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from typing import List
-
-from . import crud, schemas
-from .database import SessionLocal, engine
+from typing import List, Optional
+from datetime import date, datetime
+
+from . import crud, schemas, replenishment, analytics, costing, conditional, pricing, promotions, reservations
+from .sequences import SerieDesconocidaError, NumeroReservadoError
+from .serialization import FastJSONResponse, filas, a_json
+from .compression import CompressionMiddleware, PayloadComprimido
+from .cache import TTLCache, MISSING
+from .events import event_bus
+from .facets import indice_facetas
+from .barcodes import escaner_codigos, es_gtin, TIPOS_GTIN, CodigoInvalidoError
+from .database import SessionLocal, ReplicaSessionLocal, replica_engine, engine, REPLICA_STICKY_SECONDS
 from .models import Base
 
 # Create tables
@@ -20,18 +29,108 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag"],
 )
+app.add_middleware(CompressionMiddleware)
 
 
 # Dependency
-def get_db():
-    db = SessionLocal()
+# Reads (GET/HEAD) go to the read replica when one is configured, writes to
+# the primary. After a successful write the client gets a short-lived cookie
+# that keeps its reads on the primary until the replica has caught up.
+LECTURA_METHODS = ("GET", "HEAD")
+PRIMARIO_COOKIE = "db_primario"
+
+def get_db(request: Request):
+    usar_replica = (
+        replica_engine is not None
+        and request.method in LECTURA_METHODS
+        and PRIMARIO_COOKIE not in request.cookies
+    )
+    db = ReplicaSessionLocal() if usar_replica else SessionLocal()
     try:
         yield db
     finally:
         db.close()
 
 
+if replica_engine is not None:
+    @app.middleware("http")
+    async def read_your_writes(request: Request, call_next):
+        response = await call_next(request)
+        if request.method not in LECTURA_METHODS and response.status_code < 400:
+            response.set_cookie(PRIMARIO_COOKIE, "1", max_age=REPLICA_STICKY_SECONDS, httponly=True, samesite="lax")
+        return response
+
+
+# Conditional GET. The version is read before the data, so a write committed
+# in between leaves an ETag older than the body and the next request refetches
+def _etag_registro(db: Session, tabla: str, id_registro: int):
+    return conditional.etag(tabla, crud.get_version_registro(db, tabla, id_registro), id_registro)
+
+
+def _etag_tabla(db: Session, tabla: str):
+    return conditional.etag(tabla, crud.get_version_tabla(db, tabla))
+
+
+# Product details include names from these tables, so their changes count too
+REFERENCIAS_PRODUCTO = ("categoria", "presentacion", "componente")
+
+
+def _etag_producto(db: Session, producto_id: int = None):
+    if producto_id is None:
+        version = crud.get_version_tablas(db, ("producto", *REFERENCIAS_PRODUCTO))
+        return conditional.etag("producto-detalle", version)
+    version = max(
+        crud.get_version_registro(db, "producto", producto_id),
+        crud.get_version_tablas(db, REFERENCIAS_PRODUCTO)
+    )
+    return conditional.etag("producto-detalle", version, producto_id)
+
+
+def _condicional(request: Request, response: Response, etag: str):
+    """Set the validators on the response; returns a 304 if the client's copy is current"""
+    response.headers.update(conditional.cabeceras(etag))
+    return conditional.no_modificado(request, etag)
+
+
+# Serialized (and compressed) list bodies per URL, valid while the ETag matches
+_listas = TTLCache(maxsize=256, ttl=3600)
+
+
+def _lista_condicional(request: Request, db: Session, tabla: str, cargar, etag: str = None, serializar=filas):
+    etag = etag or _etag_tabla(db, tabla)
+    no_modificado = conditional.no_modificado(request, etag)
+    if no_modificado:
+        return no_modificado
+    clave = (request.url.path, request.url.query)
+    entrada = _listas.get(clave)
+    if entrada is MISSING or entrada[0] != etag:
+        entrada = (etag, PayloadComprimido(a_json(serializar(cargar()))))
+        _listas.set(clave, entrada)
+    return entrada[1].respuesta(request, conditional.cabeceras(etag))
+
+
+def _include(include: Optional[str], opciones: dict):
+    """Parse include=a,b for a list endpoint; 400 on unknown options"""
+    nombres = [nombre.strip() for nombre in (include or "").split(",") if nombre.strip()]
+    desconocidos = [nombre for nombre in nombres if nombre not in opciones]
+    if desconocidos:
+        raise HTTPException(
+            status_code=400,
+            detail=f"include no válido: {', '.join(desconocidos)} (opciones: {', '.join(opciones)})"
+        )
+    return list(dict.fromkeys(nombres))
+
+
+def _enteros(valor: Optional[str], nombre: str):
+    """Parse a=1,2,3 into ints; 400 otherwise"""
+    try:
+        return [int(parte) for parte in (valor or "").split(",") if parte.strip()]
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"{nombre} debe ser una lista de enteros separados por comas")
+
+
 # ==================== ROOT ====================
 @app.get("/")
 def root():
@@ -78,7 +177,10 @@ def delete_usuario(usuario_id: int, db: Session = Depends(get_db)):
 
 # ==================== ROLES ====================
 @app.get("/api/roles/", response_model=List[schemas.Rol])
-def get_roles(db: Session = Depends(get_db)):
+def get_roles(request: Request, response: Response, db: Session = Depends(get_db)):
+    no_modificado = _condicional(request, response, _etag_tabla(db, "rol"))
+    if no_modificado:
+        return no_modificado
     return crud.get_roles(db)
 
 
@@ -89,12 +191,33 @@ def create_rol(rol: schemas.RolCreate, db: Session = Depends(get_db)):
 
 # ==================== CLIENTES ====================
 @app.get("/api/clientes/", response_model=List[schemas.Cliente])
-def get_clientes(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+def get_clientes(request: Request, response: Response, skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+    no_modificado = _condicional(request, response, _etag_tabla(db, "cliente"))
+    if no_modificado:
+        return no_modificado
     return crud.get_clientes(db, skip=skip, limit=limit)
 
 
+@app.get("/api/clientes/search/", response_model=List[schemas.Cliente])
+def search_clientes(doc: str, limit: int = 10, db: Session = Depends(get_db)):
+    if not doc or limit < 1:
+        raise HTTPException(status_code=400, detail="Parámetros de búsqueda inválidos")
+    return crud.search_clientes_by_doc(db, doc, limit)
+
+
+@app.get("/api/clientes/doc/{nro_doc}", response_model=schemas.Cliente)
+def get_cliente_by_doc(nro_doc: str, db: Session = Depends(get_db)):
+    cliente = crud.get_cliente_by_doc(db, nro_doc)
+    if not cliente:
+        raise HTTPException(status_code=404, detail="Cliente no encontrado")
+    return cliente
+
+
 @app.get("/api/clientes/{cliente_id}", response_model=schemas.Cliente)
-def get_cliente(cliente_id: int, db: Session = Depends(get_db)):
+def get_cliente(cliente_id: int, request: Request, response: Response, db: Session = Depends(get_db)):
+    no_modificado = _condicional(request, response, _etag_registro(db, "cliente", cliente_id))
+    if no_modificado:
+        return no_modificado
     db_cliente = crud.get_cliente(db, cliente_id)
     if not db_cliente:
         raise HTTPException(status_code=404, detail="Cliente no encontrado")
@@ -103,10 +226,10 @@ def get_cliente(cliente_id: int, db: Session = Depends(get_db)):
 
 @app.post("/api/clientes/", response_model=schemas.Cliente, status_code=201)
 def create_cliente(cliente: schemas.ClienteCreate, db: Session = Depends(get_db)):
-    db_cliente = crud.get_cliente_by_doc(db, cliente.nro_doc)
-    if db_cliente:
+    db_cliente = crud.create_cliente(db, cliente)
+    if db_cliente is None:
         raise HTTPException(status_code=400, detail="Cliente con ese documento ya existe")
-    return crud.create_cliente(db, cliente)
+    return db_cliente
 
 
 @app.put("/api/clientes/{cliente_id}", response_model=schemas.Cliente)
@@ -127,12 +250,18 @@ def delete_cliente(cliente_id: int, db: Session = Depends(get_db)):
 
 # ==================== PROVEEDORES ====================
 @app.get("/api/proveedores/", response_model=List[schemas.Proveedor])
-def get_proveedores(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+def get_proveedores(request: Request, response: Response, skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+    no_modificado = _condicional(request, response, _etag_tabla(db, "proveedor"))
+    if no_modificado:
+        return no_modificado
     return crud.get_proveedores(db, skip=skip, limit=limit)
 
 
 @app.get("/api/proveedores/{proveedor_id}", response_model=schemas.Proveedor)
-def get_proveedor(proveedor_id: int, db: Session = Depends(get_db)):
+def get_proveedor(proveedor_id: int, request: Request, response: Response, db: Session = Depends(get_db)):
+    no_modificado = _condicional(request, response, _etag_registro(db, "proveedor", proveedor_id))
+    if no_modificado:
+        return no_modificado
     db_proveedor = crud.get_proveedor(db, proveedor_id)
     if not db_proveedor:
         raise HTTPException(status_code=404, detail="Proveedor no encontrado")
@@ -162,7 +291,10 @@ def delete_proveedor(proveedor_id: int, db: Session = Depends(get_db)):
 
 # ==================== CARGOS ====================
 @app.get("/api/cargos/", response_model=List[schemas.Cargo])
-def get_cargos(db: Session = Depends(get_db)):
+def get_cargos(request: Request, response: Response, db: Session = Depends(get_db)):
+    no_modificado = _condicional(request, response, _etag_tabla(db, "cargo"))
+    if no_modificado:
+        return no_modificado
     return crud.get_cargos(db)
 
 
@@ -183,9 +315,9 @@ def create_contacto_proveedor(contacto: schemas.ContactoProveedorCreate, db: Ses
 
 
 # ==================== PRODUCTOS ====================
-@app.get("/api/productos/", response_model=List[schemas.Producto])
-def get_productos(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    return crud.get_productos(db, skip=skip, limit=limit)
+@app.get("/api/productos/", response_model=List[schemas.Producto], response_class=FastJSONResponse)
+def get_productos(request: Request, skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+    return _lista_condicional(request, db, "producto", lambda: crud.get_productos(db, skip=skip, limit=limit))
 
 
 @app.get("/api/productos/search/")
@@ -193,9 +325,112 @@ def search_productos(q: str, db: Session = Depends(get_db)):
     return crud.search_productos(db, q)
 
 
-@app.get("/api/productos/{producto_id}", response_model=schemas.Producto)
-def get_producto(producto_id: int, db: Session = Depends(get_db)):
-    db_producto = crud.get_producto(db, producto_id)
+@app.get("/api/productos/detalle", response_model=List[schemas.ProductoCompleto], response_class=FastJSONResponse)
+def get_productos_detalle(request: Request, skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+    # Same page as /api/productos/ with categories, presentations and components
+    return _lista_condicional(
+        request, db, "producto", lambda: crud.get_productos_detalle(db, skip=skip, limit=limit),
+        etag=_etag_producto(db), serializar=list
+    )
+
+
+@app.get("/api/productos/facetas", response_model=schemas.FacetasProducto, response_class=FastJSONResponse)
+def get_facetas_productos(
+    categoria: Optional[str] = None,
+    presentacion: Optional[str] = None,
+    componente: Optional[str] = None,
+    requiere_receta: Optional[bool] = None,
+    afecta_igv: Optional[bool] = None,
+    db: Session = Depends(get_db)
+):
+    # ?categoria=1,2&componente=5&requiere_receta=false — values of one facet
+    # are ORed, facets ANDed; each facet is counted under the others' filters
+    return indice_facetas.consultar(db, {
+        "categoria": _enteros(categoria, "categoria"),
+        "presentacion": _enteros(presentacion, "presentacion"),
+        "componente": _enteros(componente, "componente"),
+        "requiere_receta": requiere_receta,
+        "afecta_igv": afecta_igv,
+    })
+
+
+PRECIOS_MAX = 5000
+
+
+@app.post("/api/productos/precios", response_model=schemas.ResultadoPrecios)
+def actualizar_precios(cambio: schemas.ActualizacionPrecios, db: Session = Depends(get_db)):
+    # Distributor price lists and "+5 % on a category" in one transaction,
+    # recorded in the price history
+    if not cambio.reglas and not cambio.precios:
+        raise HTTPException(status_code=400, detail="Indique reglas o precios")
+    if len(cambio.precios) > PRECIOS_MAX:
+        raise HTTPException(status_code=400, detail=f"Máximo {PRECIOS_MAX} precios por solicitud")
+    for regla in cambio.reglas:
+        if regla.id_categoria is None and regla.id_componente is None:
+            raise HTTPException(status_code=400, detail="Cada regla necesita id_categoria o id_componente")
+        if regla.porcentaje <= -100:
+            raise HTTPException(status_code=400, detail="porcentaje debe ser mayor que -100")
+    if any(precio.precio_venta < 0 for precio in cambio.precios):
+        raise HTTPException(status_code=400, detail="precio_venta no puede ser negativo")
+    if cambio.precios:
+        inexistentes = crud.get_productos_inexistentes(db, [precio.id_producto for precio in cambio.precios])
+        if inexistentes:
+            raise HTTPException(
+                status_code=400, detail=f"Productos no encontrados: {', '.join(map(str, inexistentes))}"
+            )
+    return crud.actualizar_precios(db, cambio)
+
+
+@app.get("/api/productos/{producto_id}/precio", response_model=schemas.HistorialPrecio)
+def get_precio_producto(producto_id: int, fecha: Optional[datetime] = None, db: Session = Depends(get_db)):
+    # Price in effect at `fecha` (default: now), e.g. to check an old receipt
+    precio = crud.get_precio_en(db, producto_id, fecha or datetime.now())
+    if not precio:
+        raise HTTPException(status_code=404, detail="Sin precio registrado para esa fecha")
+    return precio
+
+
+@app.get("/api/productos/{producto_id}/precios", response_model=List[schemas.HistorialPrecio])
+def get_historial_precios(producto_id: int, db: Session = Depends(get_db)):
+    return crud.get_historial_precios(db, producto_id)
+
+
+@app.get("/api/productos/{producto_id}/codigos", response_model=List[schemas.CodigoBarras], response_class=FastJSONResponse)
+def get_codigos_barras(producto_id: int, db: Session = Depends(get_db)):
+    return filas(crud.get_codigos_barras(db, producto_id))
+
+
+@app.post("/api/productos/{producto_id}/codigos", response_model=schemas.CodigoBarras, status_code=201)
+def create_codigo_barras(producto_id: int, codigo: schemas.CodigoBarrasCreate, db: Session = Depends(get_db)):
+    valor = codigo.codigo.strip()
+    if not valor or len(valor) > 50:
+        raise HTTPException(status_code=400, detail="Código inválido")
+    if valor.isdigit() and len(valor) in TIPOS_GTIN and not es_gtin(valor):
+        raise HTTPException(status_code=400, detail="Dígito verificador inválido")
+    if not crud.get_producto(db, producto_id):
+        raise HTTPException(status_code=404, detail="Producto no encontrado")
+    existente = crud.get_codigo_barras(db, valor)
+    if existente:
+        raise HTTPException(status_code=400, detail=f"Código ya registrado (producto {existente.id_producto})")
+    db_codigo = crud.create_codigo_barras(db, producto_id, valor)
+    if db_codigo is None:
+        raise HTTPException(status_code=400, detail="Código ya registrado")
+    return db_codigo
+
+
+@app.delete("/api/productos/{producto_id}/codigos/{codigo}")
+def delete_codigo_barras(producto_id: int, codigo: str, db: Session = Depends(get_db)):
+    if not crud.delete_codigo_barras(db, producto_id, codigo):
+        raise HTTPException(status_code=404, detail="Código no encontrado")
+    return {"message": "Código eliminado"}
+
+
+@app.get("/api/productos/{producto_id}", response_model=schemas.ProductoCompleto)
+def get_producto(producto_id: int, request: Request, response: Response, db: Session = Depends(get_db)):
+    no_modificado = _condicional(request, response, _etag_producto(db, producto_id))
+    if no_modificado:
+        return no_modificado
+    db_producto = crud.get_producto_detalle(db, producto_id)
     if not db_producto:
         raise HTTPException(status_code=404, detail="Producto no encontrado")
     return db_producto
@@ -226,9 +461,9 @@ def delete_producto(producto_id: int, db: Session = Depends(get_db)):
 
 
 # ==================== CATEGORIAS ====================
-@app.get("/api/categorias/", response_model=List[schemas.Categoria])
-def get_categorias(db: Session = Depends(get_db)):
-    return crud.get_categorias(db)
+@app.get("/api/categorias/", response_model=List[schemas.Categoria], response_class=FastJSONResponse)
+def get_categorias(request: Request, db: Session = Depends(get_db)):
+    return _lista_condicional(request, db, "categoria", lambda: crud.get_categorias(db))
 
 
 @app.post("/api/categorias/", response_model=schemas.Categoria, status_code=201)
@@ -245,9 +480,9 @@ def delete_categoria(categoria_id: int, db: Session = Depends(get_db)):
 
 
 # ==================== PRESENTACIONES ====================
-@app.get("/api/presentaciones/", response_model=List[schemas.Presentacion])
-def get_presentaciones(db: Session = Depends(get_db)):
-    return crud.get_presentaciones(db)
+@app.get("/api/presentaciones/", response_model=List[schemas.Presentacion], response_class=FastJSONResponse)
+def get_presentaciones(request: Request, db: Session = Depends(get_db)):
+    return _lista_condicional(request, db, "presentacion", lambda: crud.get_presentaciones(db))
 
 
 @app.post("/api/presentaciones/", response_model=schemas.Presentacion, status_code=201)
@@ -264,9 +499,9 @@ def delete_presentacion(presentacion_id: int, db: Session = Depends(get_db)):
 
 
 # ==================== COMPONENTES ====================
-@app.get("/api/componentes/", response_model=List[schemas.Componente])
-def get_componentes(db: Session = Depends(get_db)):
-    return crud.get_componentes(db)
+@app.get("/api/componentes/", response_model=List[schemas.Componente], response_class=FastJSONResponse)
+def get_componentes(request: Request, db: Session = Depends(get_db)):
+    return _lista_condicional(request, db, "componente", lambda: crud.get_componentes(db))
 
 
 @app.post("/api/componentes/", response_model=schemas.Componente, status_code=201)
@@ -282,6 +517,49 @@ def delete_componente(componente_id: int, db: Session = Depends(get_db)):
     return {"message": "Componente eliminado"}
 
 
+# ==================== ESCANEO ====================
+@app.get("/api/scan/{codigo:path}", response_model=schemas.Escaneo)
+def escanear(codigo: str, db: Session = Depends(get_db)):
+    """Product, lot and stock for a scanned EAN/UPC, GS1 element string
+    (DataMatrix, GS1-128; URL-encode the GS separators) or codigo_interno"""
+    try:
+        escaneo = escaner_codigos.escanear(db, codigo)
+    except CodigoInvalidoError as e:
+        raise HTTPException(status_code=400, detail=f"Código inválido: {e}")
+    if escaneo is None:
+        raise HTTPException(status_code=404, detail="Código no registrado")
+    return escaneo
+
+
+# ==================== PROMOCIONES ====================
+@app.get("/api/promociones/", response_model=List[schemas.Promocion], response_class=FastJSONResponse)
+def get_promociones(activas: bool = False, db: Session = Depends(get_db)):
+    """All promotions, or with activas=true only those in effect today"""
+    return filas(crud.get_promociones(db, activas=activas))
+
+
+@app.post("/api/promociones/", response_model=schemas.Promocion, status_code=201)
+def create_promocion(promocion: schemas.PromocionCreate, db: Session = Depends(get_db)):
+    error = promotions.validar(promocion)
+    if error:
+        raise HTTPException(status_code=400, detail=error)
+    if promocion.id_producto is not None and not crud.get_producto(db, promocion.id_producto):
+        raise HTTPException(status_code=400, detail="Producto no encontrado")
+    if promocion.id_categoria is not None and not crud.get_categoria(db, promocion.id_categoria):
+        raise HTTPException(status_code=400, detail="Categoría no encontrada")
+    if promocion.id_componente is not None and not crud.get_componente(db, promocion.id_componente):
+        raise HTTPException(status_code=400, detail="Componente no encontrado")
+    return crud.create_promocion(db, promocion)
+
+
+@app.delete("/api/promociones/{promocion_id}")
+def delete_promocion(promocion_id: int, db: Session = Depends(get_db)):
+    db_promocion = crud.delete_promocion(db, promocion_id)
+    if not db_promocion:
+        raise HTTPException(status_code=404, detail="Promoción no encontrada")
+    return {"message": "Promoción eliminada"}
+
+
 # ==================== INVENTARIO ====================
 @app.get("/api/inventario/", response_model=List[schemas.Inventario])
 def get_inventarios(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
@@ -306,7 +584,7 @@ def create_inventario(inventario: schemas.InventarioCreate, db: Session = Depend
     return crud.create_inventario(db, inventario)
 
 
-@app.patch("/api/inventario/{inventario_id}/stock")
+@app.patch("/api/inventario/{inventario_id}/stock", response_model=schemas.InventarioSimple)
 def update_stock(inventario_id: int, update: schemas.InventarioUpdate, db: Session = Depends(get_db)):
     db_inventario = crud.update_inventario_stock(db, inventario_id, update.stock_actual)
     if not db_inventario:
@@ -315,9 +593,9 @@ def update_stock(inventario_id: int, update: schemas.InventarioUpdate, db: Sessi
 
 
 # ==================== LOTES ====================
-@app.get("/api/lotes/", response_model=List[schemas.Lote])
+@app.get("/api/lotes/", response_model=List[schemas.Lote], response_class=FastJSONResponse)
 def get_lotes(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    return crud.get_lotes(db, skip=skip, limit=limit)
+    return FastJSONResponse(filas(crud.get_lotes(db, skip=skip, limit=limit)))
 
 
 @app.post("/api/lotes/", response_model=schemas.Lote, status_code=201)
@@ -326,9 +604,9 @@ def create_lote(lote: schemas.LoteCreate, db: Session = Depends(get_db)):
 
 
 # ==================== UBICACIONES ====================
-@app.get("/api/ubicaciones/", response_model=List[schemas.UbicacionEstante])
-def get_ubicaciones(db: Session = Depends(get_db)):
-    return crud.get_ubicaciones(db)
+@app.get("/api/ubicaciones/", response_model=List[schemas.UbicacionEstante], response_class=FastJSONResponse)
+def get_ubicaciones(request: Request, db: Session = Depends(get_db)):
+    return _lista_condicional(request, db, "ubicacion_estante", lambda: crud.get_ubicaciones(db))
 
 
 @app.post("/api/ubicaciones/", response_model=schemas.UbicacionEstante, status_code=201)
@@ -337,9 +615,22 @@ def create_ubicacion(ubicacion: schemas.UbicacionEstanteCreate, db: Session = De
 
 
 # ==================== PEDIDOS ====================
-@app.get("/api/pedidos/", response_model=List[schemas.Pedido])
-def get_pedidos(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    return crud.get_pedidos(db, skip=skip, limit=limit)
+def filtros_pedidos(estado: Optional[int] = None, proveedor: Optional[int] = None,
+                    desde: Optional[date] = None, hasta: Optional[date] = None, q: Optional[str] = None):
+    return {"id_estado_pedido": estado, "id_proveedor": proveedor, "desde": desde, "hasta": hasta, "texto": q}
+
+
+@app.get("/api/pedidos/", response_model=List[schemas.PedidoLista], response_class=FastJSONResponse)
+def get_pedidos(skip: int = 0, limit: int = 100, include: Optional[str] = None,
+                filtros: dict = Depends(filtros_pedidos), db: Session = Depends(get_db)):
+    # include=proveedor,estado
+    include = _include(include, crud.INCLUDE_PEDIDOS)
+    return FastJSONResponse(filas(crud.get_pedidos(db, skip=skip, limit=limit, include=include, **filtros)))
+
+
+@app.get("/api/pedidos/resumen", response_model=List[schemas.ResumenEstadoPedido])
+def get_resumen_pedidos(filtros: dict = Depends(filtros_pedidos), db: Session = Depends(get_db)):
+    return filas(crud.get_resumen_pedidos(db, **filtros))
 
 
 @app.get("/api/pedidos/{pedido_id}", response_model=schemas.PedidoDetalle)
@@ -367,10 +658,34 @@ def update_pedido_estado(pedido_id: int, update: schemas.PedidoUpdate, db: Sessi
     return db_pedido
 
 
+# ==================== REPOSICION ====================
+@app.get("/api/reposicion/sugerencias", response_model=List[schemas.SugerenciaReposicion])
+def get_sugerencias_reposicion(
+    lead_time_dias: int = replenishment.LEAD_TIME_DIAS,
+    dias_cobertura: int = replenishment.DIAS_COBERTURA,
+    db: Session = Depends(get_db)
+):
+    return replenishment.get_sugerencias(db, lead_time_dias=lead_time_dias, dias_cobertura=dias_cobertura)
+
+
+@app.post("/api/reposicion/pedidos", response_model=schemas.PedidosReposicion, status_code=201)
+def generar_pedidos_reposicion(
+    lead_time_dias: int = replenishment.LEAD_TIME_DIAS,
+    dias_cobertura: int = replenishment.DIAS_COBERTURA,
+    db: Session = Depends(get_db)
+):
+    # TODO: Get usuario_id from auth token
+    usuario_id = 1005  # Hardcoded for now
+    pedidos, sugerencias = replenishment.generar_pedidos_borrador(
+        db, usuario_id, lead_time_dias=lead_time_dias, dias_cobertura=dias_cobertura
+    )
+    return {"pedidos": pedidos, "sugerencias": sugerencias}
+
+
 # ==================== ESTADOS PEDIDO ====================
-@app.get("/api/estados-pedido/", response_model=List[schemas.EstadoPedido])
-def get_estados_pedido(db: Session = Depends(get_db)):
-    return crud.get_estados_pedido(db)
+@app.get("/api/estados-pedido/", response_model=List[schemas.EstadoPedido], response_class=FastJSONResponse)
+def get_estados_pedido(request: Request, db: Session = Depends(get_db)):
+    return _lista_condicional(request, db, "estado_pedido", lambda: crud.get_estados_pedido(db))
 
 
 @app.post("/api/estados-pedido/", response_model=schemas.EstadoPedido, status_code=201)
@@ -379,9 +694,9 @@ def create_estado_pedido(estado: schemas.EstadoPedidoCreate, db: Session = Depen
 
 
 # ==================== MOTIVOS PEDIDO ====================
-@app.get("/api/motivos-pedido/", response_model=List[schemas.MotivoPedido])
-def get_motivos_pedido(db: Session = Depends(get_db)):
-    return crud.get_motivos_pedido(db)
+@app.get("/api/motivos-pedido/", response_model=List[schemas.MotivoPedido], response_class=FastJSONResponse)
+def get_motivos_pedido(request: Request, db: Session = Depends(get_db)):
+    return _lista_condicional(request, db, "motivo_pedido", lambda: crud.get_motivos_pedido(db))
 
 
 @app.post("/api/motivos-pedido/", response_model=schemas.MotivoPedido, status_code=201)
@@ -390,9 +705,22 @@ def create_motivo_pedido(motivo: schemas.MotivoPedidoCreate, db: Session = Depen
 
 
 # ==================== COMPRAS ====================
-@app.get("/api/compras/", response_model=List[schemas.Compra])
-def get_compras(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    return crud.get_compras(db, skip=skip, limit=limit)
+def filtros_compras(estado: Optional[str] = None, proveedor: Optional[int] = None,
+                    desde: Optional[date] = None, hasta: Optional[date] = None, q: Optional[str] = None):
+    return {"estado": estado, "id_proveedor": proveedor, "desde": desde, "hasta": hasta, "texto": q}
+
+
+@app.get("/api/compras/", response_model=List[schemas.CompraLista], response_class=FastJSONResponse)
+def get_compras(skip: int = 0, limit: int = 100, include: Optional[str] = None,
+                filtros: dict = Depends(filtros_compras), db: Session = Depends(get_db)):
+    # include=proveedor,estado (of the purchase order)
+    include = _include(include, crud.INCLUDE_COMPRAS)
+    return FastJSONResponse(filas(crud.get_compras(db, skip=skip, limit=limit, include=include, **filtros)))
+
+
+@app.get("/api/compras/resumen", response_model=List[schemas.ResumenEstadoCompra])
+def get_resumen_compras(filtros: dict = Depends(filtros_compras), db: Session = Depends(get_db)):
+    return filas(crud.get_resumen_compras(db, **filtros))
 
 
 @app.get("/api/compras/{compra_id}", response_model=schemas.Compra)
@@ -417,32 +745,165 @@ def update_compra(compra_id: int, compra: schemas.CompraUpdate, db: Session = De
 
 
 # ==================== VENTAS ====================
-@app.get("/api/ventas/", response_model=List[schemas.Venta])
-def get_ventas(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    return crud.get_ventas(db, skip=skip, limit=limit)
+VENTAS_BATCH_MAX = 1000
 
+@app.get("/api/ventas/", response_model=List[schemas.VentaLista], response_class=FastJSONResponse)
+def get_ventas(skip: int = 0, limit: int = 100, desde: Optional[date] = None, hasta: Optional[date] = None,
+               include: Optional[str] = None, db: Session = Depends(get_db)):
+    # With partitioned sales tables, defaults to the last crud.VENTAS_DIAS_DEFECTO
+    # days; include=cliente,comprobante,metodo_pago
+    include = _include(include, crud.INCLUDE_VENTAS)
+    return FastJSONResponse(filas(crud.get_ventas(db, skip=skip, limit=limit, desde=desde, hasta=hasta,
+                                                  include=include)))
 
-@app.get("/api/ventas/{venta_id}", response_model=schemas.Venta)
-def get_venta(venta_id: int, db: Session = Depends(get_db)):
-    db_venta = crud.get_venta(db, venta_id)
+
+@app.post("/api/ventas/batch", response_model=schemas.VentaBatchRespuesta)
+def create_ventas_batch(batch: schemas.VentaBatchCreate, db: Session = Depends(get_db)):
+    if len(batch.ventas) > VENTAS_BATCH_MAX:
+        raise HTTPException(status_code=400, detail=f"Máximo {VENTAS_BATCH_MAX} ventas por lote")
+
+    # TODO: Get usuario_id from auth token
+    usuario_id = 1005  # Hardcoded for now
+    try:
+        resultados = crud.create_ventas_batch(db, batch.ventas, usuario_id, batch.atomico)
+    except SerieDesconocidaError:
+        raise HTTPException(status_code=400, detail="Tipo de comprobante sin serie configurada")
+    registradas = sum(1 for r in resultados if r.get("id_venta") and not r.get("replay"))
+    return {"registradas": registradas, "resultados": resultados}
+
+
+VENTAS_DETALLE_MAX = 100
+
+
+@app.get("/api/ventas/detalle", response_model=List[schemas.VentaDetalle])
+def get_ventas_detalle(ids: str, desde: Optional[date] = None, hasta: Optional[date] = None,
+                       db: Session = Depends(get_db)):
+    # ?ids=1,2,3 — several full sales at once, e.g. to print their receipts;
+    # desde/hasta (their date range) let a partitioned venta table prune
+    try:
+        venta_ids = [int(venta_id) for venta_id in ids.split(",") if venta_id.strip()]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="ids debe ser una lista de enteros separados por comas")
+    if not venta_ids or len(venta_ids) > VENTAS_DETALLE_MAX:
+        raise HTTPException(status_code=400, detail=f"Indique entre 1 y {VENTAS_DETALLE_MAX} ventas")
+    return crud.get_ventas_detalle(db, venta_ids, desde, hasta)
+
+
+@app.get("/api/ventas/{venta_id}", response_model=schemas.VentaDetalle)
+def get_venta(venta_id: int, fecha: Optional[date] = None, db: Session = Depends(get_db)):
+    # Passing the sale date lets a partitioned venta table read a single partition
+    db_venta = crud.get_venta(db, venta_id, fecha)
     if not db_venta:
         raise HTTPException(status_code=404, detail="Venta no encontrada")
     return db_venta
 
 
-@app.post("/api/ventas/", response_model=schemas.Venta, status_code=201)
-def create_venta(venta: schemas.VentaCreate, db: Session = Depends(get_db)):
+@app.post("/api/ventas/", response_model=schemas.VentaRegistrada, status_code=201)
+def create_venta(
+    venta: schemas.VentaCreate,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", max_length=64),
+    db: Session = Depends(get_db)
+):
+    # Replayed submission: return the original sale without writing anything
+    if idempotency_key:
+        db_venta = crud.get_venta_by_idempotency_key(db, idempotency_key)
+        if db_venta:
+            response.headers["Idempotent-Replayed"] = "true"
+            return db_venta
+
     # TODO: Get usuario_id from auth token
     usuario_id = 1005  # Hardcoded for now
-    return crud.create_venta(db, venta, usuario_id)
+    try:
+        return crud.create_venta(db, venta, usuario_id, idempotency_key)
+    except SerieDesconocidaError:
+        raise HTTPException(status_code=400, detail="Tipo de comprobante sin serie configurada")
+    except NumeroReservadoError as e:
+        raise HTTPException(status_code=400, detail=f"El número {e} pertenece a una serie numerada por el servidor")
+    except pricing.CarritoInvalidoError as e:
+        raise HTTPException(status_code=400, detail=f"Carrito inválido: {e}")
+
+
+@app.post("/api/ventas/cotizar", response_model=schemas.Carrito)
+def cotizar_carrito(carrito: schemas.CarritoCreate, db: Session = Depends(get_db)):
+    # Prices, IGV, stock and prescription flags for the cart being built;
+    # create_venta applies the same checks
+    return pricing.cotizar(db, carrito.detalles, carrito.id_carrito)
+
+
+# ==================== RESERVAS ====================
+@app.put("/api/reservas/{id_carrito}", response_model=schemas.Carrito)
+def reservar_carrito(id_carrito: str, carrito: schemas.CarritoCreate, db: Session = Depends(get_db)):
+    """Hold stock for an open cart (replacing its previous holds) and price it;
+    send the same id_carrito with the sale to convert the holds"""
+    if not id_carrito or len(id_carrito) > 36:
+        raise HTTPException(status_code=400, detail="id_carrito inválido")
+    expira = reservations.reservar(db, id_carrito, carrito.detalles)
+    return {**pricing.cotizar(db, carrito.detalles, id_carrito), "expira": expira}
+
+
+@app.delete("/api/reservas/{id_carrito}")
+def liberar_carrito(id_carrito: str, db: Session = Depends(get_db)):
+    liberadas = reservations.liberar(db, id_carrito)
+    return {"message": "Reserva liberada", "liberadas": liberadas}
 
 
 # ==================== METODOS PAGO ====================
-@app.get("/api/metodos-pago/", response_model=List[schemas.MetodoPago])
-def get_metodos_pago(db: Session = Depends(get_db)):
-    return crud.get_metodos_pago(db)
+@app.get("/api/metodos-pago/", response_model=List[schemas.MetodoPago], response_class=FastJSONResponse)
+def get_metodos_pago(request: Request, db: Session = Depends(get_db)):
+    return _lista_condicional(request, db, "metodo_pago", lambda: crud.get_metodos_pago(db))
 
 
 @app.post("/api/metodos-pago/", response_model=schemas.MetodoPago, status_code=201)
 def create_metodo_pago(metodo: schemas.MetodoPagoCreate, db: Session = Depends(get_db)):
     return crud.create_metodo_pago(db, metodo)
+
+
+# ==================== SYNC ====================
+SYNC_LIMIT_MAX = 5000
+
+@app.get("/api/sync", response_model=schemas.CambiosCatalogo)
+def get_sync(since: int = 0, limit: int = Query(SYNC_LIMIT_MAX, ge=1, le=SYNC_LIMIT_MAX),
+             db: Session = Depends(get_db)):
+    return crud.get_cambios_catalogo(db, since=since, limit=limit)
+
+
+# ==================== EVENTOS ====================
+@app.get("/api/eventos/stream")
+async def stream_eventos(
+    request: Request,
+    tipos: Optional[str] = None,
+    last_event_id: Optional[int] = Header(None, alias="Last-Event-ID")
+):
+    # tipos: comma-separated filter (stock, venta, pedido, pedido_estado)
+    filtro = set(tipos.split(",")) if tipos else None
+    return StreamingResponse(
+        event_bus.stream(request, filtro, last_event_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+# ==================== ANALYTICS ====================
+@app.get("/api/analytics/ventas", response_model=schemas.ResumenVentas)
+def get_resumen_ventas(desde: date, hasta: date, top: int = analytics.TOP_N, db: Session = Depends(get_db)):
+    if desde > hasta:
+        raise HTTPException(status_code=400, detail="Rango de fechas inválido")
+    if top < 1:
+        raise HTTPException(status_code=400, detail="top debe ser mayor a 0")
+    return analytics.get_resumen_ventas(db, desde, hasta, top_n=top)
+
+
+@app.get("/api/analytics/costo-ventas", response_model=List[schemas.CostoVentaPeriodo])
+def get_costo_ventas(desde: date, hasta: date, metodo: str = costing.PROMEDIO, agrupar: str = "producto",
+                     db: Session = Depends(get_db)):
+    if metodo not in costing.METODOS:
+        raise HTTPException(status_code=400, detail=f"Método inválido, use: {', '.join(costing.METODOS)}")
+    if agrupar not in ("producto", "categoria"):
+        raise HTTPException(status_code=400, detail="agrupar debe ser 'producto' o 'categoria'")
+    return costing.get_costo_ventas(db, metodo, desde, hasta, agrupar)
+
+
+@app.post("/api/analytics/costo-ventas/procesar", response_model=List[schemas.ProcesoCosto])
+def procesar_costo_ventas(db: Session = Depends(get_db)):
+    return [costing.procesar(db, metodo) for metodo in costing.METODOS]
@@ -0,0 +1,252 @@
+"""
+Columnar archive of closed sales months
+
+Archiving a month writes its venta, detalle_venta, pago and comprobante rows
+to compressed Arrow IPC files (one directory per month) and deletes them from
+the hot tables. Reports read archived months back through memory-mapped
+files and union them with the hot rows, so date ranges that cross the
+boundary keep returning complete results.
+
+Sales that arrive late for an archived month (e.g. offline terminals) stay
+in the hot tables until the month is archived again, which appends a new
+part. periodo_archivado records how many parts of each month are committed;
+readers ignore any file beyond that, so a run that fails before committing
+never double counts.
+
+Requires the optional pyarrow dependency (uv sync --extra archive).
+
+Run as a job with: python -m app.archive [--hasta YYYY-MM]
+"""
+
+import argparse
+import os
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+from sqlalchemy import select, delete, and_, func, Integer, String, Numeric, Float, Date, DateTime, Time, Boolean
+from sqlalchemy.orm import Session
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+except ImportError:  # optional dependency
+    pa = None
+
+from . import costing, crud
+from .columnar import CHUNK
+from .models import Venta, DetalleVenta, Pago, Comprobante, ClaveIdempotencia, PeriodoArchivado
+
+
+ARCHIVE_DIR = Path(os.getenv("VENTAS_ARCHIVE_DIR", Path(__file__).resolve().parent.parent / "archive"))
+COMPRESION = "zstd"
+LOTE_BORRADO = 1000  # Sale ids per DELETE statement
+
+
+class ArchivoNoDisponibleError(RuntimeError):
+    """Raised when archived months must be read or written without pyarrow installed"""
+
+
+def _requiere_pyarrow():
+    if pa is None:
+        raise ArchivoNoDisponibleError("pyarrow is required for the sales archive (uv sync --extra archive)")
+
+
+def _inicio_mes(fecha: date) -> date:
+    return fecha.replace(day=1)
+
+
+def _siguiente_mes(fecha: date) -> date:
+    return date(fecha.year + fecha.month // 12, fecha.month % 12 + 1, 1)
+
+
+def _ruta(periodo: date, tabla: str, parte: int) -> Path:
+    return ARCHIVE_DIR / periodo.strftime("%Y-%m") / f"{tabla}-{parte:04d}.arrow"
+
+
+def _tipo_arrow(columna):
+    tipo = columna.type
+    if isinstance(tipo, Numeric) and not isinstance(tipo, Float):
+        return pa.decimal128(tipo.precision, tipo.scale)
+    if isinstance(tipo, Float):
+        return pa.float64()
+    if isinstance(tipo, Boolean):
+        return pa.bool_()
+    if isinstance(tipo, Integer):
+        return pa.int64()
+    if isinstance(tipo, DateTime):
+        return pa.timestamp("us")
+    if isinstance(tipo, Date):
+        return pa.date32()
+    if isinstance(tipo, Time):
+        return pa.time64("us")
+    if isinstance(tipo, String):
+        return pa.string()
+    raise TypeError(f"Unsupported column type for archive: {tipo!r}")
+
+
+# ==================== WRITE ====================
+def _escribir(db: Session, ruta: Path, stmt, ids: list = None) -> int:
+    """Stream a query into an Arrow IPC file; returns the number of rows and
+    appends the id_venta of each row written to `ids`, if given"""
+    schema = pa.schema([(columna.name, _tipo_arrow(columna)) for columna in stmt.selected_columns])
+    opciones = pa.ipc.IpcWriteOptions(compression=COMPRESION)
+    ruta.parent.mkdir(parents=True, exist_ok=True)
+    filas = 0
+    result = db.execute(stmt.execution_options(stream_results=True, yield_per=CHUNK))
+    with pa.OSFile(str(ruta), "wb") as sink, pa.ipc.new_file(sink, schema, options=opciones) as writer:
+        for chunk in result.partitions(CHUNK):
+            columnas = list(zip(*chunk))
+            if ids is not None:
+                ids.extend(columnas[schema.get_field_index("id_venta")])
+            writer.write_batch(pa.record_batch(
+                [pa.array(valores, type=campo.type) for valores, campo in zip(columnas, schema)],
+                schema=schema
+            ))
+            filas += len(chunk)
+    return filas
+
+
+def archivar_periodo(db: Session, periodo: date):
+    """Move one month of sales to the archive. Returns (sales, lines) moved"""
+    _requiere_pyarrow()
+    # Sales committed after the id range is read stay hot for the next run;
+    # every statement below uses the same bounds so they stay consistent
+    id_min, id_max = crud.get_rango_ids_venta(db, periodo, _siguiente_mes(periodo) - timedelta(days=1))
+    en_periodo = and_(
+        Venta.fecha_venta >= periodo,
+        Venta.fecha_venta < _siguiente_mes(periodo),
+        Venta.id_venta.between(id_min, id_max)
+    )
+    ids_venta = select(Venta.id_venta).where(en_periodo)
+
+    registro = db.query(PeriodoArchivado).filter(PeriodoArchivado.periodo == periodo).with_for_update().first()
+    parte = (registro.partes if registro else 0) + 1
+
+    consultas = {
+        "venta": select(*Venta.__table__.columns).where(en_periodo).order_by(Venta.id_venta),
+        # fecha_venta is copied onto the lines so reports can filter them alone
+        "detalle_venta": select(*DetalleVenta.__table__.columns, Venta.fecha_venta).join(
+            Venta, Venta.id_venta == DetalleVenta.id_venta
+        ).where(en_periodo, DetalleVenta.id_venta.between(id_min, id_max)).order_by(DetalleVenta.id_venta),
+        "pago": select(*Pago.__table__.columns).where(Pago.id_venta.in_(ids_venta)),
+        "comprobante": select(*Comprobante.__table__.columns).where(Comprobante.id_venta.in_(ids_venta)),
+    }
+    rutas = {tabla: _ruta(periodo, tabla, parte) for tabla in consultas}
+    exportadas = []
+    try:
+        filas = {
+            tabla: _escribir(db, rutas[tabla], stmt, exportadas if tabla == "venta" else None)
+            for tabla, stmt in consultas.items()
+        }
+        if not filas["venta"]:
+            for ruta in rutas.values():
+                ruta.unlink(missing_ok=True)
+            db.rollback()
+            return 0, 0
+
+        # Delete exactly the sales that were written, not whatever the
+        # predicates match now
+        for inicio in range(0, len(exportadas), LOTE_BORRADO):
+            lote = exportadas[inicio:inicio + LOTE_BORRADO]
+            for model in (Comprobante, Pago, ClaveIdempotencia, DetalleVenta, Venta):
+                db.execute(delete(model).where(model.id_venta.in_(lote)), execution_options={"synchronize_session": False})
+
+        if registro is None:
+            registro = PeriodoArchivado(periodo=periodo, partes=0, ventas=0, lineas=0)
+            db.add(registro)
+        registro.partes = parte
+        registro.ventas += filas["venta"]
+        registro.lineas += filas["detalle_venta"]
+        registro.fecha_archivo = datetime.now()
+        # Cached analytics of the month are keyed on this version
+        crud.registrar_version_tabla(db, "venta")
+        db.commit()
+    except Exception:
+        db.rollback()
+        for ruta in rutas.values():
+            ruta.unlink(missing_ok=True)
+        raise
+    return filas["venta"], filas["detalle_venta"]
+
+
+def archivar(db: Session, hasta: date = None):
+    """Archive every month with hot sales before the month of `hasta` (default:
+    the current month, so only closed months move)"""
+    _requiere_pyarrow()
+    limite = _inicio_mes(hasta or date.today())
+
+    # Archived sales leave the tables the COGS engine reads, so cost them first
+    for metodo in costing.METODOS:
+        costing.procesar(db, metodo)
+
+    meses = db.query(func.min(Venta.fecha_venta)).filter(Venta.fecha_venta < limite).scalar()
+    resultado = []
+    periodo = _inicio_mes(meses) if meses else limite
+    while periodo < limite:
+        ventas, lineas = archivar_periodo(db, periodo)
+        if ventas:
+            resultado.append({"periodo": periodo, "ventas": ventas, "lineas": lineas})
+        periodo = _siguiente_mes(periodo)
+    return resultado
+
+
+# ==================== READ ====================
+def _leer(ruta: Path, columnas):
+    with pa.memory_map(str(ruta)) as source:
+        return pa.ipc.open_file(source).read_all().select(columnas)
+
+
+def periodos_archivados(db: Session, desde: date, hasta: date):
+    return db.query(PeriodoArchivado).filter(
+        PeriodoArchivado.periodo >= _inicio_mes(desde),
+        PeriodoArchivado.periodo <= hasta,
+        PeriodoArchivado.partes > 0
+    ).order_by(PeriodoArchivado.periodo).all()
+
+
+def cargar_detalles(db: Session, desde: date, hasta: date):
+    """(fecha_venta, id_producto, cantidad, subtotal in cents) for archived sale
+    lines in the range; empty arrays when no archived month overlaps it"""
+    partes = [[], [], [], []]
+    periodos = periodos_archivados(db, desde, hasta)
+    if periodos:
+        _requiere_pyarrow()
+    for registro in periodos:
+        for parte in range(1, registro.partes + 1):
+            tabla = _leer(
+                _ruta(registro.periodo, "detalle_venta", parte),
+                ["fecha_venta", "id_producto", "cantidad", "subtotal"]
+            )
+            fechas = tabla.column("fecha_venta").to_numpy().astype("datetime64[D]")
+            en_rango = (fechas >= np.datetime64(desde, "D")) & (fechas <= np.datetime64(hasta, "D"))
+            subtotales = pc.cast(tabla.column("subtotal"), pa.float64()).to_numpy()
+            partes[0].append(fechas[en_rango])
+            partes[1].append(tabla.column("id_producto").to_numpy()[en_rango])
+            partes[2].append(tabla.column("cantidad").to_numpy()[en_rango])
+            partes[3].append(np.round(subtotales[en_rango] * 100).astype(np.int64))
+
+    dtypes = ("datetime64[D]", np.int64, np.int64, np.int64)
+    return [
+        np.concatenate(parte).astype(dtype) if parte else np.empty(0, dtype=dtype)
+        for parte, dtype in zip(partes, dtypes)
+    ]
+
+
+if __name__ == "__main__":
+    from .database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Move closed months of sales to the columnar archive")
+    parser.add_argument("--hasta", help="Archive months before this one (YYYY-MM, default: current month)")
+    args = parser.parse_args()
+    hasta = datetime.strptime(args.hasta, "%Y-%m").date() if args.hasta else None
+
+    db = SessionLocal()
+    try:
+        archivados = archivar(db, hasta)
+        for periodo in archivados:
+            print(f"{periodo['periodo']:%Y-%m}: {periodo['ventas']} sales, {periodo['lineas']} lines archived")
+        if not archivados:
+            print("Nothing to archive")
+    finally:
+        db.close()
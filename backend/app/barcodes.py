@@ -0,0 +1,238 @@
+"""
+Barcode scanning (checkout)
+
+Boxes carry an EAN-13 (or UPC / EAN-8) code, and many also a GS1 DataMatrix
+whose element string holds the GTIN (AI 01), lot (10), expiry (17) and serial
+(21). leer turns any scan into a lookup key: numeric codes with a valid check
+digit become 14-digit GTINs, so the EAN-13 printed on a box and the GTIN in
+its DataMatrix find the same row of codigo_barras; anything else is looked
+up as typed (and, failing that, as the product's codigo_interno).
+
+A scan is resolved with one statement: the codigo_barras row found through
+the unique index on its 64-bit hash, joined to the product, its unexpired
+stock and, when the code names a lot, that lot and its stock (both less the
+units held for open carts, see reservations). Results are kept in an
+in-process cache for ESCANEO_CACHE_TTL seconds keyed by code and lot, so a
+burst of scans of the same boxes does not reach the database. Stock and
+prices may thus be a few seconds old; checkout validates both again.
+
+The barcode and product write functions in crud clear the cache after
+commit, but only in the worker that handled the write. Other workers see
+the change once their entries expire, so misses are cached for
+ESCANEO_CACHE_TTL_NEGATIVO seconds, never longer than hits: a code that
+was just registered is found everywhere within that time.
+"""
+
+import calendar
+import hashlib
+import os
+import re
+from datetime import date, datetime
+
+from sqlalchemy import select, func, and_
+from sqlalchemy.orm import Session, aliased
+
+from .cache import TTLCache, MISSING
+from .models import Producto, CodigoBarras, Lote, Inventario
+from .reservations import reservado
+
+
+CACHE_SIZE = int(os.getenv("ESCANEO_CACHE_SIZE", "5000"))
+CACHE_TTL = float(os.getenv("ESCANEO_CACHE_TTL", "5"))
+CACHE_TTL_NEGATIVO = float(os.getenv("ESCANEO_CACHE_TTL_NEGATIVO", str(CACHE_TTL)))
+
+GS = "\x1d"  # FNC1 as transmitted by scanners: ends variable-length fields
+# Symbology identifiers of GS1 DataMatrix, GS1-128, DataBar and GS1 QR
+SIMBOLOGIAS_GS1 = ("]d2", "]C1", "]e0", "]Q3")
+TIPOS_GTIN = {8: "EAN8", 12: "UPC", 13: "EAN13", 14: "GTIN14"}
+
+# Application identifiers with a predefined length: total length (AI + data)
+# by the AI's first two digits, per the GS1 General Specifications
+LONGITUD_FIJA = {
+    "00": 20, "01": 16, "02": 16, "03": 16, "04": 18,
+    "11": 8, "12": 8, "13": 8, "14": 8, "15": 8, "16": 8, "17": 8, "18": 8, "19": 8,
+    "20": 4, "31": 10, "32": 10, "33": 10, "34": 10, "35": 10, "36": 10, "41": 16,
+}
+# Digits of the AI by its first two digits (2 otherwise)
+DIGITOS_AI = {
+    "23": 3, "24": 3, "25": 3, "40": 3, "41": 3, "42": 3, "71": 3,
+    "31": 4, "32": 4, "33": 4, "34": 4, "35": 4, "36": 4, "39": 4,
+    "43": 4, "70": 4, "72": 4, "80": 4, "81": 4, "82": 4,
+}
+ENTRE_PARENTESIS = re.compile(r"\((\d{2,4})\)([^(]*)")
+
+
+class CodigoInvalidoError(ValueError):
+    """Raised for GS1 element strings that cannot be parsed"""
+
+
+def digito_verificador(cuerpo: str) -> int:
+    """GS1 mod-10 check digit of the digits before it"""
+    suma = sum(int(digito) * (3 if posicion % 2 == 0 else 1) for posicion, digito in enumerate(reversed(cuerpo)))
+    return (10 - suma % 10) % 10
+
+
+def es_gtin(codigo: str) -> bool:
+    return (
+        codigo.isdigit() and len(codigo) in TIPOS_GTIN
+        and digito_verificador(codigo[:-1]) == int(codigo[-1])
+    )
+
+
+def normalizar(codigo: str):
+    """(lookup key, tipo): GTINs zero-padded to 14 digits, other codes as given"""
+    codigo = codigo.strip()
+    if es_gtin(codigo):
+        return codigo.zfill(14), TIPOS_GTIN[len(codigo)]
+    return codigo, "interno"
+
+
+def hash_codigo(codigo: str) -> int:
+    """Signed 64-bit hash of a lookup key (stable across processes)"""
+    return int.from_bytes(hashlib.blake2b(codigo.encode(), digest_size=8).digest(), "big", signed=True)
+
+
+def _fecha(valor: str) -> date:
+    """GS1 YYMMDD date; day 00 means the last day of the month"""
+    if len(valor) != 6 or not valor.isdigit():
+        raise CodigoInvalidoError(f"Fecha inválida: {valor}")
+    anio, mes, dia = 2000 + int(valor[:2]), int(valor[2:4]), int(valor[4:])
+    if not 1 <= mes <= 12:
+        raise CodigoInvalidoError(f"Fecha inválida: {valor}")
+    try:
+        return date(anio, mes, dia or calendar.monthrange(anio, mes)[1])
+    except ValueError:
+        raise CodigoInvalidoError(f"Fecha inválida: {valor}")
+
+
+def parse_gs1(texto: str) -> dict:
+    """AI -> value of a GS1 element string, raw (with GS separators and an
+    optional symbology identifier) or human-readable, e.g. (01)...(10)..."""
+    if texto.startswith("("):
+        elementos = dict(ENTRE_PARENTESIS.findall(texto))
+        if not elementos:
+            raise CodigoInvalidoError("Código GS1 vacío")
+        return elementos
+
+    if texto[:3] in SIMBOLOGIAS_GS1:
+        texto = texto[3:]
+    texto = texto.lstrip(GS)
+    elementos = {}
+    posicion = 0
+    while posicion < len(texto):
+        prefijo = texto[posicion:posicion + 2]
+        ai = texto[posicion:posicion + DIGITOS_AI.get(prefijo, 2)]
+        if not ai.isdigit() or len(ai) < 2:
+            raise CodigoInvalidoError(f"AI inválido en la posición {posicion}")
+        inicio = posicion + len(ai)
+        if prefijo in LONGITUD_FIJA:
+            fin = posicion + LONGITUD_FIJA[prefijo]
+            if fin > len(texto) or GS in texto[inicio:fin]:
+                raise CodigoInvalidoError(f"AI ({ai}) incompleto")
+            siguiente = fin + 1 if texto[fin:fin + 1] == GS else fin
+        else:
+            fin = texto.find(GS, inicio)
+            fin = len(texto) if fin == -1 else fin
+            siguiente = fin + 1
+        elementos[ai] = texto[inicio:fin]
+        posicion = siguiente
+    return elementos
+
+
+def _es_gs1(codigo: str) -> bool:
+    return (
+        codigo[:3] in SIMBOLOGIAS_GS1 or GS in codigo or codigo.startswith("(01)")
+        or (codigo.startswith("01") and len(codigo) > 16 and codigo[:16].isdigit())
+    )
+
+
+def leer(codigo: str) -> dict:
+    """What a scan says: the lookup key and, for GS1 codes, the GTIN, lot,
+    expiry and serial"""
+    lectura = {"codigo": codigo, "gtin": None, "codigo_lote": None, "fecha_vencimiento": None, "serie": None}
+    if not _es_gs1(codigo):
+        lectura["clave"], tipo = normalizar(codigo)
+        if tipo != "interno":
+            lectura["gtin"] = lectura["clave"]
+        return lectura
+
+    elementos = parse_gs1(codigo)
+    gtin = elementos.get("01")
+    if gtin is None or not es_gtin(gtin):
+        raise CodigoInvalidoError("GTIN (01) ausente o con dígito verificador inválido")
+    lectura.update(
+        clave=gtin,
+        gtin=gtin,
+        codigo_lote=elementos.get("10"),
+        fecha_vencimiento=_fecha(elementos["17"]) if "17" in elementos else None,
+        serie=elementos.get("21"),
+    )
+    return lectura
+
+
+class EscanerCodigos:
+    def __init__(self, maxsize: int = CACHE_SIZE, ttl: float = CACHE_TTL, ttl_negativo: float = CACHE_TTL_NEGATIVO):
+        self._escaneos = TTLCache(maxsize=maxsize, ttl=ttl)  # (clave, codigo_lote) -> row dict or None
+        self._ttl_negativo = min(ttl_negativo, ttl)
+
+    def _consultar(self, db: Session, clave: str, codigo_lote: str = None, interno: bool = False):
+        ahora = datetime.now()
+        hoy = ahora.date()
+        lotes, inventarios = aliased(Lote), aliased(Inventario)
+        # Available stock: units held for open carts are not
+        disponible = inventarios.stock_actual - reservado(ahora, inventario=inventarios)
+        stock = select(func.coalesce(func.sum(disponible), 0)).join(
+            lotes, lotes.id_lote == inventarios.id_lote
+        ).where(
+            lotes.id_producto == Producto.id_producto, lotes.fecha_vencimiento > hoy
+        ).correlate(Producto).scalar_subquery()
+        # A lot can be stored on several shelves: add up its inventory rows
+        stock_lote = select(func.sum(disponible)).where(
+            inventarios.id_lote == Lote.id_lote
+        ).correlate(Lote).scalar_subquery()
+        stmt = select(
+            Producto.id_producto,
+            Producto.codigo_interno,
+            Producto.nombre_comercial,
+            Producto.precio_venta,
+            Producto.afecta_igv,
+            Producto.requiere_receta,
+            stock.label("stock"),
+            Lote.id_lote,
+            Lote.fecha_vencimiento.label("vencimiento_lote"),
+            stock_lote.label("stock_lote")
+        ).outerjoin(
+            # A lot that is not registered (or of another product) leaves these NULL
+            Lote, and_(Lote.id_producto == Producto.id_producto, Lote.codigo_lote == codigo_lote)
+        )
+        if interno:
+            stmt = stmt.where(Producto.codigo_interno == clave)
+        else:
+            stmt = stmt.join(CodigoBarras, CodigoBarras.id_producto == Producto.id_producto).where(
+                CodigoBarras.hash_codigo == hash_codigo(clave), CodigoBarras.codigo == clave
+            )
+        fila = db.execute(stmt).first()
+        return fila._asdict() if fila else None
+
+    def escanear(self, db: Session, codigo: str):
+        """Product, lot and stock for a scanned code, or None if unknown;
+        raises CodigoInvalidoError for malformed GS1 codes"""
+        lectura = leer(codigo)
+        clave = lectura.pop("clave")
+        llave = (clave, lectura["codigo_lote"])
+        resultado = self._escaneos.get(llave)
+        if resultado is MISSING:
+            resultado = self._consultar(db, clave, lectura["codigo_lote"])
+            if resultado is None:
+                # Shops often label their own products with codigo_interno
+                resultado = self._consultar(db, codigo.strip(), lectura["codigo_lote"], interno=True)
+            self._escaneos.set(llave, resultado, ttl=None if resultado else self._ttl_negativo)
+        if resultado is None:
+            return None
+        return {**lectura, **resultado}
+
+    def clear(self):
+        self._escaneos.clear()
+
+
+escaner_codigos = EscanerCodigos()
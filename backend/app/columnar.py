@@ -0,0 +1,29 @@
+"""
+Columnar query helpers for the NumPy-based reports
+"""
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+
+CHUNK = 50000
+
+
+def stream_columns(db: Session, stmt, dtypes):
+    """Stream a query into one NumPy array per column"""
+    partes = [[] for _ in dtypes]
+    result = db.execute(stmt.execution_options(stream_results=True, yield_per=CHUNK))
+    for chunk in result.partitions(CHUNK):
+        for i, columna in enumerate(zip(*chunk)):
+            partes[i].append(np.asarray(columna, dtype=dtypes[i]))
+    return [
+        np.concatenate(parte) if parte else np.empty(0, dtype=dtype)
+        for parte, dtype in zip(partes, dtypes)
+    ]
+
+
+def scatter_sum(universo, ids, valores):
+    """Sum (ids, valores) onto a dense float array aligned with the sorted `universo`"""
+    if not len(ids):
+        return np.zeros(len(universo), dtype=np.float64)
+    return np.bincount(np.searchsorted(universo, ids), weights=valores, minlength=len(universo))
@@ -0,0 +1,146 @@
+"""
+Response compression
+
+CompressionMiddleware compresses JSON and text responses of at least
+COMPRESSION_MIN_BYTES with brotli or gzip, as the client accepts. Smaller
+bodies are not worth the CPU. Streamed responses (the SSE feed) and responses
+that already carry a Content-Encoding pass through untouched.
+
+Cached payloads (the reference lists) are kept as PayloadComprimido, which
+compresses each encoding once at the highest level and reuses the bytes
+until the payload is replaced, instead of compressing on every request.
+
+Brotli needs the optional dependency (uv sync --extra compression);
+without it only gzip is offered.
+"""
+
+import gzip
+import os
+
+from fastapi import Request, Response
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+except ImportError:  # optional dependency
+    brotli = None
+
+
+COMPRESSION_MIN_BYTES = int(os.getenv("COMPRESSION_MIN_BYTES", "1024"))
+# Compress larger bodies off the event loop
+HILO_MIN_BYTES = 128 * 1024
+TIPOS_COMPRIMIBLES = ("application/json", "text/html", "text/plain", "text/csv")
+
+# (per request, once per cached payload)
+NIVEL_GZIP = (6, 9)
+NIVEL_BROTLI = (4, 11)
+
+
+def elegir_codificacion(accept_encoding: str):
+    """'br', 'gzip' or None for an Accept-Encoding header (q=0 means refused)"""
+    aceptadas = set()
+    for parte in accept_encoding.lower().split(","):
+        nombre, _, parametros = parte.strip().partition(";")
+        if parametros.replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            aceptadas.add(nombre.strip())
+    if brotli is not None and "br" in aceptadas:
+        return "br"
+    if "gzip" in aceptadas:
+        return "gzip"
+    return None
+
+
+def comprimir(body: bytes, codificacion: str, maximo: bool = False) -> bytes:
+    if codificacion == "br":
+        return brotli.compress(body, quality=NIVEL_BROTLI[maximo])
+    return gzip.compress(body, compresslevel=NIVEL_GZIP[maximo], mtime=0)
+
+
+class PayloadComprimido:
+    """A cached response body plus its compressed variants, each built on first use"""
+
+    def __init__(self, body: bytes, media_type: str = "application/json"):
+        self.body = body
+        self.media_type = media_type
+        self._variantes = {}
+
+    def variante(self, codificacion):
+        """(bytes, encoding) to send for the client's preferred encoding"""
+        if codificacion is None or len(self.body) < COMPRESSION_MIN_BYTES:
+            return self.body, None
+        datos = self._variantes.get(codificacion)
+        if datos is None:
+            # Concurrent first requests may both compress; the result is the same
+            datos = self._variantes[codificacion] = comprimir(self.body, codificacion, maximo=True)
+        return datos, codificacion
+
+    def respuesta(self, request: Request, headers: dict = None) -> Response:
+        contenido, codificacion = self.variante(
+            elegir_codificacion(request.headers.get("accept-encoding", ""))
+        )
+        headers = {**(headers or {}), "Vary": "Accept-Encoding"}
+        if codificacion:
+            headers["Content-Encoding"] = codificacion
+        return Response(contenido, media_type=self.media_type, headers=headers)
+
+
+class CompressionMiddleware:
+    """ASGI middleware compressing single-body responses of at least `minimo` bytes"""
+
+    def __init__(self, app, minimo: int = COMPRESSION_MIN_BYTES):
+        self.app = app
+        self.minimo = minimo
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        codificacion = elegir_codificacion(Headers(scope=scope).get("accept-encoding", ""))
+        inicio = None
+        directo = False
+
+        async def enviar(message):
+            nonlocal inicio, directo
+            if message["type"] == "http.response.start":
+                headers = Headers(raw=message["headers"])
+                tipo = headers.get("content-type", "").partition(";")[0].strip().lower()
+                directo = (
+                    "content-encoding" in headers
+                    or message["status"] == 206
+                    or tipo not in TIPOS_COMPRIMIBLES
+                )
+                if directo:
+                    await send(message)
+                else:
+                    # Held back until the body tells whether to compress
+                    inicio = message
+                return
+            if directo or message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            # Only the first body message is inspected; streams pass through
+            directo = True
+            body = message.get("body", b"")
+            if message.get("more_body", False) or len(body) < self.minimo:
+                await send(inicio)
+                await send(message)
+                return
+
+            headers = MutableHeaders(raw=inicio["headers"])
+            if "accept-encoding" not in headers.get("vary", "").lower():
+                headers.add_vary_header("Accept-Encoding")
+            if codificacion:
+                if len(body) >= HILO_MIN_BYTES:
+                    body = await run_in_threadpool(comprimir, body, codificacion)
+                else:
+                    body = comprimir(body, codificacion)
+                headers["Content-Encoding"] = codificacion
+                headers["Content-Length"] = str(len(body))
+                message = {**message, "body": body}
+            await send(inicio)
+            await send(message)
+
+        await self.app(scope, receive, enviar)
@@ -0,0 +1,44 @@
+"""
+Conditional GET for catalog responses
+
+Catalog rows and reference tables carry the catalog version of their last
+change (cambio_catalogo per row, version_tabla per table), bumped by the crud
+write functions in the same transaction as the change. That version is the
+ETag, so a request whose If-None-Match still matches gets a 304 after one
+primary-key lookup, without loading the row or the list. Responses go out
+with Cache-Control: no-cache, so browsers and proxies keep them but
+revalidate on every use.
+
+Rows that never changed through the API (e.g. the seed data) are version 0.
+"""
+
+from fastapi import Request, Response
+
+
+CACHE_CONTROL = "no-cache"
+
+
+def etag(tabla: str, version: int, id_registro: int = None) -> str:
+    # Weak: the same version may be sent with different encodings
+    clave = tabla if id_registro is None else f"{tabla}-{id_registro}"
+    return f'W/"{clave}-v{version}"'
+
+
+def cabeceras(valor: str) -> dict:
+    return {"ETag": valor, "Cache-Control": CACHE_CONTROL}
+
+
+def _opaco(valor: str) -> str:
+    valor = valor.strip()
+    return valor[2:] if valor.startswith("W/") else valor
+
+
+def no_modificado(request: Request, valor: str):
+    """A 304 response if the request's If-None-Match matches the ETag, else None"""
+    condicion = request.headers.get("if-none-match")
+    if not condicion:
+        return None
+    candidatos = {_opaco(candidato) for candidato in condicion.split(",")}
+    if "*" in candidatos or _opaco(valor) in candidatos:
+        return Response(status_code=304, headers=cabeceras(valor))
+    return None
@@ -0,0 +1,384 @@
+"""
+Cost of goods sold (COGS) engine
+
+Lots (receipts) and sale lines are replayed in order and every unit sold is
+costed from the lots' costo_unitario_compra, either with a perpetual weighted
+average or FIFO. The engine is incremental: a checkpoint per method stores the
+last processed id_lote / id_venta and the per-product cost state as compact
+NumPy arrays, so each run only reads rows added since the previous one and
+adds its totals to costo_venta_mensual (method, month, product). Monthly COGS
+per product or category is then a plain query over that table.
+
+Ids are assigned at INSERT but become visible at COMMIT, so a run can see an
+id above one that is still uncommitted. Like the event poller, each run
+re-reads LOOKBACK_IDS ids below the checkpoint and skips the ones the
+checkpoint lists as already costed.
+
+Lots are taken chronologically, by (fecha_ingreso, id_lote), and FIFO layers
+queue in that order. Within a run new lots are applied before the new sales (a
+lot can only be sold once it has been registered). Sales are costed in
+(fecha_venta, hora_venta, id_venta) order.
+
+Run as a job with: python -m app.costing
+"""
+
+import io
+import os
+from datetime import date, datetime
+
+import numpy as np
+from sqlalchemy import select, func, cast, Integer, insert, update
+from sqlalchemy.orm import Session
+
+from .columnar import stream_columns, scatter_sum
+from .models import (
+    Venta, DetalleVenta, Lote, ProductoCategoria, Categoria, Producto,
+    CheckpointCosto, CostoVentaMensual,
+)
+
+
+PROMEDIO = "promedio"
+FIFO = "fifo"
+METODOS = (PROMEDIO, FIFO)
+
+# Products are packed above this many units when searching FIFO layers
+_DESPLAZAMIENTO = np.int64(2 ** 40)
+
+# Ids re-read below the checkpoint on each run; must exceed the ids handed out
+# while one transaction is open (a sales batch takes up to 1000 at once)
+LOOKBACK_IDS = int(os.getenv("COSTEO_LOOKBACK_IDS", "5000"))
+
+
+def _estado_vacio(metodo: str):
+    vacio_i = np.empty(0, dtype=np.int64)
+    vacio_f = np.empty(0, dtype=np.float64)
+    if metodo == PROMEDIO:
+        return {"productos": vacio_i, "unidades": vacio_i, "costo": vacio_f}
+    return {
+        "capa_lotes": vacio_i, "capa_fechas": vacio_i, "capa_productos": vacio_i, "capa_restante": vacio_i,
+        "capa_costo": vacio_f, "productos": vacio_i, "ultimo_costo": vacio_f,
+    }
+
+
+def _serializar(estado) -> bytes:
+    buffer = io.BytesIO()
+    np.savez(buffer, **estado)
+    return buffer.getvalue()
+
+
+def _deserializar(blob: bytes):
+    with np.load(io.BytesIO(blob)) as datos:
+        return {nombre: datos[nombre] for nombre in datos.files}
+
+
+def _alinear(universo, ids, valores, relleno):
+    """Values for `ids` placed on the sorted `universo` (`relleno` where missing)"""
+    salida = np.full(len(universo), relleno, dtype=np.float64)
+    if len(ids):
+        salida[np.searchsorted(universo, ids)] = valores
+    return salida
+
+
+# ==================== COSTING ====================
+def costear_promedio(estado, lote_productos, lote_cantidades, lote_costos, venta_productos, venta_cantidades):
+    """Perpetual weighted average. Returns (cost per sale line, new state); cost is
+    NaN for lines of products that never had a lot. Costs are in cents."""
+    productos = np.unique(np.concatenate([estado["productos"], lote_productos, venta_productos]))
+    unidades = scatter_sum(productos, estado["productos"], estado["unidades"])
+    costo = _alinear(productos, estado["productos"], estado["costo"], np.nan)
+
+    # Receipts: blend the lots into the average of the units on hand
+    entrada = scatter_sum(productos, lote_productos, lote_cantidades)
+    valor_entrada = scatter_sum(productos, lote_productos, lote_cantidades * lote_costos)
+    total = unidades + entrada
+    con_entrada = (entrada > 0) & (total > 0)
+    costo[con_entrada] = (
+        unidades[con_entrada] * np.nan_to_num(costo[con_entrada]) + valor_entrada[con_entrada]
+    ) / total[con_entrada]
+
+    # Sales: every unit leaves at the current average (units never go below 0,
+    # overselling keeps costing at the last average)
+    posiciones = np.searchsorted(productos, venta_productos)
+    costos_linea = venta_cantidades * costo[posiciones]
+    vendidas = scatter_sum(productos, venta_productos, venta_cantidades)
+    unidades = np.maximum(total - vendidas, 0)
+
+    nuevo = {"productos": productos, "unidades": unidades.astype(np.int64), "costo": costo}
+    return costos_linea, nuevo
+
+
+def costear_fifo(estado, lote_ids, lote_fechas, lote_productos, lote_cantidades, lote_costos,
+                 venta_productos, venta_cantidades):
+    """FIFO over per-lot layers. Returns (cost per sale line, new state); costs in cents.
+
+    Each product's layers form a queue of units; a line selling the units
+    between positions x0 and x1 of that queue costs F(x1) - F(x0), where F is
+    the cumulative cost of the first x units. All lines are evaluated at once
+    with searchsorted over the layers sorted by (product, fecha_ingreso, id_lote)."""
+    capa_lotes = np.concatenate([estado["capa_lotes"], lote_ids])
+    capa_fechas = np.concatenate([estado["capa_fechas"], lote_fechas])
+    capa_productos = np.concatenate([estado["capa_productos"], lote_productos])
+    capa_restante = np.concatenate([estado["capa_restante"], lote_cantidades.astype(np.int64)])
+    capa_costo = np.concatenate([estado["capa_costo"], lote_costos])
+    orden = np.lexsort((capa_lotes, capa_fechas, capa_productos))
+    capa_lotes, capa_fechas, capa_productos = capa_lotes[orden], capa_fechas[orden], capa_productos[orden]
+    capa_restante, capa_costo = capa_restante[orden], capa_costo[orden]
+
+    productos = np.unique(np.concatenate([estado["productos"], capa_productos, venta_productos]))
+    n = len(productos)
+
+    # Cost of the newest lot per product, used for units sold beyond the layers
+    ultimo_costo = _alinear(productos, estado["productos"], estado["ultimo_costo"], np.nan)
+    if len(lote_ids):
+        nuevos = np.lexsort((lote_ids, lote_fechas, lote_productos))
+        ids_nuevos = lote_productos[nuevos]
+        ultimos = np.r_[ids_nuevos[1:] != ids_nuevos[:-1], True]
+        ultimo_costo[np.searchsorted(productos, ids_nuevos[ultimos])] = lote_costos[nuevos][ultimos]
+
+    # Layer boundaries within each product's queue
+    capa_pos = np.searchsorted(productos, capa_productos)
+    valor = capa_restante * capa_costo
+    acumulado = np.cumsum(capa_restante)
+    acumulado_valor = np.cumsum(valor)
+    primera = np.searchsorted(capa_pos, capa_pos, side="left")
+    fin = acumulado - (acumulado - capa_restante)[primera]
+    inicio = fin - capa_restante
+    valor_previo = (acumulado_valor - valor) - (acumulado_valor - valor)[primera]
+    total_unidades = np.bincount(capa_pos, weights=capa_restante, minlength=n).astype(np.int64)
+    total_valor = np.bincount(capa_pos, weights=valor, minlength=n)
+    claves_fin = capa_pos * _DESPLAZAMIENTO + fin
+
+    def costo_acumulado(pos, x):
+        k = np.searchsorted(claves_fin, pos * _DESPLAZAMIENTO + x, side="right")
+        dentro = k < len(claves_fin)
+        k = np.minimum(k, max(len(claves_fin) - 1, 0))
+        dentro &= (capa_pos[k] == pos) if len(claves_fin) else False
+        resultado = total_valor[pos] + (x - total_unidades[pos]) * ultimo_costo[pos]
+        if len(claves_fin):
+            en_capa = valor_previo[k] + (x - inicio[k]) * capa_costo[k]
+            resultado = np.where(dentro, en_capa, resultado)
+        # Exactly at the end of the queue there is nothing to extrapolate
+        return np.where(x == total_unidades[pos], total_valor[pos], resultado)
+
+    # Sale lines grouped by product, keeping their chronological order
+    costos_linea = np.empty(len(venta_productos), dtype=np.float64)
+    vendidas = np.zeros(n, dtype=np.int64)
+    if len(venta_productos):
+        orden_ventas = np.argsort(venta_productos, kind="stable")
+        pos = np.searchsorted(productos, venta_productos[orden_ventas])
+        cantidades = venta_cantidades[orden_ventas].astype(np.int64)
+        acumuladas = np.cumsum(cantidades)
+        primera_venta = np.searchsorted(pos, pos, side="left")
+        x1 = acumuladas - (acumuladas - cantidades)[primera_venta]
+        x0 = x1 - cantidades
+        costos_linea[orden_ventas] = costo_acumulado(pos, x1) - costo_acumulado(pos, x0)
+        vendidas = np.bincount(pos, weights=cantidades, minlength=n).astype(np.int64)
+
+    # Consume the layers and drop the exhausted ones
+    capa_restante = np.clip(fin - vendidas[capa_pos], 0, capa_restante)
+    vivas = capa_restante > 0
+    nuevo = {
+        "capa_lotes": capa_lotes[vivas], "capa_fechas": capa_fechas[vivas], "capa_productos": capa_productos[vivas],
+        "capa_restante": capa_restante[vivas], "capa_costo": capa_costo[vivas],
+        "productos": productos, "ultimo_costo": ultimo_costo,
+    }
+    return costos_linea, nuevo
+
+
+def agrupar_mensual(fechas, productos, cantidades, costos):
+    """Sum sale lines per (month, product). Returns periods (datetime64[M]),
+    products, units, cost in cents and units without a known cost"""
+    meses = fechas.astype("datetime64[M]")
+    claves = meses.astype(np.int64) * _DESPLAZAMIENTO + productos
+    unicas, inverso = np.unique(claves, return_inverse=True)
+    sin_costo = np.isnan(costos)
+    return (
+        (unicas // _DESPLAZAMIENTO).astype("datetime64[M]"),
+        unicas % _DESPLAZAMIENTO,
+        np.bincount(inverso, weights=cantidades, minlength=len(unicas)).astype(np.int64),
+        np.bincount(inverso, weights=np.nan_to_num(costos), minlength=len(unicas)),
+        np.bincount(inverso, weights=cantidades * sin_costo, minlength=len(unicas)).astype(np.int64),
+    )
+
+
+# ==================== INCREMENTAL RUN ====================
+def cargar_lotes(db: Session, despues_de: int):
+    """(id_lote, fecha_ingreso as day number, id_producto, cantidad_recibida, cost
+    in cents) for lots after the id, chronologically"""
+    stmt = select(
+        Lote.id_lote, Lote.fecha_ingreso, Lote.id_producto, Lote.cantidad_recibida,
+        cast(func.round(Lote.costo_unitario_compra * 100), Integer)
+    ).where(Lote.id_lote > despues_de).order_by(Lote.fecha_ingreso, Lote.id_lote)
+    lote_ids, fechas, *resto = stream_columns(
+        db, stmt, (np.int64, "datetime64[D]", np.int64, np.int64, np.float64)
+    )
+    return (lote_ids, fechas.astype(np.int64), *resto)
+
+
+def cargar_ventas(db: Session, despues_de: int):
+    """(id_venta, fecha_venta, id_producto, cantidad) for sale lines after the id, chronologically"""
+    stmt = select(Venta.id_venta, Venta.fecha_venta, DetalleVenta.id_producto, DetalleVenta.cantidad).join(
+        Venta, Venta.id_venta == DetalleVenta.id_venta
+    ).where(
+        DetalleVenta.id_venta > despues_de
+    ).order_by(Venta.fecha_venta, Venta.hora_venta, Venta.id_venta)
+    return stream_columns(db, stmt, (np.int64, "datetime64[D]", np.int64, np.int64))
+
+
+def _sin_vistos(vistos, ids, *columnas):
+    """Drop the rows whose id the checkpoint already processed"""
+    nuevas = ~np.isin(ids, vistos)
+    return (ids[nuevas], *(columna[nuevas] for columna in columnas))
+
+
+def _ventana(ultimo: int, vistos, ids):
+    """Checkpoint after a run: the highest id seen and the processed ids within
+    LOOKBACK_IDS of it"""
+    vistos = np.union1d(vistos, ids)
+    ultimo = max(ultimo, int(vistos[-1])) if len(vistos) else ultimo
+    return ultimo, vistos[vistos > ultimo - LOOKBACK_IDS]
+
+
+def _guardar_mensual(db: Session, metodo: str, periodos, productos, cantidades, costos, sin_costo):
+    """Add the run's totals to costo_venta_mensual"""
+    if not len(productos):
+        return
+    fechas = [p.astype(date) for p in periodos]
+    existentes = {
+        (fila.periodo, fila.id_producto): fila
+        for fila in db.query(CostoVentaMensual).filter(
+            CostoVentaMensual.metodo == metodo,
+            CostoVentaMensual.periodo.in_(set(fechas)),
+            CostoVentaMensual.id_producto.in_(np.unique(productos).tolist())
+        )
+    }
+    nuevas, actualizadas = [], []
+    for periodo, id_producto, cantidad, costo, cantidad_sin_costo in zip(
+        fechas, productos.tolist(), cantidades.tolist(), costos.tolist(), sin_costo.tolist()
+    ):
+        fila = existentes.get((periodo, id_producto))
+        if fila is None:
+            nuevas.append({
+                "metodo": metodo, "periodo": periodo, "id_producto": id_producto,
+                "cantidad": cantidad, "costo": round(costo / 100, 2), "cantidad_sin_costo": cantidad_sin_costo
+            })
+        else:
+            actualizadas.append({
+                "metodo": metodo, "periodo": periodo, "id_producto": id_producto,
+                "cantidad": fila.cantidad + cantidad,
+                "costo": round(float(fila.costo) + costo / 100, 2),
+                "cantidad_sin_costo": fila.cantidad_sin_costo + cantidad_sin_costo
+            })
+    if nuevas:
+        db.execute(insert(CostoVentaMensual), nuevas)
+    if actualizadas:
+        db.execute(update(CostoVentaMensual), actualizadas)
+
+
+def procesar(db: Session, metodo: str):
+    """Cost the lots and sales added since the method's checkpoint"""
+    if metodo not in METODOS:
+        raise ValueError(f"Método de costeo desconocido: {metodo}")
+
+    # The row lock keeps two runs of the same method from overlapping
+    checkpoint = db.query(CheckpointCosto).filter(
+        CheckpointCosto.metodo == metodo
+    ).with_for_update().first()
+    if checkpoint is None:
+        checkpoint = CheckpointCosto(metodo=metodo, ultimo_id_lote=0, ultimo_id_venta=0)
+        db.add(checkpoint)
+        db.flush()
+    estado = _deserializar(checkpoint.estado) if checkpoint.estado else _estado_vacio(metodo)
+    # Ids already costed within the lookback window
+    lotes_vistos = estado.pop("lotes_vistos", np.empty(0, dtype=np.int64))
+    ventas_vistas = estado.pop("ventas_vistas", np.empty(0, dtype=np.int64))
+    if metodo == FIFO and "capa_fechas" not in estado:
+        # Layers saved before lots had a receipt date keep their id order
+        estado["capa_fechas"] = np.zeros(len(estado["capa_lotes"]), dtype=np.int64)
+
+    lote_ids, lote_fechas, lote_productos, lote_cantidades, lote_costos = _sin_vistos(
+        lotes_vistos, *cargar_lotes(db, checkpoint.ultimo_id_lote - LOOKBACK_IDS)
+    )
+    venta_ids, fechas, venta_productos, venta_cantidades = _sin_vistos(
+        ventas_vistas, *cargar_ventas(db, checkpoint.ultimo_id_venta - LOOKBACK_IDS)
+    )
+
+    if metodo == PROMEDIO:
+        costos, estado = costear_promedio(
+            estado, lote_productos, lote_cantidades, lote_costos, venta_productos, venta_cantidades
+        )
+    else:
+        costos, estado = costear_fifo(
+            estado, lote_ids, lote_fechas, lote_productos, lote_cantidades, lote_costos,
+            venta_productos, venta_cantidades
+        )
+    _guardar_mensual(db, metodo, *agrupar_mensual(fechas, venta_productos, venta_cantidades, costos))
+
+    checkpoint.ultimo_id_lote, estado["lotes_vistos"] = _ventana(checkpoint.ultimo_id_lote, lotes_vistos, lote_ids)
+    checkpoint.ultimo_id_venta, estado["ventas_vistas"] = _ventana(
+        checkpoint.ultimo_id_venta, ventas_vistas, venta_ids
+    )
+    checkpoint.estado = _serializar(estado)
+    checkpoint.fecha_actualizacion = datetime.now()
+    db.commit()
+    return {
+        "metodo": metodo,
+        "lotes_procesados": len(lote_ids),
+        "lineas_procesadas": len(venta_productos),
+        "ultimo_id_lote": checkpoint.ultimo_id_lote,
+        "ultimo_id_venta": checkpoint.ultimo_id_venta,
+    }
+
+
+# ==================== REPORTS ====================
+def get_costo_ventas(db: Session, metodo: str, desde: date, hasta: date, agrupar: str = "producto"):
+    """Monthly COGS between the months of `desde` and `hasta`, per product or category"""
+    filtros = (
+        CostoVentaMensual.metodo == metodo,
+        CostoVentaMensual.periodo >= desde.replace(day=1),
+        CostoVentaMensual.periodo <= hasta
+    )
+    if agrupar == "categoria":
+        # A product in several categories counts in each of them
+        filas = db.query(
+            CostoVentaMensual.periodo, Categoria.id_categoria, Categoria.nombre_categoria,
+            func.sum(CostoVentaMensual.cantidad), func.sum(CostoVentaMensual.costo),
+            func.sum(CostoVentaMensual.cantidad_sin_costo)
+        ).join(
+            ProductoCategoria, ProductoCategoria.id_producto == CostoVentaMensual.id_producto
+        ).join(
+            Categoria, Categoria.id_categoria == ProductoCategoria.id_categoria
+        ).filter(*filtros).group_by(
+            CostoVentaMensual.periodo, Categoria.id_categoria, Categoria.nombre_categoria
+        ).order_by(CostoVentaMensual.periodo, Categoria.id_categoria).all()
+    else:
+        filas = db.query(
+            CostoVentaMensual.periodo, Producto.id_producto, Producto.nombre_comercial,
+            CostoVentaMensual.cantidad, CostoVentaMensual.costo, CostoVentaMensual.cantidad_sin_costo
+        ).join(
+            Producto, Producto.id_producto == CostoVentaMensual.id_producto
+        ).filter(*filtros).order_by(CostoVentaMensual.periodo, Producto.id_producto).all()
+
+    return [
+        {
+            "periodo": periodo.strftime("%Y-%m"),
+            "id": id_,
+            "nombre": nombre,
+            "cantidad": int(cantidad),
+            "costo": float(costo),
+            "cantidad_sin_costo": int(sin_costo),
+        }
+        for periodo, id_, nombre, cantidad, costo, sin_costo in filas
+    ]
+
+
+if __name__ == "__main__":
+    from .database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        for metodo in METODOS:
+            resultado = procesar(db, metodo)
+            print(f"{metodo}: {resultado['lotes_procesados']} lots, {resultado['lineas_procesadas']} sale lines")
+    finally:
+        db.close()
@@ -1,24 +1,50 @@
-from sqlalchemy.orm import Session
-from sqlalchemy import or_
+from sqlalchemy.orm import Session, joinedload, selectinload
+from sqlalchemy import or_, and_, insert, update, func, select, case, literal, null
+from sqlalchemy.exc import IntegrityError
 from typing import List, Optional
-from datetime import datetime, date
+from datetime import datetime, date, timedelta
 from decimal import Decimal
+import json
 
 from . import schemas
+from .serialization import columnas
+from .sequences import comprobante_allocator, NumeroReservadoError
+from .customers import indice_clientes
+from .facets import indice_facetas
+from .barcodes import escaner_codigos, normalizar, hash_codigo
+from . import pricing, reservations
+from .partitioning import VENTAS_PARTICIONADAS
 from .models import (
     Usuario, Rol, UsuarioRol,
     Cliente, ClienteTelefono,
     Proveedor, ContactoProveedor, Cargo,
     Producto, Categoria, Presentacion, Componente,
-    ProductoCategoria, ProductoPresentacion, ProductoComponente,
+    ProductoCategoria, ProductoPresentacion, ProductoComponente, HistorialPrecio, CodigoBarras,
     Inventario, Lote, UbicacionEstante,
     Pedido, DetallePedido, EstadoPedido, MotivoPedido,
     Compra,
-    Venta, DetalleVenta,
-    Pago, MetodoPago, Comprobante
+    Venta, DetalleVenta, ClaveIdempotencia,
+    Pago, MetodoPago, Comprobante, Promocion,
+    VersionCatalogo, CambioCatalogo, VersionTabla,
+    Evento
 )
 
 
+# List endpoints accept include=<option,...>: each option is a set of labelled
+# columns plus the outer joins they need, added to the list's own projection,
+# so a page is still one statement whatever is included
+def _incluir(query, opciones: dict, include):
+    unidas = set()
+    for nombre in include:
+        extra, joins = opciones[nombre]
+        for destino, condicion in joins:
+            if destino not in unidas:
+                query = query.outerjoin(destino, condicion)
+                unidas.add(destino)
+        query = query.add_columns(*extra)
+    return query
+
+
 # ==================== USUARIO ====================
 def get_usuarios(db: Session, skip: int = 0, limit: int = 100):
     return db.query(Usuario).offset(skip).limit(limit).all()
@@ -80,6 +106,7 @@ def get_rol(db: Session, rol_id: int):
 def create_rol(db: Session, rol: schemas.RolCreate):
     db_rol = Rol(**rol.model_dump())
     db.add(db_rol)
+    registrar_version_tabla(db, "rol")
     db.commit()
     db.refresh(db_rol)
     return db_rol
@@ -93,9 +120,13 @@ def get_cliente(db: Session, cliente_id: int):
     return db.query(Cliente).filter(Cliente.id_cliente == cliente_id).first()
 
 def get_cliente_by_doc(db: Session, nro_doc: str):
-    return db.query(Cliente).filter(Cliente.nro_doc == nro_doc).first()
+    return indice_clientes.buscar(db, nro_doc)
+
+def search_clientes_by_doc(db: Session, prefijo: str, limit: int = 10):
+    return indice_clientes.buscar_prefijo(db, prefijo, limit)
 
 def create_cliente(db: Session, cliente: schemas.ClienteCreate):
+    """Insert a customer; returns None if its document number is taken"""
     db_cliente = Cliente(
         nro_doc=cliente.nro_doc,
         tipo_doc=cliente.tipo_doc,
@@ -106,15 +137,24 @@ def create_cliente(db: Session, cliente: schemas.ClienteCreate):
         direccion=cliente.direccion
     )
     db.add(db_cliente)
-    db.flush()
+    try:
+        # The unique nro_doc is the existence check: no SELECT before the INSERT
+        db.flush()
+    except IntegrityError:
+        db.rollback()
+        if db.query(Cliente.id_cliente).filter(Cliente.nro_doc == cliente.nro_doc).first():
+            return None
+        raise
     
     # Add phones
     for telefono in cliente.telefonos:
         cliente_tel = ClienteTelefono(id_cliente=db_cliente.id_cliente, telefono=telefono)
         db.add(cliente_tel)
     
+    registrar_cambio(db, "cliente", db_cliente.id_cliente)
     db.commit()
     db.refresh(db_cliente)
+    indice_clientes.guardar(db_cliente)
     return db_cliente
 
 def update_cliente(db: Session, cliente_id: int, cliente: schemas.ClienteUpdate):
@@ -122,19 +162,25 @@ def update_cliente(db: Session, cliente_id: int, cliente: schemas.ClienteUpdate)
     if not db_cliente:
         return None
     
+    nro_doc_anterior = db_cliente.nro_doc
     update_data = cliente.model_dump(exclude_unset=True)
     for key, value in update_data.items():
         setattr(db_cliente, key, value)
     
+    registrar_cambio(db, "cliente", db_cliente.id_cliente)
     db.commit()
     db.refresh(db_cliente)
+    indice_clientes.guardar(db_cliente, nro_doc_anterior)
     return db_cliente
 
 def delete_cliente(db: Session, cliente_id: int):
     db_cliente = get_cliente(db, cliente_id)
     if db_cliente:
+        nro_doc = db_cliente.nro_doc
         db.delete(db_cliente)
+        registrar_cambio(db, "cliente", db_cliente.id_cliente, eliminado=True)
         db.commit()
+        indice_clientes.quitar(nro_doc)
     return db_cliente
 
 
@@ -148,6 +194,8 @@ def get_proveedor(db: Session, proveedor_id: int):
 def create_proveedor(db: Session, proveedor: schemas.ProveedorCreate):
     db_proveedor = Proveedor(**proveedor.model_dump())
     db.add(db_proveedor)
+    db.flush()
+    registrar_cambio(db, "proveedor", db_proveedor.id_proveedor)
     db.commit()
     db.refresh(db_proveedor)
     return db_proveedor
@@ -161,6 +209,7 @@ def update_proveedor(db: Session, proveedor_id: int, proveedor: schemas.Proveedo
     for key, value in update_data.items():
         setattr(db_proveedor, key, value)
     
+    registrar_cambio(db, "proveedor", db_proveedor.id_proveedor)
     db.commit()
     db.refresh(db_proveedor)
     return db_proveedor
@@ -169,6 +218,7 @@ def delete_proveedor(db: Session, proveedor_id: int):
     db_proveedor = get_proveedor(db, proveedor_id)
     if db_proveedor:
         db.delete(db_proveedor)
+        registrar_cambio(db, "proveedor", db_proveedor.id_proveedor, eliminado=True)
         db.commit()
     return db_proveedor
 
@@ -180,6 +230,7 @@ def get_cargos(db: Session):
 def create_cargo(db: Session, cargo: schemas.CargoCreate):
     db_cargo = Cargo(**cargo.model_dump())
     db.add(db_cargo)
+    registrar_version_tabla(db, "cargo")
     db.commit()
     db.refresh(db_cargo)
     return db_cargo
@@ -201,11 +252,47 @@ def create_contacto_proveedor(db: Session, contacto: schemas.ContactoProveedorCr
 
 # ==================== PRODUCTO ====================
 def get_productos(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(Producto).offset(skip).limit(limit).all()
+    return db.query(*columnas(Producto, schemas.Producto)).offset(skip).limit(limit).all()
 
 def get_producto(db: Session, producto_id: int):
     return db.query(Producto).filter(Producto.id_producto == producto_id).first()
 
+# Association of each id list in ProductoCreate/ProductoUpdate: (model, column, facet)
+RELACIONES_PRODUCTO = {
+    "categorias": (ProductoCategoria, ProductoCategoria.id_categoria, "categoria"),
+    "presentaciones": (ProductoPresentacion, ProductoPresentacion.id_presentacion, "presentacion"),
+    "componentes": (ProductoComponente, ProductoComponente.id_componente, "componente"),
+}
+
+def _query_producto_detalle(db: Session):
+    # Four statements however many products: the products, then per
+    # association one IN query joined to its categoria/presentacion/componente
+    return db.query(Producto).options(
+        selectinload(Producto.categorias).joinedload(ProductoCategoria.categoria),
+        selectinload(Producto.presentaciones).joinedload(ProductoPresentacion.presentacion),
+        selectinload(Producto.componentes).joinedload(ProductoComponente.componente)
+    )
+
+def _producto_detalle(producto: Producto):
+    def campos(obj, schema):
+        return {campo: getattr(obj, campo) for campo in schema.model_fields}
+
+    return {
+        **campos(producto, schemas.Producto),
+        "categorias": [campos(pc.categoria, schemas.Categoria) for pc in producto.categorias],
+        "presentaciones": [campos(pp.presentacion, schemas.Presentacion) for pp in producto.presentaciones],
+        "componentes": [campos(pc.componente, schemas.Componente) for pc in producto.componentes]
+    }
+
+def get_producto_detalle(db: Session, producto_id: int):
+    """A product with its categories, presentations and components"""
+    producto = _query_producto_detalle(db).filter(Producto.id_producto == producto_id).first()
+    return _producto_detalle(producto) if producto else None
+
+def get_productos_detalle(db: Session, skip: int = 0, limit: int = 100):
+    productos = _query_producto_detalle(db).order_by(Producto.id_producto).offset(skip).limit(limit).all()
+    return [_producto_detalle(producto) for producto in productos]
+
 def get_producto_by_codigo(db: Session, codigo: str):
     return db.query(Producto).filter(Producto.codigo_interno == codigo).first()
 
@@ -242,9 +329,19 @@ def create_producto(db: Session, producto: schemas.ProductoCreate):
     for comp_id in producto.componentes:
         prod_comp = ProductoComponente(id_producto=db_producto.id_producto, id_componente=comp_id)
         db.add(prod_comp)
+
+    db.add(HistorialPrecio(
+        id_producto=db_producto.id_producto, precio_venta=producto.precio_venta, valido_desde=datetime.now()
+    ))
     
+    version = registrar_cambio(db, "producto", db_producto.id_producto)
     db.commit()
     db.refresh(db_producto)
+    indice_facetas.guardar(db_producto, version, {
+        "categoria": producto.categorias,
+        "presentacion": producto.presentaciones,
+        "componente": producto.componentes,
+    })
     return db_producto
 
 def update_producto(db: Session, producto_id: int, producto: schemas.ProductoUpdate):
@@ -253,24 +350,200 @@ def update_producto(db: Session, producto_id: int, producto: schemas.ProductoUpd
         return None
     
     update_data = producto.model_dump(exclude_unset=True)
+    relaciones = {
+        campo: update_data.pop(campo) for campo in RELACIONES_PRODUCTO if campo in update_data
+    }
+    nuevo_precio = update_data.get("precio_venta")
+    if nuevo_precio is not None and nuevo_precio != db_producto.precio_venta:
+        _historial_base(db, [producto_id])
+    else:
+        nuevo_precio = None
     for key, value in update_data.items():
         setattr(db_producto, key, value)
+    if nuevo_precio is not None:
+        db.flush()
+        _registrar_precios(db, [producto_id], datetime.now())
+
+    facetas = {}
+    for campo, ids in relaciones.items():
+        if ids is None:
+            continue
+        _reemplazar_relacion(db, producto_id, campo, ids)
+        facetas[RELACIONES_PRODUCTO[campo][2]] = ids
     
+    version = registrar_cambio(db, "producto", db_producto.id_producto)
     db.commit()
     db.refresh(db_producto)
+    indice_facetas.guardar(db_producto, version, facetas)
+    escaner_codigos.clear()
     return db_producto
 
+def _reemplazar_relacion(db: Session, producto_id: int, campo: str, ids: List[int]):
+    """Make a product's association equal to `ids`: one DELETE for the removed
+    ids and one INSERT for the added ones; unchanged rows are left alone"""
+    model, columna, _ = RELACIONES_PRODUCTO[campo]
+    actuales = set(db.scalars(select(columna).where(model.id_producto == producto_id)))
+    nuevos = set(ids)
+    quitados = actuales - nuevos
+    if quitados:
+        db.query(model).filter(
+            model.id_producto == producto_id, columna.in_(quitados)
+        ).delete(synchronize_session=False)
+    agregados = nuevos - actuales
+    if agregados:
+        db.execute(insert(model), [
+            {"id_producto": producto_id, columna.key: valor} for valor in sorted(agregados)
+        ])
+
 def delete_producto(db: Session, producto_id: int):
     db_producto = get_producto(db, producto_id)
     if db_producto:
+        id_producto = db_producto.id_producto
         db.delete(db_producto)
+        version = registrar_cambio(db, "producto", id_producto, eliminado=True)
         db.commit()
+        indice_facetas.quitar(id_producto, version)
+        escaner_codigos.clear()
     return db_producto
 
 
+# ==================== PRECIOS ====================
+def _historial_base(db: Session, ids):
+    """Record the current price (valido_desde NULL) of products about to be
+    repriced for the first time, so lookups before the change still answer"""
+    db.execute(insert(HistorialPrecio).from_select(
+        ["id_producto", "precio_venta", "valido_desde"],
+        select(Producto.id_producto, Producto.precio_venta, null()).where(
+            Producto.id_producto.in_(ids),
+            ~select(HistorialPrecio.id_historial_precio).where(
+                HistorialPrecio.id_producto == Producto.id_producto
+            ).exists()
+        )
+    ))
+
+def _registrar_precios(db: Session, ids, valido_desde: datetime):
+    """Append the current price of the products to the history"""
+    db.execute(insert(HistorialPrecio).from_select(
+        ["id_producto", "precio_venta", "valido_desde"],
+        select(Producto.id_producto, Producto.precio_venta, literal(valido_desde, HistorialPrecio.valido_desde.type))
+        .where(Producto.id_producto.in_(ids))
+    ))
+
+def _filtro_regla(regla: schemas.ReglaPrecio):
+    condiciones = []
+    if regla.id_categoria is not None:
+        condiciones.append(Producto.id_producto.in_(
+            select(ProductoCategoria.id_producto).where(ProductoCategoria.id_categoria == regla.id_categoria)
+        ))
+    if regla.id_componente is not None:
+        condiciones.append(Producto.id_producto.in_(
+            select(ProductoComponente.id_producto).where(ProductoComponente.id_componente == regla.id_componente)
+        ))
+    return condiciones
+
+def get_productos_inexistentes(db: Session, ids: List[int]):
+    existentes = set(db.scalars(select(Producto.id_producto).where(Producto.id_producto.in_(ids))))
+    return sorted(set(ids) - existentes)
+
+def actualizar_precios(db: Session, cambio: schemas.ActualizacionPrecios):
+    """Apply rule-based and explicit price changes in one transaction: one
+    UPDATE per rule, one executemany for the explicit prices, and one
+    INSERT ... SELECT appending every affected product to the history"""
+    ahora = datetime.now()
+    afectados = {precio.id_producto for precio in cambio.precios}
+    for regla in cambio.reglas:
+        afectados.update(db.scalars(select(Producto.id_producto).where(*_filtro_regla(regla))))
+    if not afectados:
+        return {"actualizados": 0, "valido_desde": ahora}
+    afectados = sorted(afectados)
+
+    _historial_base(db, afectados)
+    for regla in cambio.reglas:
+        nuevo = func.round(Producto.precio_venta * (100 + regla.porcentaje) / 100 + regla.monto, 2)
+        db.execute(
+            update(Producto).where(*_filtro_regla(regla))
+            .values(precio_venta=case((nuevo < 0, 0), else_=nuevo)),
+            execution_options={"synchronize_session": False}
+        )
+    if cambio.precios:
+        # Later entries for the same product win
+        precios = {precio.id_producto: precio.precio_venta for precio in cambio.precios}
+        db.execute(update(Producto), [
+            {"id_producto": id_producto, "precio_venta": precio} for id_producto, precio in precios.items()
+        ])
+    _registrar_precios(db, afectados, ahora)
+
+    version = registrar_cambios(db, "producto", afectados)
+    db.commit()
+    indice_facetas.avanzar(version)
+    escaner_codigos.clear()
+    return {"actualizados": len(afectados), "valido_desde": ahora}
+
+def get_precio_en(db: Session, producto_id: int, fecha: datetime):
+    """The product's price at `fecha`: its last history row from then or
+    before (index on id_producto, valido_desde), or the price it had before
+    its history started; None if unknown"""
+    fila = db.query(HistorialPrecio).filter(
+        HistorialPrecio.id_producto == producto_id,
+        or_(HistorialPrecio.valido_desde <= fecha, HistorialPrecio.valido_desde.is_(None))
+    ).order_by(HistorialPrecio.valido_desde.desc()).first()  # NULL sorts last
+    if fila:
+        return fila
+    if db.query(HistorialPrecio.id_historial_precio).filter(HistorialPrecio.id_producto == producto_id).first():
+        return None  # created after `fecha`
+    # Never repriced since history began: the current price always applied
+    db_producto = get_producto(db, producto_id)
+    if not db_producto:
+        return None
+    return {"id_producto": producto_id, "precio_venta": db_producto.precio_venta, "valido_desde": None}
+
+def get_historial_precios(db: Session, producto_id: int):
+    return db.query(HistorialPrecio).filter(
+        HistorialPrecio.id_producto == producto_id
+    ).order_by(HistorialPrecio.valido_desde.desc()).all()
+
+
+# ==================== CODIGOS DE BARRAS ====================
+# Codes are stored normalized (barcodes.normalizar) and found by their hash
+def get_codigos_barras(db: Session, producto_id: int):
+    return db.query(*columnas(CodigoBarras, schemas.CodigoBarras)).filter(
+        CodigoBarras.id_producto == producto_id
+    ).order_by(CodigoBarras.id_codigo_barras).all()
+
+def get_codigo_barras(db: Session, codigo: str):
+    clave, _ = normalizar(codigo)
+    return db.query(CodigoBarras).filter(
+        CodigoBarras.hash_codigo == hash_codigo(clave), CodigoBarras.codigo == clave
+    ).first()
+
+def create_codigo_barras(db: Session, producto_id: int, codigo: str):
+    """Register a barcode; returns None if the code (or its hash) is already taken,
+    e.g. by a concurrent request that passed the same existence check"""
+    clave, tipo = normalizar(codigo)
+    db_codigo = CodigoBarras(id_producto=producto_id, codigo=clave, hash_codigo=hash_codigo(clave), tipo=tipo)
+    db.add(db_codigo)
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        return None
+    db.refresh(db_codigo)
+    escaner_codigos.clear()
+    return db_codigo
+
+def delete_codigo_barras(db: Session, producto_id: int, codigo: str):
+    db_codigo = get_codigo_barras(db, codigo)
+    if db_codigo is None or db_codigo.id_producto != producto_id:
+        return None
+    db.delete(db_codigo)
+    db.commit()
+    escaner_codigos.clear()
+    return db_codigo
+
+
 # ==================== CATEGORIA ====================
 def get_categorias(db: Session):
-    return db.query(Categoria).all()
+    return db.query(*columnas(Categoria, schemas.Categoria)).all()
 
 def get_categoria(db: Session, categoria_id: int):
     return db.query(Categoria).filter(Categoria.id_categoria == categoria_id).first()
@@ -278,6 +551,8 @@ def get_categoria(db: Session, categoria_id: int):
 def create_categoria(db: Session, categoria: schemas.CategoriaCreate):
     db_categoria = Categoria(**categoria.model_dump())
     db.add(db_categoria)
+    db.flush()
+    registrar_cambio(db, "categoria", db_categoria.id_categoria)
     db.commit()
     db.refresh(db_categoria)
     return db_categoria
@@ -286,13 +561,14 @@ def delete_categoria(db: Session, categoria_id: int):
     db_categoria = get_categoria(db, categoria_id)
     if db_categoria:
         db.delete(db_categoria)
+        registrar_cambio(db, "categoria", db_categoria.id_categoria, eliminado=True)
         db.commit()
     return db_categoria
 
 
 # ==================== PRESENTACION ====================
 def get_presentaciones(db: Session):
-    return db.query(Presentacion).all()
+    return db.query(*columnas(Presentacion, schemas.Presentacion)).all()
 
 def get_presentacion(db: Session, presentacion_id: int):
     return db.query(Presentacion).filter(Presentacion.id_presentacion == presentacion_id).first()
@@ -300,6 +576,8 @@ def get_presentacion(db: Session, presentacion_id: int):
 def create_presentacion(db: Session, presentacion: schemas.PresentacionCreate):
     db_presentacion = Presentacion(**presentacion.model_dump())
     db.add(db_presentacion)
+    db.flush()
+    registrar_cambio(db, "presentacion", db_presentacion.id_presentacion)
     db.commit()
     db.refresh(db_presentacion)
     return db_presentacion
@@ -308,13 +586,14 @@ def delete_presentacion(db: Session, presentacion_id: int):
     db_presentacion = get_presentacion(db, presentacion_id)
     if db_presentacion:
         db.delete(db_presentacion)
+        registrar_cambio(db, "presentacion", db_presentacion.id_presentacion, eliminado=True)
         db.commit()
     return db_presentacion
 
 
 # ==================== COMPONENTE ====================
 def get_componentes(db: Session):
-    return db.query(Componente).all()
+    return db.query(*columnas(Componente, schemas.Componente)).all()
 
 def get_componente(db: Session, componente_id: int):
     return db.query(Componente).filter(Componente.id_componente == componente_id).first()
@@ -322,6 +601,8 @@ def get_componente(db: Session, componente_id: int):
 def create_componente(db: Session, componente: schemas.ComponenteCreate):
     db_componente = Componente(**componente.model_dump())
     db.add(db_componente)
+    db.flush()
+    registrar_cambio(db, "componente", db_componente.id_componente)
     db.commit()
     db.refresh(db_componente)
     return db_componente
@@ -330,10 +611,45 @@ def delete_componente(db: Session, componente_id: int):
     db_componente = get_componente(db, componente_id)
     if db_componente:
         db.delete(db_componente)
+        registrar_cambio(db, "componente", db_componente.id_componente, eliminado=True)
         db.commit()
     return db_componente
 
 
+# ==================== PROMOCION ====================
+# Checkout recompiles the promotion index (promotions.py) when the
+# promocion table version changes
+def get_promociones(db: Session, activas: bool = False):
+    query = db.query(*columnas(Promocion, schemas.Promocion))
+    if activas:
+        hoy = date.today()
+        query = query.filter(
+            Promocion.activa.is_(True),
+            or_(Promocion.fecha_inicio.is_(None), Promocion.fecha_inicio <= hoy),
+            or_(Promocion.fecha_fin.is_(None), Promocion.fecha_fin >= hoy)
+        )
+    return query.order_by(Promocion.id_promocion).all()
+
+def get_promocion(db: Session, promocion_id: int):
+    return db.query(Promocion).filter(Promocion.id_promocion == promocion_id).first()
+
+def create_promocion(db: Session, promocion: schemas.PromocionCreate):
+    db_promocion = Promocion(**promocion.model_dump())
+    db.add(db_promocion)
+    registrar_version_tabla(db, "promocion")
+    db.commit()
+    db.refresh(db_promocion)
+    return db_promocion
+
+def delete_promocion(db: Session, promocion_id: int):
+    db_promocion = get_promocion(db, promocion_id)
+    if db_promocion:
+        db.delete(db_promocion)
+        registrar_version_tabla(db, "promocion")
+        db.commit()
+    return db_promocion
+
+
 # ==================== INVENTARIO ====================
 def get_inventarios(db: Session, skip: int = 0, limit: int = 100):
     inventarios = db.query(Inventario).offset(skip).limit(limit).all()
@@ -406,16 +722,28 @@ def get_inventario_by_producto(db: Session, producto_id: int):
 def create_inventario(db: Session, inventario: schemas.InventarioCreate):
     db_inventario = Inventario(**inventario.model_dump())
     db.add(db_inventario)
+    db.flush()
+    registrar_evento(db, "stock", {
+        "id_inventario": db_inventario.id_inventario,
+        "id_lote": db_inventario.id_lote,
+        "stock_actual": db_inventario.stock_actual
+    })
     db.commit()
     db.refresh(db_inventario)
     return db_inventario
 
 def update_inventario_stock(db: Session, inventario_id: int, stock_actual: int):
-    db_inventario = get_inventario(db, inventario_id)
+    # Query Inventario directly: get_inventario returns the enhanced dict
+    db_inventario = db.query(Inventario).filter(Inventario.id_inventario == inventario_id).first()
     if not db_inventario:
         return None
     
     db_inventario.stock_actual = stock_actual
+    registrar_evento(db, "stock", {
+        "id_inventario": db_inventario.id_inventario,
+        "id_lote": db_inventario.id_lote,
+        "stock_actual": stock_actual
+    })
     db.commit()
     db.refresh(db_inventario)
     return db_inventario
@@ -423,7 +751,7 @@ def update_inventario_stock(db: Session, inventario_id: int, stock_actual: int):
 
 # ==================== LOTE ====================
 def get_lotes(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(Lote).offset(skip).limit(limit).all()
+    return db.query(*columnas(Lote, schemas.Lote)).offset(skip).limit(limit).all()
 
 def get_lote(db: Session, lote_id: int):
     return db.query(Lote).filter(Lote.id_lote == lote_id).first()
@@ -438,19 +766,58 @@ def create_lote(db: Session, lote: schemas.LoteCreate):
 
 # ==================== UBICACION ESTANTE ====================
 def get_ubicaciones(db: Session):
-    return db.query(UbicacionEstante).all()
+    return db.query(*columnas(UbicacionEstante, schemas.UbicacionEstante)).all()
 
 def create_ubicacion(db: Session, ubicacion: schemas.UbicacionEstanteCreate):
     db_ubicacion = UbicacionEstante(**ubicacion.model_dump())
     db.add(db_ubicacion)
+    registrar_version_tabla(db, "ubicacion_estante")
     db.commit()
     db.refresh(db_ubicacion)
     return db_ubicacion
 
 
 # ==================== PEDIDO ====================
-def get_pedidos(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(Pedido).offset(skip).limit(limit).all()
+INCLUDE_PEDIDOS = {
+    "proveedor": ([Proveedor.razon_social], [(Proveedor, Proveedor.id_proveedor == Pedido.id_proveedor)]),
+    "estado": ([EstadoPedido.descripcion.label("estado_pedido")],
+               [(EstadoPedido, EstadoPedido.id_estado_pedido == Pedido.id_estado_pedido)]),
+}
+
+def _proveedores_con_texto(texto: str):
+    return select(Proveedor.id_proveedor).where(Proveedor.razon_social.contains(texto))
+
+def _filtrar_pedidos(query, id_estado_pedido: int = None, id_proveedor: int = None,
+                     desde: date = None, hasta: date = None, texto: str = None):
+    # Served by ix_pedido_estado_fecha / ix_pedido_proveedor_fecha / fecha_solicitud
+    if id_estado_pedido is not None:
+        query = query.filter(Pedido.id_estado_pedido == id_estado_pedido)
+    if id_proveedor is not None:
+        query = query.filter(Pedido.id_proveedor == id_proveedor)
+    if desde is not None:
+        query = query.filter(Pedido.fecha_solicitud >= desde)
+    if hasta is not None:
+        query = query.filter(Pedido.fecha_solicitud <= hasta)
+    if texto:
+        query = query.filter(or_(
+            Pedido.motivo.contains(texto),
+            Pedido.id_proveedor.in_(_proveedores_con_texto(texto))
+        ))
+    return query
+
+def get_pedidos(db: Session, skip: int = 0, limit: int = 100, include=(), **filtros):
+    query = _incluir(db.query(*columnas(Pedido, schemas.Pedido)), INCLUDE_PEDIDOS, include)
+    query = _filtrar_pedidos(query, **filtros)
+    return query.order_by(Pedido.id_pedido).offset(skip).limit(limit).all()
+
+def get_resumen_pedidos(db: Session, **filtros):
+    """Order count per status, one GROUP BY"""
+    query = db.query(
+        Pedido.id_estado_pedido, EstadoPedido.descripcion.label("estado"), func.count().label("cantidad")
+    ).join(EstadoPedido, EstadoPedido.id_estado_pedido == Pedido.id_estado_pedido)
+    return _filtrar_pedidos(query, **filtros).group_by(
+        Pedido.id_estado_pedido, EstadoPedido.descripcion
+    ).order_by(Pedido.id_estado_pedido).all()
 
 def get_pedido(db: Session, pedido_id: int):
     pedido = db.query(Pedido).filter(Pedido.id_pedido == pedido_id).first()
@@ -524,6 +891,11 @@ def create_pedido(db: Session, pedido: schemas.PedidoCreate, usuario_id: int):
         )
         db.add(db_detalle)
 
+    registrar_evento(db, "pedido", {
+        "id_pedido": db_pedido.id_pedido,
+        "id_proveedor": db_pedido.id_proveedor,
+        "id_estado_pedido": db_pedido.id_estado_pedido
+    })
     db.commit()
     db.refresh(db_pedido)
     return db_pedido
@@ -535,6 +907,7 @@ def update_pedido_estado(db: Session, pedido_id: int, estado_id: int):
         return None
 
     db_pedido.id_estado_pedido = estado_id
+    registrar_evento(db, "pedido_estado", {"id_pedido": pedido_id, "id_estado_pedido": estado_id})
     db.commit()
     db.refresh(db_pedido)
     return db_pedido
@@ -542,11 +915,12 @@ def update_pedido_estado(db: Session, pedido_id: int, estado_id: int):
 
 # ==================== ESTADO PEDIDO ====================
 def get_estados_pedido(db: Session):
-    return db.query(EstadoPedido).all()
+    return db.query(*columnas(EstadoPedido, schemas.EstadoPedido)).all()
 
 def create_estado_pedido(db: Session, estado: schemas.EstadoPedidoCreate):
     db_estado = EstadoPedido(**estado.model_dump())
     db.add(db_estado)
+    registrar_version_tabla(db, "estado_pedido")
     db.commit()
     db.refresh(db_estado)
     return db_estado
@@ -554,19 +928,61 @@ def create_estado_pedido(db: Session, estado: schemas.EstadoPedidoCreate):
 
 # ==================== MOTIVO PEDIDO ====================
 def get_motivos_pedido(db: Session):
-    return db.query(MotivoPedido).all()
+    return db.query(*columnas(MotivoPedido, schemas.MotivoPedido)).all()
 
 def create_motivo_pedido(db: Session, motivo: schemas.MotivoPedidoCreate):
     db_motivo = MotivoPedido(**motivo.model_dump())
     db.add(db_motivo)
+    registrar_version_tabla(db, "motivo_pedido")
     db.commit()
     db.refresh(db_motivo)
     return db_motivo
 
 
 # ==================== COMPRA ====================
-def get_compras(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(Compra).offset(skip).limit(limit).all()
+_PEDIDO_DE_COMPRA = (Pedido, Pedido.id_pedido == Compra.id_pedido)
+INCLUDE_COMPRAS = {
+    "proveedor": ([Proveedor.razon_social],
+                  [_PEDIDO_DE_COMPRA, (Proveedor, Proveedor.id_proveedor == Pedido.id_proveedor)]),
+    "estado": ([EstadoPedido.descripcion.label("estado_pedido")],
+               [_PEDIDO_DE_COMPRA, (EstadoPedido, EstadoPedido.id_estado_pedido == Pedido.id_estado_pedido)]),
+}
+
+def _filtrar_compras(query, estado: str = None, id_proveedor: int = None,
+                     desde: date = None, hasta: date = None, texto: str = None):
+    # Served by ix_compra_estado_fecha / fecha_recepcion; the supplier goes
+    # through the order (pedido.id_pedido is the PK, compra.id_pedido unique)
+    if estado is not None:
+        query = query.filter(Compra.estado == estado)
+    if id_proveedor is not None:
+        query = query.filter(Compra.id_pedido.in_(
+            select(Pedido.id_pedido).where(Pedido.id_proveedor == id_proveedor)
+        ))
+    if desde is not None:
+        query = query.filter(Compra.fecha_recepcion >= desde)
+    if hasta is not None:
+        query = query.filter(Compra.fecha_recepcion <= hasta)
+    if texto:
+        query = query.filter(or_(
+            Compra.nro_comprobante.contains(texto),
+            Compra.nro_guia.contains(texto),
+            Compra.id_pedido.in_(
+                select(Pedido.id_pedido).where(Pedido.id_proveedor.in_(_proveedores_con_texto(texto)))
+            )
+        ))
+    return query
+
+def get_compras(db: Session, skip: int = 0, limit: int = 100, include=(), **filtros):
+    query = _incluir(db.query(*columnas(Compra, schemas.Compra)), INCLUDE_COMPRAS, include)
+    query = _filtrar_compras(query, **filtros)
+    return query.order_by(Compra.id_compra).offset(skip).limit(limit).all()
+
+def get_resumen_compras(db: Session, **filtros):
+    """Purchase count and amount per status, one GROUP BY"""
+    query = db.query(
+        Compra.estado, func.count().label("cantidad"), func.coalesce(func.sum(Compra.monto_total), 0).label("monto_total")
+    )
+    return _filtrar_compras(query, **filtros).group_by(Compra.estado).order_by(Compra.estado).all()
 
 def get_compra(db: Session, compra_id: int):
     return db.query(Compra).filter(Compra.id_compra == compra_id).first()
@@ -593,19 +1009,147 @@ def update_compra(db: Session, compra_id: int, compra: schemas.CompraUpdate):
 
 
 # ==================== VENTA ====================
-def get_ventas(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(Venta).offset(skip).limit(limit).all()
+# Default window for sale listings when the sales tables are partitioned
+# (partitioning.py), so the listing always carries the partition key
+VENTAS_DIAS_DEFECTO = 31
+
+INCLUDE_VENTAS = {
+    "cliente": ([(Cliente.nombres + " " + Cliente.apellido_paterno).label("cliente_nombre")],
+                [(Cliente, Cliente.id_cliente == Venta.id_cliente)]),
+    "comprobante": ([Comprobante.tipo_comprobante, Comprobante.nro_comprobante],
+                    [(Comprobante, Comprobante.id_venta == Venta.id_venta)]),
+    "metodo_pago": ([MetodoPago.descripcion.label("metodo_pago")],
+                    [(Pago, Pago.id_venta == Venta.id_venta), (MetodoPago, MetodoPago.id_metodo_pago == Pago.id_metodo_pago)]),
+}
+
+def get_ventas(db: Session, skip: int = 0, limit: int = 100, desde: date = None, hasta: date = None,
+               include=()):
+    if VENTAS_PARTICIONADAS:
+        hasta = hasta or date.today()
+        desde = desde or hasta - timedelta(days=VENTAS_DIAS_DEFECTO)
+    query = _incluir(db.query(*columnas(Venta, schemas.Venta)), INCLUDE_VENTAS, include)
+    if desde:
+        query = query.filter(Venta.fecha_venta >= desde)
+    if hasta:
+        query = query.filter(Venta.fecha_venta <= hasta)
+    return query.order_by(Venta.fecha_venta.desc(), Venta.id_venta.desc()).offset(skip).limit(limit).all()
+
+def _query_venta_detalle(db: Session):
+    # Two statements however many sales: venta joined to its one-to-one rows,
+    # then every line (with its product) of those sales in one IN query
+    return db.query(Venta).options(
+        joinedload(Venta.cliente),
+        joinedload(Venta.pago).joinedload(Pago.metodo),
+        joinedload(Venta.comprobante),
+        selectinload(Venta.detalles).joinedload(DetalleVenta.producto)
+    )
 
-def get_venta(db: Session, venta_id: int):
-    return db.query(Venta).filter(Venta.id_venta == venta_id).first()
+def _venta_detalle(venta: Venta):
+    cliente, pago, comprobante = venta.cliente, venta.pago, venta.comprobante
+    return {
+        "id_venta": venta.id_venta,
+        "id_cliente": venta.id_cliente,
+        "id_usuario": venta.id_usuario,
+        "fecha_venta": venta.fecha_venta,
+        "hora_venta": venta.hora_venta,
+        "monto_total": venta.monto_total,
+        "cliente": {
+            "nro_doc": cliente.nro_doc,
+            "tipo_doc": cliente.tipo_doc,
+            "nombres": cliente.nombres,
+            "apellido_paterno": cliente.apellido_paterno,
+            "apellido_materno": cliente.apellido_materno
+        } if cliente else None,
+        "detalles": [
+            {
+                "id_producto": detalle.id_producto,
+                "nombre_comercial": detalle.producto.nombre_comercial,
+                "cantidad": detalle.cantidad,
+                "precio_unitario_venta": detalle.precio_unitario_venta,
+                "subtotal": detalle.subtotal
+            }
+            for detalle in venta.detalles
+        ],
+        "pago": {
+            "id_metodo_pago": pago.id_metodo_pago,
+            "metodo_pago": pago.metodo.descripcion,
+            "fecha_hora": pago.fecha_hora,
+            "monto": pago.monto
+        } if pago else None,
+        "comprobante": {
+            "tipo_comprobante": comprobante.tipo_comprobante,
+            "nro_comprobante": comprobante.nro_comprobante
+        } if comprobante else None
+    }
 
-def create_venta(db: Session, venta: schemas.VentaCreate, usuario_id: int):
-    # Calculate total
-    monto_total = sum(
-        detalle.cantidad * detalle.precio_unitario_venta 
-        for detalle in venta.detalles
-    )
+def get_venta(db: Session, venta_id: int, fecha_venta: date = None):
+    """Sale with its customer, lines, payment and receipt, or None"""
+    query = _query_venta_detalle(db).filter(Venta.id_venta == venta_id)
+    if fecha_venta is not None:
+        query = query.filter(Venta.fecha_venta == fecha_venta)
+    venta = query.first()
+    return _venta_detalle(venta) if venta else None
+
+def get_ventas_detalle(db: Session, venta_ids: List[int], desde: date = None, hasta: date = None):
+    """Several full sales (e.g. to print their receipts), in the order requested.
+    The date range of the sales, when known, lets a partitioned venta table read
+    only those partitions"""
+    query = _query_venta_detalle(db).filter(Venta.id_venta.in_(venta_ids))
+    if desde is not None:
+        query = query.filter(Venta.fecha_venta >= desde)
+    if hasta is not None:
+        query = query.filter(Venta.fecha_venta <= hasta)
+    ventas = {venta.id_venta: venta for venta in query}
+    return [_venta_detalle(ventas[venta_id]) for venta_id in dict.fromkeys(venta_ids) if venta_id in ventas]
+
+def get_rango_ids_venta(db: Session, desde: date, hasta: date):
+    """(min, max) id_venta of the sales in the date range, or (0, -1) if there are none.
+    detalle_venta has no date column; filtering its lines by this range lets
+    MySQL prune its id_venta partitions (and narrows the PK scan otherwise)"""
+    minimo, maximo = db.query(func.min(Venta.id_venta), func.max(Venta.id_venta)).filter(
+        Venta.fecha_venta.between(desde, hasta)
+    ).one()
+    return (minimo, maximo) if minimo is not None else (0, -1)
+
+# How long an Idempotency-Key keeps replaying the sale it created
+IDEMPOTENCIA_TTL = timedelta(hours=24)
+
+def get_venta_by_idempotency_key(db: Session, clave: str):
+    # Single primary-key lookup on clave_idempotencia joined to venta on its
+    # full key, so a partitioned venta reads one partition
+    return db.query(Venta).join(
+        ClaveIdempotencia, and_(
+            ClaveIdempotencia.id_venta == Venta.id_venta,
+            ClaveIdempotencia.fecha_venta == Venta.fecha_venta
+        )
+    ).filter(
+        ClaveIdempotencia.clave == clave,
+        ClaveIdempotencia.fecha_expiracion > datetime.now()
+    ).first()
+
+def purge_claves_idempotencia(db: Session):
+    deleted = db.query(ClaveIdempotencia).filter(
+        ClaveIdempotencia.fecha_expiracion <= datetime.now()
+    ).delete(synchronize_session=False)
+    db.commit()
+    return deleted
+
+def create_venta(db: Session, venta: schemas.VentaCreate, usuario_id: int,
+                 idempotency_key: Optional[str] = None, carrito: dict = None):
+    # Prices, IGV and stock from the server, in one read (pricing.py)
+    if carrito is None:
+        carrito = pricing.cotizar(db, venta.detalles, venta.id_carrito)
+    if not carrito["valido"]:
+        raise pricing.CarritoInvalidoError(carrito)
+    monto_total = carrito["total"]
     
+    # Receipt number from the worker's reserved block when not supplied;
+    # taken before any write so it never waits on this sale's locks. Numbers
+    # in a server-numbered series may only come from the allocator
+    if venta.nro_comprobante and comprobante_allocator.es_asignada(venta.nro_comprobante):
+        raise NumeroReservadoError(venta.nro_comprobante)
+    nro_comprobante = venta.nro_comprobante or comprobante_allocator.next_numero(venta.tipo_comprobante)
+
     now = datetime.now()
     db_venta = Venta(
         id_cliente=venta.id_cliente,
@@ -616,18 +1160,53 @@ def create_venta(db: Session, venta: schemas.VentaCreate, usuario_id: int):
     )
     db.add(db_venta)
     db.flush()
+
+    # Claim the idempotency key before writing the rest of the sale, so a
+    # concurrent retry with the same key fails here instead of at commit
+    if idempotency_key:
+        db.add(ClaveIdempotencia(
+            clave=idempotency_key,
+            id_venta=db_venta.id_venta,
+            fecha_venta=db_venta.fecha_venta,
+            fecha_expiracion=now + IDEMPOTENCIA_TTL
+        ))
+        try:
+            db.flush()
+        except IntegrityError:
+            db.rollback()
+            db_original = get_venta_by_idempotency_key(db, idempotency_key)
+            if db_original:
+                return db_original
+            # The key exists but has expired: clear stale keys and retry once
+            purge_claves_idempotencia(db)
+            return create_venta(db, venta, usuario_id, idempotency_key, carrito)
     
     # Add details
-    for detalle in venta.detalles:
-        subtotal = detalle.cantidad * detalle.precio_unitario_venta
+    for linea in carrito["lineas"]:
         db_detalle = DetalleVenta(
             id_venta=db_venta.id_venta,
-            id_producto=detalle.id_producto,
-            cantidad=detalle.cantidad,
-            precio_unitario_venta=detalle.precio_unitario_venta,
-            subtotal=subtotal
+            id_producto=linea["id_producto"],
+            cantidad=linea["cantidad"],
+            precio_unitario_venta=linea["precio_unitario_venta"],
+            subtotal=linea["subtotal"] - linea["descuento"]  # net of promotions
         )
         db.add(db_detalle)
+
+    # Take the units out of stock, converting the cart's reservations
+    try:
+        cambios = reservations.convertir(db, venta.id_carrito, carrito["lineas"])
+    except reservations.StockInsuficienteError as e:
+        db.rollback()
+        for linea in carrito["lineas"]:
+            if linea["id_producto"] in e.faltantes:
+                linea["error"] = "Stock insuficiente"
+        raise pricing.CarritoInvalidoError(carrito)
+    for id_inventario, id_lote, stock_actual in cambios:
+        registrar_evento(db, "stock", {
+            "id_inventario": id_inventario,
+            "id_lote": id_lote,
+            "stock_actual": stock_actual
+        })
     
     # Add payment
     db_pago = Pago(
@@ -642,22 +1221,452 @@ def create_venta(db: Session, venta: schemas.VentaCreate, usuario_id: int):
     db_comprobante = Comprobante(
         id_venta=db_venta.id_venta,
         tipo_comprobante=venta.tipo_comprobante,
-        nro_comprobante=venta.nro_comprobante
+        nro_comprobante=nro_comprobante
     )
     db.add(db_comprobante)
-    
+
+    registrar_evento(db, "venta", {
+        "id_venta": db_venta.id_venta,
+        "id_cliente": db_venta.id_cliente,
+        "monto_total": monto_total,
+        "productos": [detalle.id_producto for detalle in venta.detalles]
+    })
     db.commit()
     db.refresh(db_venta)
     return db_venta
 
 
+def insert_returning_ids(db: Session, model, pk, rows: List[dict]):
+    """Insert many rows and return their generated ids in input order"""
+    if not rows:
+        return []
+    if db.get_bind().dialect.insert_executemany_returning_sort_by_parameter_order:
+        return list(db.scalars(insert(model).returning(pk, sort_by_parameter_order=True), rows))
+    if db.get_bind().dialect.name == "mysql":
+        # No RETURNING: a single multi-row INSERT gets a consecutive block of
+        # ids from InnoDB, and LAST_INSERT_ID() is the first of them
+        primero = db.execute(insert(model).values(rows)).lastrowid
+        return list(range(primero, primero + len(rows)))
+    return [db.execute(insert(model).values(**row)).inserted_primary_key[0] for row in rows]
+
+def _faltantes_por_venta(lote, faltantes: dict):
+    """Charge each product's missing units to the last sales of the lote that
+    sold it (the earlier ones took the stock): {indice: {id_producto: units}}"""
+    por_venta = {}
+    pendientes = dict(faltantes)
+    for indice, venta, _, _ in reversed(lote):
+        for detalle in venta.detalles:
+            falta = min(pendientes.get(detalle.id_producto, 0), detalle.cantidad)
+            if falta:
+                por_venta.setdefault(indice, {})[detalle.id_producto] = falta
+                pendientes[detalle.id_producto] -= falta
+    return por_venta
+
+def _insert_ventas_batch(db: Session, lote, now: datetime):
+    """Take the units of (indice, venta, nro_comprobante, venta_row) sales out
+    of stock and insert them with one executemany per table. The sales already
+    happened, so they are stored even when stock does not cover them. Returns
+    their id_venta in order and {indice: {id_producto: units not in stock}}"""
+    cantidades = {}
+    for _, venta, _, _ in lote:
+        for detalle in venta.detalles:
+            cantidades[detalle.id_producto] = cantidades.get(detalle.id_producto, 0) + detalle.cantidad
+    cambios, faltantes = reservations.descontar(db, None, [
+        {"id_producto": id_producto, "cantidad": cantidad} for id_producto, cantidad in cantidades.items()
+    ])
+
+    venta_ids = insert_returning_ids(db, Venta, Venta.id_venta, [venta_row for _, _, _, venta_row in lote])
+
+    detalle_rows = []
+    pago_rows = []
+    comprobante_rows = []
+    clave_rows = []
+    for (_, venta, nro_comprobante, venta_row), id_venta in zip(lote, venta_ids):
+        for detalle in venta.detalles:
+            detalle_rows.append({
+                "id_venta": id_venta,
+                "id_producto": detalle.id_producto,
+                "cantidad": detalle.cantidad,
+                "precio_unitario_venta": detalle.precio_unitario_venta,
+                "subtotal": detalle.cantidad * detalle.precio_unitario_venta
+            })
+        pago_rows.append({
+            "id_venta": id_venta,
+            "id_metodo_pago": venta.id_metodo_pago,
+            "fecha_hora": venta.fecha_hora or now,
+            "monto": venta_row["monto_total"]
+        })
+        comprobante_rows.append({
+            "id_venta": id_venta,
+            "tipo_comprobante": venta.tipo_comprobante,
+            "nro_comprobante": nro_comprobante
+        })
+        if venta.idempotency_key:
+            clave_rows.append({
+                "clave": venta.idempotency_key,
+                "id_venta": id_venta,
+                "fecha_venta": venta_row["fecha_venta"],
+                "fecha_expiracion": now + IDEMPOTENCIA_TTL
+            })
+
+    # executemany per table
+    db.execute(insert(DetalleVenta), detalle_rows)
+    db.execute(insert(Pago), pago_rows)
+    db.execute(insert(Comprobante), comprobante_rows)
+    if clave_rows:
+        db.execute(insert(ClaveIdempotencia), clave_rows)
+    db.execute(insert(Evento), [
+        evento_row("venta", {
+            "id_venta": id_venta,
+            "id_cliente": venta.id_cliente,
+            "monto_total": venta_row["monto_total"],
+            "productos": [detalle.id_producto for detalle in venta.detalles]
+        })
+        for (_, venta, _, venta_row), id_venta in zip(lote, venta_ids)
+    ] + [
+        evento_row("stock", {"id_inventario": id_inventario, "id_lote": id_lote, "stock_actual": stock_actual})
+        for id_inventario, id_lote, stock_actual in cambios
+    ])
+    return venta_ids, _faltantes_por_venta(lote, faltantes)
+
+def create_ventas_batch(db: Session, ventas: List[schemas.VentaBatchItem], usuario_id: int,
+                        atomico: bool = False):
+    now = datetime.now()
+    resultados = [{"indice": indice} for indice in range(len(ventas))]
+
+    # One lookup per referenced table for the whole batch
+    producto_ids = {detalle.id_producto for venta in ventas for detalle in venta.detalles}
+    precios = {
+        row.id_producto: row.precio_venta for row in
+        db.query(Producto.id_producto, Producto.precio_venta).filter(Producto.id_producto.in_(producto_ids))
+    } if producto_ids else {}
+    cliente_ids = {venta.id_cliente for venta in ventas}
+    clientes = {
+        row.id_cliente for row in
+        db.query(Cliente.id_cliente).filter(Cliente.id_cliente.in_(cliente_ids))
+    } if cliente_ids else set()
+    metodo_ids = {venta.id_metodo_pago for venta in ventas}
+    metodos = {
+        row.id_metodo_pago for row in
+        db.query(MetodoPago.id_metodo_pago).filter(MetodoPago.id_metodo_pago.in_(metodo_ids))
+    } if metodo_ids else set()
+    nros = [venta.nro_comprobante for venta in ventas if venta.nro_comprobante]
+    nros_usados = {
+        row.nro_comprobante for row in
+        db.query(Comprobante.nro_comprobante).filter(Comprobante.nro_comprobante.in_(nros))
+    } if nros else set()
+    claves = [venta.idempotency_key for venta in ventas if venta.idempotency_key]
+    replays = {
+        row.clave: row for row in
+        db.query(ClaveIdempotencia.clave, Venta.id_venta, Comprobante.nro_comprobante)
+        .join(Venta, and_(Venta.id_venta == ClaveIdempotencia.id_venta,
+                          Venta.fecha_venta == ClaveIdempotencia.fecha_venta))
+        .outerjoin(Comprobante, Comprobante.id_venta == Venta.id_venta)
+        .filter(ClaveIdempotencia.clave.in_(claves), ClaveIdempotencia.fecha_expiracion > now)
+    } if claves else {}
+
+    # Validate every sale against the lookups
+    validas = []
+    nros_batch = set()
+    claves_batch = set()
+    for indice, venta in enumerate(ventas):
+        resultado = resultados[indice]
+        if venta.idempotency_key in replays:
+            replay = replays[venta.idempotency_key]
+            resultado.update(id_venta=replay.id_venta, nro_comprobante=replay.nro_comprobante, replay=True)
+            continue
+
+        error = None
+        producto_ids_venta = [detalle.id_producto for detalle in venta.detalles]
+        if not venta.detalles:
+            error = "Venta sin detalles"
+        elif len(set(producto_ids_venta)) != len(producto_ids_venta):
+            error = "Producto repetido en los detalles"
+        elif any(detalle.id_producto not in precios for detalle in venta.detalles):
+            error = "Producto no encontrado"
+        elif any(detalle.precio_unitario_venta is None for detalle in venta.detalles):
+            # Sales made offline keep the price the terminal charged
+            error = "Precio requerido en ventas por lote"
+        elif any(detalle.cantidad <= 0 or detalle.precio_unitario_venta < 0 for detalle in venta.detalles):
+            error = "Cantidad o precio inválido"
+        elif (desactualizado := next((detalle for detalle in venta.detalles
+                                      if detalle.precio_unitario_venta != precios[detalle.id_producto]), None)):
+            # Same check as pricing.cotizar on a live sale
+            error = (f"Precio desactualizado (producto {desactualizado.id_producto}, "
+                     f"actual: {precios[desactualizado.id_producto]})")
+        elif venta.id_cliente not in clientes:
+            error = "Cliente no encontrado"
+        elif venta.id_metodo_pago not in metodos:
+            error = "Método de pago no encontrado"
+        elif venta.nro_comprobante and comprobante_allocator.es_asignada(venta.nro_comprobante):
+            error = "Número de comprobante de una serie numerada por el servidor"
+        elif venta.nro_comprobante and (venta.nro_comprobante in nros_usados or venta.nro_comprobante in nros_batch):
+            error = "Número de comprobante ya registrado"
+        elif venta.idempotency_key and venta.idempotency_key in claves_batch:
+            error = "Idempotency-Key repetida en el lote"
+
+        if error:
+            resultado["error"] = error
+            continue
+        if venta.nro_comprobante:
+            nros_batch.add(venta.nro_comprobante)
+        if venta.idempotency_key:
+            claves_batch.add(venta.idempotency_key)
+        validas.append((indice, venta))
+
+    if not validas:
+        return resultados
+    if atomico and any("error" in resultado for resultado in resultados):
+        for indice, _ in validas:
+            resultados[indice]["error"] = "No registrada: el lote contiene ventas inválidas"
+        return resultados
+
+    # Receipt numbers are taken before any write, as in create_venta
+    numeros = [
+        venta.nro_comprobante or comprobante_allocator.next_numero(venta.tipo_comprobante)
+        for _, venta in validas
+    ]
+
+    lote = []
+    for (indice, venta), nro_comprobante in zip(validas, numeros):
+        fecha_hora = venta.fecha_hora or now
+        lote.append((indice, venta, nro_comprobante, {
+            "id_cliente": venta.id_cliente,
+            "id_usuario": usuario_id,
+            "fecha_venta": fecha_hora.date(),
+            "hora_venta": fecha_hora.time(),
+            "monto_total": sum(detalle.cantidad * detalle.precio_unitario_venta for detalle in venta.detalles)
+        }))
+
+    # Sales made offline on earlier days change closed date ranges, whose
+    # cached analytics are keyed on the venta version
+    atrasadas = any(venta_row["fecha_venta"] < now.date() for _, _, _, venta_row in lote)
+
+    try:
+        venta_ids, faltantes = _insert_ventas_batch(db, lote, now)
+        if atrasadas:
+            registrar_version_tabla(db, "venta")
+        db.commit()
+    except IntegrityError:
+        # Lost a race with another terminal (receipt number or key): nothing
+        # was stored
+        db.rollback()
+        if atomico:
+            for indice, _ in validas:
+                resultados[indice]["error"] = "Conflicto al registrar el lote, reintentar"
+            return resultados
+        # Register the sales one by one, each in its own savepoint, so only
+        # the failing ones are left out
+        venta_ids = []
+        faltantes = {}
+        for item in lote:
+            try:
+                with db.begin_nested():
+                    ids, faltantes_item = _insert_ventas_batch(db, [item], now)
+                venta_ids.extend(ids)
+                faltantes.update(faltantes_item)
+            except IntegrityError:
+                venta_ids.append(None)
+                resultados[item[0]]["error"] = "Conflicto al registrar la venta (comprobante o Idempotency-Key ya registrados)"
+        if atrasadas and any(id_venta is not None for id_venta in venta_ids):
+            registrar_version_tabla(db, "venta")
+        db.commit()
+
+    for (indice, _, nro_comprobante, _), id_venta in zip(lote, venta_ids):
+        if id_venta is not None:
+            resultados[indice].update(id_venta=id_venta, nro_comprobante=nro_comprobante)
+    for indice, faltan in faltantes.items():
+        resultados[indice]["advertencia"] = "Stock insuficiente, registrada igualmente (" + ", ".join(
+            f"producto {id_producto}: faltan {falta}" for id_producto, falta in faltan.items()
+        ) + ")"
+    return resultados
+
 # ==================== METODO PAGO ====================
 def get_metodos_pago(db: Session):
-    return db.query(MetodoPago).all()
+    return db.query(*columnas(MetodoPago, schemas.MetodoPago)).all()
 
 def create_metodo_pago(db: Session, metodo: schemas.MetodoPagoCreate):
     db_metodo = MetodoPago(**metodo.model_dump())
     db.add(db_metodo)
+    db.flush()
+    registrar_cambio(db, "metodo_pago", db_metodo.id_metodo_pago)
     db.commit()
     db.refresh(db_metodo)
     return db_metodo
+
+
+
+# ==================== SYNC ====================
+# Catalog tables exposed through the delta-sync feed
+CATALOGO_SYNC = {
+    "producto": (Producto, Producto.id_producto),
+    "cliente": (Cliente, Cliente.id_cliente),
+    "proveedor": (Proveedor, Proveedor.id_proveedor),
+    "categoria": (Categoria, Categoria.id_categoria),
+    "presentacion": (Presentacion, Presentacion.id_presentacion),
+    "componente": (Componente, Componente.id_componente),
+    "metodo_pago": (MetodoPago, MetodoPago.id_metodo_pago),
+}
+
+def _siguiente_version(db: Session):
+    # The UPDATE keeps the counter row locked until the caller commits, so
+    # concurrent catalog writes are serialized and commit in version order.
+    # Callers take it last, right before commit, so the lock covers only the
+    # version rows and the commit itself.
+    result = db.execute(
+        update(VersionCatalogo).where(VersionCatalogo.id == 1)
+        .values(version=VersionCatalogo.version + 1)
+    )
+    if result.rowcount == 0:
+        db.add(VersionCatalogo(id=1, version=1))
+        db.flush()
+        return 1
+    return db.query(VersionCatalogo.version).filter(VersionCatalogo.id == 1).scalar()
+
+def get_version_catalogo(db: Session):
+    return db.query(VersionCatalogo.version).filter(VersionCatalogo.id == 1).scalar() or 0
+
+def _version_tabla(db: Session, tabla: str):
+    # Flush the caller's pending writes (and their cascades) before the
+    # counter is locked; returns the table's version row, if any
+    db.flush()
+    return db.get(VersionTabla, tabla)
+
+def _asignar_version_tabla(db: Session, tabla: str, db_version, version: int):
+    if db_version:
+        db_version.version = version
+    else:
+        db.add(VersionTabla(tabla=tabla, version=version))
+
+def registrar_version_tabla(db: Session, tabla: str):
+    """Bump a table's version (the list ETag) in the caller's transaction; used
+    directly by reference tables that are not part of the sync feed (call
+    right before commit)"""
+    db_version = _version_tabla(db, tabla)
+    version = _siguiente_version(db)
+    _asignar_version_tabla(db, tabla, db_version, version)
+    db.flush()
+    return version
+
+def registrar_cambio(db: Session, tabla: str, id_registro: int, eliminado: bool = False):
+    """Record a catalog row change in the caller's transaction (call right before commit)"""
+    db_version = _version_tabla(db, tabla)
+    db_cambio = db.get(CambioCatalogo, (tabla, id_registro))
+    version = _siguiente_version(db)
+    _asignar_version_tabla(db, tabla, db_version, version)
+    if db_cambio:
+        db_cambio.version = version
+        db_cambio.eliminado = eliminado
+    else:
+        db.add(CambioCatalogo(tabla=tabla, id_registro=id_registro, version=version, eliminado=eliminado))
+    db.flush()
+    return version
+
+def registrar_cambios(db: Session, tabla: str, ids: List[int]):
+    """registrar_cambio for many rows of one table: one UPDATE for the rows
+    already in cambio_catalogo and one INSERT for the rest"""
+    db_version = _version_tabla(db, tabla)
+    existentes = set(db.scalars(select(CambioCatalogo.id_registro).where(
+        CambioCatalogo.tabla == tabla, CambioCatalogo.id_registro.in_(ids)
+    )))
+    version = _siguiente_version(db)
+    _asignar_version_tabla(db, tabla, db_version, version)
+    db.flush()
+    if existentes:
+        db.execute(
+            update(CambioCatalogo).where(
+                CambioCatalogo.tabla == tabla, CambioCatalogo.id_registro.in_(existentes)
+            ).values(version=version, eliminado=False),
+            execution_options={"synchronize_session": False}
+        )
+    nuevos = [id_registro for id_registro in ids if id_registro not in existentes]
+    if nuevos:
+        db.execute(insert(CambioCatalogo), [
+            {"tabla": tabla, "id_registro": id_registro, "version": version, "eliminado": False}
+            for id_registro in nuevos
+        ])
+    return version
+
+def get_version_tabla(db: Session, tabla: str):
+    """Version of a table's last change; 0 if it never changed through the API"""
+    return db.query(VersionTabla.version).filter(VersionTabla.tabla == tabla).scalar() or 0
+
+def get_version_tablas(db: Session, tablas):
+    """Latest version among several tables (versions are catalog-wide, so the
+    max changes whenever any of them does)"""
+    return db.query(func.max(VersionTabla.version)).filter(VersionTabla.tabla.in_(tablas)).scalar() or 0
+
+def get_version_registro(db: Session, tabla: str, id_registro: int):
+    """Version of a catalog row's last change, read without loading the row"""
+    return db.query(CambioCatalogo.version).filter(
+        CambioCatalogo.tabla == tabla,
+        CambioCatalogo.id_registro == id_registro
+    ).scalar() or 0
+
+def get_cambios_catalogo(db: Session, since: int = 0, limit: int = 5000):
+    """Catalog rows changed after version `since`, about `limit` per page (a
+    page always holds every row of its last version); since=0 returns a full
+    snapshot"""
+    cambios = {tabla: [] for tabla in CATALOGO_SYNC}
+    eliminados = {tabla: [] for tabla in CATALOGO_SYNC}
+
+    if since <= 0:
+        version = get_version_catalogo(db)
+        for tabla, (model, _) in CATALOGO_SYNC.items():
+            cambios[tabla] = db.query(model).all()
+        return {"version": version, "completo": True, "cambios": cambios, "eliminados": eliminados}
+
+    registros = db.query(CambioCatalogo).filter(
+        CambioCatalogo.version > since
+    ).order_by(CambioCatalogo.version).limit(limit + 1).all()
+    completo = len(registros) <= limit
+    if not completo and registros[limit].version == registros[limit - 1].version:
+        # The cursor is a version, so a page never ends inside one: a bulk
+        # change (e.g. repricing) shares one version across all its rows, and
+        # the rows left out would be skipped by the next page. The page is
+        # completed with the rest of that version, even beyond `limit`.
+        ultima = registros[limit - 1].version
+        registros = [registro for registro in registros if registro.version < ultima] + db.query(
+            CambioCatalogo
+        ).filter(CambioCatalogo.version == ultima).all()
+        completo = db.query(CambioCatalogo.version).filter(CambioCatalogo.version > ultima).first() is None
+    else:
+        registros = registros[:limit]
+
+    # One IN query per table that actually changed
+    vivos = {}
+    for registro in registros:
+        if registro.eliminado:
+            eliminados[registro.tabla].append(registro.id_registro)
+        elif registro.tabla in CATALOGO_SYNC:
+            vivos.setdefault(registro.tabla, []).append(registro.id_registro)
+    for tabla, ids in vivos.items():
+        model, pk = CATALOGO_SYNC[tabla]
+        cambios[tabla] = db.query(model).filter(pk.in_(ids)).all()
+
+    version = registros[-1].version if registros else since
+    return {"version": version, "completo": completo, "cambios": cambios, "eliminados": eliminados}
+
+
+
+# ==================== EVENTO ====================
+def evento_row(tipo: str, datos: dict):
+    """Evento row for a bulk insert; registrar_evento adds a single one"""
+    return {"tipo": tipo, "datos": json.dumps(datos, default=str), "fecha": datetime.now()}
+
+def registrar_evento(db: Session, tipo: str, datos: dict):
+    """Queue a live event in the caller's transaction; it is published once committed"""
+    db.add(Evento(**evento_row(tipo, datos)))
+
+def get_ultimo_evento_id(db: Session):
+    return db.query(func.max(Evento.id_evento)).scalar() or 0
+
+def get_eventos(db: Session, after_id: int, limit: int = 500):
+    return db.query(Evento).filter(
+        Evento.id_evento > after_id
+    ).order_by(Evento.id_evento).limit(limit).all()
+
+def purge_eventos(db: Session, antes_de: datetime):
+    deleted = db.query(Evento).filter(Evento.fecha < antes_de).delete(synchronize_session=False)
+    db.commit()
+    return deleted
@@ -0,0 +1,103 @@
+"""
+Customer lookup by document number (checkout)
+
+The cashier's DNI/RUC field looks a customer up on every keystroke. Lookups
+are served from an in-process LRU keyed by nro_doc, which also remembers
+misses (for a shorter time), and prefix searches from a sorted in-memory list
+of every document number, so the database is only hit on a miss.
+
+The cliente write functions in crud update both after commit. Writes made by
+other workers reach this one when the entries expire: CLIENTES_CACHE_TTL for
+customers and the index, CLIENTES_CACHE_TTL_NEGATIVO for misses.
+"""
+
+import bisect
+import os
+import threading
+import time
+
+from sqlalchemy.orm import Session
+
+from . import schemas
+from .cache import TTLCache, MISSING
+from .models import Cliente
+
+
+CACHE_SIZE = int(os.getenv("CLIENTES_CACHE_SIZE", "10000"))
+CACHE_TTL = float(os.getenv("CLIENTES_CACHE_TTL", "300"))
+CACHE_TTL_NEGATIVO = float(os.getenv("CLIENTES_CACHE_TTL_NEGATIVO", "30"))
+LIMITE_PREFIJO = 10
+
+
+class IndiceClientes:
+    def __init__(self, maxsize: int = CACHE_SIZE, ttl: float = CACHE_TTL, ttl_negativo: float = CACHE_TTL_NEGATIVO):
+        self._clientes = TTLCache(maxsize=maxsize, ttl=ttl)  # nro_doc -> schemas.Cliente or None
+        self._ttl_negativo = ttl_negativo
+        self._ttl_indice = ttl
+        self._docs = []  # every nro_doc, sorted
+        self._cargado = None
+        self._lock = threading.Lock()
+
+    # ---- exact lookup ----
+    def buscar(self, db: Session, nro_doc: str):
+        """The customer with this document number, or None"""
+        cliente = self._clientes.get(nro_doc)
+        if cliente is MISSING:
+            db_cliente = db.query(Cliente).filter(Cliente.nro_doc == nro_doc).first()
+            cliente = schemas.Cliente.model_validate(db_cliente) if db_cliente else None
+            self._clientes.set(nro_doc, cliente, ttl=None if cliente else self._ttl_negativo)
+        return cliente
+
+    # ---- prefix search ----
+    def _cargar_indice(self, db: Session):
+        # Caller holds the lock
+        if self._cargado is None or time.monotonic() - self._cargado > self._ttl_indice:
+            # Sorted here so bisect follows Python order, whatever the column collation
+            self._docs = sorted(doc for doc, in db.query(Cliente.nro_doc))
+            self._cargado = time.monotonic()
+
+    def buscar_prefijo(self, db: Session, prefijo: str, limit: int = LIMITE_PREFIJO):
+        """Customers whose document number starts with `prefijo`, in document order"""
+        with self._lock:
+            self._cargar_indice(db)
+            inicio = bisect.bisect_left(self._docs, prefijo)
+            encontrados = [doc for doc in self._docs[inicio:inicio + limit] if doc.startswith(prefijo)]
+
+        clientes = {doc: self._clientes.get(doc) for doc in encontrados}
+        faltantes = [doc for doc, cliente in clientes.items() if cliente is MISSING]
+        if faltantes:
+            for db_cliente in db.query(Cliente).filter(Cliente.nro_doc.in_(faltantes)):
+                cliente = schemas.Cliente.model_validate(db_cliente)
+                self._clientes.set(cliente.nro_doc, cliente)
+                clientes[cliente.nro_doc] = cliente
+        return [cliente for cliente in clientes.values() if cliente is not MISSING and cliente is not None]
+
+    # ---- maintenance (called by crud after commit) ----
+    def guardar(self, db_cliente, nro_doc_anterior: str = None):
+        """Store a created or updated customer, moving it if its document changed"""
+        cliente = schemas.Cliente.model_validate(db_cliente)
+        if nro_doc_anterior is not None and nro_doc_anterior != cliente.nro_doc:
+            self.quitar(nro_doc_anterior)
+        self._clientes.set(cliente.nro_doc, cliente)
+        with self._lock:
+            if self._cargado is not None:
+                posicion = bisect.bisect_left(self._docs, cliente.nro_doc)
+                if posicion == len(self._docs) or self._docs[posicion] != cliente.nro_doc:
+                    self._docs.insert(posicion, cliente.nro_doc)
+
+    def quitar(self, nro_doc: str):
+        """Forget a deleted customer (remembered as a miss)"""
+        self._clientes.set(nro_doc, None, ttl=self._ttl_negativo)
+        with self._lock:
+            posicion = bisect.bisect_left(self._docs, nro_doc)
+            if posicion < len(self._docs) and self._docs[posicion] == nro_doc:
+                del self._docs[posicion]
+
+    def clear(self):
+        self._clientes.clear()
+        with self._lock:
+            self._docs = []
+            self._cargado = None
+
+
+indice_clientes = IndiceClientes()
@@ -2,7 +2,7 @@
 Database configuration and session management
 """
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
 from dotenv import load_dotenv
 import os
@@ -16,8 +16,16 @@ DB_DIALECT = os.getenv("DB_DIALECT")
 DB_PASSWORD = os.getenv("DB_PASSWORD")
 DB_USER = os.getenv("DB_USER")
 
-# Connection URL
-URL_CONNECTION = f"{DB_DIALECT}://{DB_USER}:{DB_PASSWORD}@{DB_HOST}/{DB_NAME}"
+# Connection URL (DB_URL overrides the parts, e.g. sqlite:///primary.db)
+URL_CONNECTION = os.getenv("DB_URL") or f"{DB_DIALECT}://{DB_USER}:{DB_PASSWORD}@{DB_HOST}/{DB_NAME}"
+
+# Optional read replica: DB_REPLICA_URL, or DB_REPLICA_HOST with the primary's credentials
+DB_REPLICA_HOST = os.getenv("DB_REPLICA_HOST")
+URL_REPLICA = os.getenv("DB_REPLICA_URL") or (
+    f"{DB_DIALECT}://{DB_USER}:{DB_PASSWORD}@{DB_REPLICA_HOST}/{DB_NAME}" if DB_REPLICA_HOST else None
+)
+# Seconds a client keeps reading from the primary after a write (read-your-writes)
+REPLICA_STICKY_SECONDS = int(os.getenv("DB_REPLICA_STICKY_SECONDS", "5"))
 
 # Engine configuration
 engine = create_engine(
@@ -27,8 +35,39 @@ engine = create_engine(
     echo=False
 )
 
-# Session factory
+replica_engine = create_engine(
+    URL_REPLICA,
+    pool_pre_ping=True,
+    pool_recycle=3600,
+    echo=False
+) if URL_REPLICA else None
+
+# Session factories
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+ReplicaSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=replica_engine or engine)
+
+
+# Replica sessions are read-only: flushes and Core DML through the session
+# are refused here, and a real replica connection is also read-only on the
+# server, which catches anything issued on the connection directly
+REPLICA_READ_ONLY = "Replica sessions are read-only; writes must use SessionLocal"
+
+@event.listens_for(ReplicaSessionLocal, "before_flush")
+def _replica_read_only(session, flush_context, instances):
+    raise RuntimeError(REPLICA_READ_ONLY)
+
+@event.listens_for(ReplicaSessionLocal, "do_orm_execute")
+def _replica_read_only_execute(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        raise RuntimeError(REPLICA_READ_ONLY)
+
+if replica_engine is not None:
+    @event.listens_for(replica_engine, "connect")
+    def _replica_read_only_connection(dbapi_connection, connection_record):
+        if replica_engine.dialect.name == "mysql":
+            cursor = dbapi_connection.cursor()
+            cursor.execute("SET SESSION TRANSACTION READ ONLY")
+            cursor.close()
 
 # Legacy alias for compatibility
 localSession = SessionLocal
@@ -0,0 +1,136 @@
+"""
+Live events (stock, sales, order status) for Server-Sent Events clients
+
+Writes queue their event in the `evento` outbox table inside their own
+transaction (crud.registrar_evento). While a worker has SSE clients connected
+it polls the outbox with one primary-key range query and fans new rows out to
+its local subscribers, so clients receive changes made on any worker without
+polling the list endpoints themselves.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from datetime import datetime, timedelta
+
+from . import crud
+from .database import SessionLocal
+
+
+logger = logging.getLogger(__name__)
+
+POLL_INTERVAL = float(os.getenv("EVENTOS_POLL_INTERVAL", "0.5"))
+HEARTBEAT_INTERVAL = 15  # seconds between keep-alive comments
+RETENCION = timedelta(hours=1)  # how long events stay replayable via Last-Event-ID
+QUEUE_MAX = 1000
+# Outbox ids are assigned at INSERT but become visible at COMMIT, so a slower
+# transaction can surface an id below the last one seen. Each poll re-reads
+# this many ids back and skips the ones already published.
+LOOKBACK_IDS = 50
+
+
+def _evento_dict(db_evento):
+    return {"id": db_evento.id_evento, "tipo": db_evento.tipo, "datos": db_evento.datos}
+
+
+def format_sse(evento: dict) -> str:
+    return f"id: {evento['id']}\nevent: {evento['tipo']}\ndata: {evento['datos']}\n\n"
+
+
+class EventBus:
+    """In-process pub/sub fed by the outbox poller"""
+
+    def __init__(self, session_factory):
+        self._session_factory = session_factory
+        self._subscribers = set()
+        self._start_id = None
+        self._last_id = None
+        self._published = deque(maxlen=LOOKBACK_IDS * 4)
+        self._task = None
+        self._last_purge = 0.0
+
+    def subscribe(self) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=QUEUE_MAX)
+        self._subscribers.add(queue)
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._poll())
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        self._subscribers.discard(queue)
+
+    def publish(self, evento: dict):
+        for queue in list(self._subscribers):
+            try:
+                queue.put_nowait(evento)
+            except asyncio.QueueFull:
+                # Client is not reading: drop it, it reconnects with Last-Event-ID
+                self._subscribers.discard(queue)
+                queue.get_nowait()
+                queue.put_nowait(None)
+
+    # ---- outbox polling (runs in the event loop, queries in a thread) ----
+    def _run(self, fn, *args):
+        db = self._session_factory()
+        try:
+            return fn(db, *args)
+        finally:
+            db.close()
+
+    def _fetch(self, after_id: int):
+        return [
+            _evento_dict(db_evento)
+            for db_evento in self._run(crud.get_eventos, after_id)
+        ]
+
+    async def _poll(self):
+        self._start_id = self._last_id = await asyncio.to_thread(self._run, crud.get_ultimo_evento_id)
+        self._published.clear()
+        # Poll only while this worker has clients connected
+        while self._subscribers:
+            try:
+                desde = max(self._last_id - LOOKBACK_IDS, self._start_id)
+                eventos = await asyncio.to_thread(self._fetch, desde)
+                for evento in eventos:
+                    if evento["id"] in self._published:
+                        continue
+                    self.publish(evento)
+                    self._published.append(evento["id"])
+                    self._last_id = max(self._last_id, evento["id"])
+                if time.monotonic() - self._last_purge > RETENCION.total_seconds():
+                    self._last_purge = time.monotonic()
+                    await asyncio.to_thread(self._run, crud.purge_eventos, datetime.now() - RETENCION)
+            except Exception:
+                logger.exception("Error polling event outbox")
+            await asyncio.sleep(POLL_INTERVAL)
+
+    async def stream(self, request, tipos=None, last_event_id=None):
+        """SSE body: replay from Last-Event-ID, then live events until the client leaves"""
+        queue = self.subscribe()
+        try:
+            ultimo = 0
+            if last_event_id is not None:
+                for evento in await asyncio.to_thread(self._fetch, last_event_id):
+                    ultimo = evento["id"]
+                    if tipos is None or evento["tipo"] in tipos:
+                        yield format_sse(evento)
+
+            while not await request.is_disconnected():
+                try:
+                    evento = await asyncio.wait_for(queue.get(), timeout=HEARTBEAT_INTERVAL)
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"
+                    continue
+                if evento is None:
+                    break
+                if evento["id"] <= ultimo:
+                    continue
+                if tipos is None or evento["tipo"] in tipos:
+                    yield format_sse(evento)
+        finally:
+            self.unsubscribe(queue)
+
+
+event_bus = EventBus(SessionLocal)
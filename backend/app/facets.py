@@ -0,0 +1,292 @@
+"""
+Faceted product browsing
+
+The catalog filters (categoria, presentacion, componente and the
+requiere_receta / afecta_igv flags) are answered from an in-process index of
+bitmaps instead of joins: every product gets a bit position (products sorted
+by id) and every facet value keeps a uint64 bitmap of its products, one row of
+its facet's matrix. A query ANDs the selected bitmaps (values of the same facet
+are ORed) and counts all the values of a facet with one vectorized popcount
+over the matrix, with no database round trip besides the version check.
+
+Counts are disjunctive: each facet is counted with the filters of the other
+facets only, so picking a category still shows how many products the other
+categories would give.
+
+The product write functions in crud apply their change to the index after
+commit. Each request compares the producto table version with the catalog
+version the index was built at, and rebuilds it when another worker changed
+the products since.
+"""
+
+import threading
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from .models import (
+    Producto, ProductoCategoria, ProductoPresentacion, ProductoComponente,
+    VersionCatalogo, VersionTabla
+)
+
+
+RELACIONES = {
+    "categoria": (ProductoCategoria.id_producto, ProductoCategoria.id_categoria),
+    "presentacion": (ProductoPresentacion.id_producto, ProductoPresentacion.id_presentacion),
+    "componente": (ProductoComponente.id_producto, ProductoComponente.id_componente),
+}
+BANDERAS = ("requiere_receta", "afecta_igv")
+FACETAS = (*RELACIONES, *BANDERAS)
+
+# Free bit positions kept after a build, so new products do not reallocate
+HOLGURA_PALABRAS = 16
+
+
+def _palabras(bits: int) -> int:
+    return (bits + 63) // 64
+
+
+def _bit(posicion: int):
+    return posicion >> 6, np.uint64(1 << (posicion & 63))
+
+
+def _contar(bitmaps):
+    """Set bits of each row (or of a single bitmap)"""
+    return np.bitwise_count(bitmaps).sum(axis=-1)
+
+
+class _Faceta:
+    """One bitmap row per value of a facet; flags have the single value True"""
+
+    def __init__(self, palabras: int, posiciones=(), valores=()):
+        posiciones = np.asarray(posiciones, dtype=np.uint64)
+        unicos, filas = np.unique(np.asarray(valores), return_inverse=True)
+        self.valores = unicos.tolist()
+        self.filas = {valor: fila for fila, valor in enumerate(self.valores)}
+        self.matriz = np.zeros((max(len(self.valores), 1), palabras), dtype=np.uint64)
+        np.bitwise_or.at(
+            self.matriz,
+            (filas, posiciones >> np.uint64(6)),
+            np.uint64(1) << (posiciones & np.uint64(63))
+        )
+
+    def activa(self):
+        return self.matriz[:len(self.valores)]
+
+    def mascara(self, seleccion):
+        filas = [self.filas[valor] for valor in seleccion if valor in self.filas]
+        if not filas:
+            return np.zeros(self.matriz.shape[1], dtype=np.uint64)
+        return np.bitwise_or.reduce(self.matriz[filas], axis=0)
+
+    def conteos(self, otros) -> dict:
+        # Only the words holding some of `otros` can count
+        palabras = np.flatnonzero(otros)
+        if len(palabras) < len(otros) // 2:
+            conteos = _contar(self.activa()[:, palabras] & otros[palabras])
+        else:
+            conteos = _contar(self.activa() & otros)
+        return {str(self.valores[fila]): int(conteos[fila]) for fila in np.flatnonzero(conteos)}
+
+    def crecer(self, extra: int):
+        self.matriz = np.concatenate(
+            [self.matriz, np.zeros((self.matriz.shape[0], extra), dtype=np.uint64)], axis=1
+        )
+
+    def asignar(self, palabra: int, bit, valores):
+        """Make the product at (palabra, bit) have exactly these values"""
+        self.matriz[:, palabra] &= ~bit
+        for valor in valores:
+            fila = self.filas.get(valor)
+            if fila is None:
+                fila = self.filas[valor] = len(self.valores)
+                self.valores.append(valor)
+                if fila == self.matriz.shape[0]:
+                    self.matriz = np.concatenate([self.matriz, np.zeros_like(self.matriz)])
+            self.matriz[fila, palabra] |= bit
+
+
+class IndiceFacetas:
+    def __init__(self):
+        self._version = None  # catalog version the index reflects; None = not built
+        self._ids = np.empty(0, dtype=np.int64)  # product id of each bit position, ascending
+        self._n = 0  # bit positions in use
+        self._vivos = np.empty(0, dtype=np.uint64)  # positions of existing products
+        self._facetas = {}
+        self._totales = None  # counts without filters, until the next change
+        self._lock = threading.Lock()
+
+    # ---- build ----
+    def construir(self, ids, banderas: dict, relaciones: dict, version: int):
+        """Build from columns: product ids, one bool array per flag aligned with
+        them, and (id_producto, valor) arrays per relation"""
+        orden = np.argsort(ids, kind="stable")
+        ids = np.asarray(ids, dtype=np.int64)[orden]
+        palabras = _palabras(len(ids)) + HOLGURA_PALABRAS
+        todas = np.arange(len(ids))
+
+        facetas = {}
+        for bandera in BANDERAS:
+            marcadas = todas[np.asarray(banderas[bandera], dtype=bool)[orden]]
+            facetas[bandera] = _Faceta(palabras, marcadas, np.ones(len(marcadas), dtype=bool))
+        for faceta in RELACIONES:
+            productos, valores = relaciones[faceta]
+            productos = np.asarray(productos, dtype=np.int64)
+            # Rows of products that no longer exist are ignored
+            posiciones = np.searchsorted(ids, productos)
+            existe = posiciones < len(ids)
+            existe[existe] = ids[posiciones[existe]] == productos[existe]
+            facetas[faceta] = _Faceta(palabras, posiciones[existe], np.asarray(valores, dtype=np.int64)[existe])
+
+        vivos = _Faceta(palabras, todas, np.ones(len(ids), dtype=bool)).matriz[0]
+        with self._lock:
+            self._ids = np.concatenate([ids, np.zeros(palabras * 64 - len(ids), dtype=np.int64)])
+            self._n = len(ids)
+            self._vivos = vivos
+            self._facetas = facetas
+            self._totales = None
+            self._version = version
+
+    def _cargar(self, db: Session):
+        version = db.query(VersionCatalogo.version).filter(VersionCatalogo.id == 1).scalar() or 0
+        productos = db.query(Producto.id_producto, *(getattr(Producto, bandera) for bandera in BANDERAS)).all()
+        columnas = list(zip(*productos)) or [()] * (1 + len(BANDERAS))
+        relaciones = {}
+        for faceta, (id_producto, valor) in RELACIONES.items():
+            filas = db.query(id_producto, valor).all()
+            relaciones[faceta] = tuple(np.array(columna, dtype=np.int64) for columna in (list(zip(*filas)) or [(), ()]))
+        self.construir(
+            np.array(columnas[0], dtype=np.int64),
+            {bandera: np.array(columna, dtype=bool) for bandera, columna in zip(BANDERAS, columnas[1:])},
+            relaciones,
+            version
+        )
+
+    def _vigente(self, db: Session):
+        """Rebuild if products changed after the index's version"""
+        cambio = db.query(VersionTabla.version).filter(VersionTabla.tabla == "producto").scalar() or 0
+        if self._version is None or cambio > self._version:
+            self._cargar(db)
+
+    # ---- query ----
+    def consultar(self, db: Session, filtros: dict) -> dict:
+        """Matching product ids and per-facet counts, rebuilding first if stale"""
+        self._vigente(db)
+        return self.filtrar(filtros)
+
+    def filtrar(self, filtros: dict) -> dict:
+        """Matching product ids and per-facet counts; `filtros` maps a facet to a
+        list of values (relations) or a bool (flags), None or [] = no filter"""
+        with self._lock:
+            mascaras = {}
+            for faceta, seleccion in filtros.items():
+                if seleccion is None or seleccion == []:
+                    continue
+                if faceta in BANDERAS:
+                    marcados = self._facetas[faceta].mascara([True])
+                    mascaras[faceta] = marcados if seleccion else self._vivos & ~marcados
+                else:
+                    mascaras[faceta] = self._facetas[faceta].mascara(seleccion)
+
+            def base(excepto=None):
+                resultado = self._vivos.copy()
+                for faceta, mascara in mascaras.items():
+                    if faceta != excepto:
+                        resultado &= mascara
+                return resultado
+
+            coinciden = base()
+            bits = np.unpackbits(coinciden.astype("<u8").view(np.uint8), bitorder="little")[:self._n]
+            ids = self._ids[:self._n][bits.astype(bool)]
+
+            if not mascaras and self._totales is not None:
+                return {"total": len(ids), "ids": ids.tolist(), "facetas": self._totales}
+            facetas = {}
+            for faceta in FACETAS:
+                otros = base(excepto=faceta) if faceta in mascaras else coinciden
+                conteos = self._facetas[faceta].conteos(otros)
+                if faceta in BANDERAS:
+                    si = conteos.get("True", 0)
+                    conteos = {"true": si, "false": int(_contar(otros)) - si}
+                facetas[faceta] = conteos
+            if not mascaras:
+                self._totales = facetas
+
+        return {"total": len(ids), "ids": ids.tolist(), "facetas": facetas}
+
+    # ---- maintenance (called by crud after commit) ----
+    def _aplicable(self, version: int) -> bool:
+        # Caller holds the lock. Only a change right after the index's version
+        # can be applied; otherwise other catalog writes happened in between
+        # and the next query rebuilds from the database.
+        return self._version is not None and version == self._version + 1
+
+    def _crecer(self):
+        # Caller holds the lock
+        extra = len(self._vivos)
+        self._ids = np.concatenate([self._ids, np.zeros(extra * 64, dtype=np.int64)])
+        self._vivos = np.concatenate([self._vivos, np.zeros(extra, dtype=np.uint64)])
+        for faceta in self._facetas.values():
+            faceta.crecer(extra)
+
+    def _posicion(self, id_producto: int):
+        # Caller holds the lock
+        posicion = int(np.searchsorted(self._ids[:self._n], id_producto))
+        if posicion < self._n and self._ids[posicion] == id_producto:
+            return posicion
+        return None
+
+    def guardar(self, db_producto, version: int, relaciones: dict = None):
+        """Apply a created or updated product; `relaciones` maps a relation facet
+        to the product's new list of values (facets left out are unchanged)"""
+        with self._lock:
+            if not self._aplicable(version):
+                return
+            id_producto = db_producto.id_producto
+            posicion = self._posicion(id_producto)
+            if posicion is None:
+                if self._n and id_producto < self._ids[self._n - 1]:
+                    # Ids are positions in order; an out-of-order id needs a rebuild
+                    self._version = None
+                    return
+                if _palabras(self._n + 1) > len(self._vivos):
+                    self._crecer()
+                posicion = self._n
+                self._ids[posicion] = id_producto
+                self._n += 1
+            palabra, bit = _bit(posicion)
+            self._vivos[palabra] |= bit
+
+            for bandera in BANDERAS:
+                self._facetas[bandera].asignar(palabra, bit, [True] if getattr(db_producto, bandera) else [])
+            for faceta, valores in (relaciones or {}).items():
+                self._facetas[faceta].asignar(palabra, bit, valores)
+            self._totales = None
+            self._version = version
+
+    def avanzar(self, version: int):
+        """Apply a product change that touches no facet (e.g. prices)"""
+        with self._lock:
+            if self._aplicable(version):
+                self._version = version
+
+    def quitar(self, id_producto: int, version: int):
+        """Forget a deleted product"""
+        with self._lock:
+            if not self._aplicable(version):
+                return
+            posicion = self._posicion(id_producto)
+            if posicion is not None:
+                palabra, bit = _bit(posicion)
+                self._vivos[palabra] &= ~bit
+                for faceta in self._facetas.values():
+                    faceta.asignar(palabra, bit, [])
+            self._totales = None
+            self._version = version
+
+    def clear(self):
+        with self._lock:
+            self._version = None
+
+
+indice_facetas = IndiceFacetas()
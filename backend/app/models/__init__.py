@@ -10,12 +10,18 @@ from .producto import (
     ProductoCategoria,
     ProductoPresentacion,
     ProductoComponente,
+    HistorialPrecio,
+    CodigoBarras,
 )
-from .inventario import Inventario, Lote, UbicacionEstante
+from .inventario import Inventario, Lote, UbicacionEstante, ReservaStock
 from .pedido import Pedido, DetallePedido, EstadoPedido, MotivoPedido
 from .compra import Compra
-from .venta import Venta, DetalleVenta
-from .pago import Pago, MetodoPago, Comprobante
+from .venta import Venta, DetalleVenta, ClaveIdempotencia, PeriodoArchivado
+from .pago import Pago, MetodoPago, Comprobante, SerieComprobante
+from .cambio import VersionCatalogo, CambioCatalogo, VersionTabla
+from .evento import Evento
+from .costo import CheckpointCosto, CostoVentaMensual
+from .promocion import Promocion
 
 __all__ = [
     # Base
@@ -39,10 +45,13 @@ __all__ = [
     "ProductoCategoria",
     "ProductoPresentacion",
     "ProductoComponente",
+    "HistorialPrecio",
+    "CodigoBarras",
     # Inventario
     "Inventario",
     "Lote",
     "UbicacionEstante",
+    "ReservaStock",
     # Pedido
     "Pedido",
     "DetallePedido",
@@ -53,8 +62,22 @@ __all__ = [
     # Venta
     "Venta",
     "DetalleVenta",
+    "ClaveIdempotencia",
+    "PeriodoArchivado",
     # Pago
     "Pago",
     "MetodoPago",
     "Comprobante",
+    "SerieComprobante",
+    # Sync
+    "VersionCatalogo",
+    "CambioCatalogo",
+    "VersionTabla",
+    # Evento
+    "Evento",
+    # Costo
+    "CheckpointCosto",
+    "CostoVentaMensual",
+    # Promocion
+    "Promocion",
 ]
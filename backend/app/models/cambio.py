@@ -0,0 +1,43 @@
+"""
+Catalog change log used for delta sync
+"""
+
+from sqlalchemy import Column, Integer, String, Boolean
+from .base import Base
+
+
+class VersionCatalogo(Base):
+    """Single-row counter for catalog changes. Bumping it locks the row until
+    commit, so catalog writes commit in version order"""
+    __tablename__ = "version_catalogo"
+
+    id = Column(Integer, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<VersionCatalogo(version={self.version})>"
+
+
+class CambioCatalogo(Base):
+    """Latest change version per catalog row; deleted rows stay as tombstones"""
+    __tablename__ = "cambio_catalogo"
+
+    tabla = Column(String(30), primary_key=True)
+    id_registro = Column(Integer, primary_key=True)
+    version = Column(Integer, nullable=False, index=True)
+    eliminado = Column(Boolean, nullable=False, default=False)
+
+    def __repr__(self):
+        return f"<CambioCatalogo(tabla='{self.tabla}', id={self.id_registro}, version={self.version})>"
+
+
+class VersionTabla(Base):
+    """Catalog version of the last change per table, the validator for cached
+    list responses"""
+    __tablename__ = "version_tabla"
+
+    tabla = Column(String(30), primary_key=True)
+    version = Column(Integer, nullable=False)
+
+    def __repr__(self):
+        return f"<VersionTabla(tabla='{self.tabla}', version={self.version})>"
@@ -2,7 +2,7 @@
 Compra (Purchase) model
 """
 
-from sqlalchemy import Column, Integer, String, Date, Numeric, ForeignKey
+from sqlalchemy import Column, Integer, String, Date, Numeric, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from .base import Base
 
@@ -13,7 +13,7 @@ class Compra(Base):
 
     id_compra = Column(Integer, primary_key=True, autoincrement=True)
     id_pedido = Column(Integer, ForeignKey("pedido.id_pedido"), nullable=False, unique=True)
-    fecha_recepcion = Column(Date, nullable=False)
+    fecha_recepcion = Column(Date, nullable=False, index=True)
     nro_guia = Column(String(50), unique=True)
     tipo_comprobante = Column(String(20))  # Factura, Boleta
     nro_comprobante = Column(String(50), unique=True)
@@ -21,6 +21,11 @@ class Compra(Base):
     estado = Column(String(20), nullable=False)  # Pagado, Pendiente
     fecha_pago = Column(Date)
 
+    # List filter: status, then date range
+    __table_args__ = (
+        Index("ix_compra_estado_fecha", "estado", "fecha_recepcion"),
+    )
+
     # Relationships
     pedido = relationship("Pedido", back_populates="compra")
 
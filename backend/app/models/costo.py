@@ -0,0 +1,36 @@
+"""
+Cost of goods sold (COGS) checkpoints and monthly totals
+"""
+
+from sqlalchemy import Column, Integer, String, Date, Numeric, DateTime, LargeBinary
+from .base import Base
+
+
+class CheckpointCosto(Base):
+    """Progress of the COGS engine per costing method: last processed ids and
+    the per-product cost state (NumPy arrays serialized with np.savez)"""
+    __tablename__ = "checkpoint_costo"
+
+    metodo = Column(String(10), primary_key=True)  # promedio, fifo
+    ultimo_id_lote = Column(Integer, nullable=False, default=0)
+    ultimo_id_venta = Column(Integer, nullable=False, default=0)
+    estado = Column(LargeBinary(length=2**32 - 1))  # LONGBLOB on MySQL
+    fecha_actualizacion = Column(DateTime)
+
+    def __repr__(self):
+        return f"<CheckpointCosto(metodo='{self.metodo}', venta={self.ultimo_id_venta}, lote={self.ultimo_id_lote})>"
+
+
+class CostoVentaMensual(Base):
+    """COGS per costing method, month and product"""
+    __tablename__ = "costo_venta_mensual"
+
+    metodo = Column(String(10), primary_key=True)
+    periodo = Column(Date, primary_key=True)  # first day of the month
+    id_producto = Column(Integer, primary_key=True)
+    cantidad = Column(Integer, nullable=False, default=0)
+    costo = Column(Numeric(14, 2), nullable=False, default=0)
+    cantidad_sin_costo = Column(Integer, nullable=False, default=0)  # units sold before any lot existed
+
+    def __repr__(self):
+        return f"<CostoVentaMensual(metodo='{self.metodo}', periodo={self.periodo}, producto={self.id_producto})>"
@@ -0,0 +1,19 @@
+"""
+Evento (live event outbox) model
+"""
+
+from sqlalchemy import Column, Integer, String, Text, DateTime
+from .base import Base
+
+
+class Evento(Base):
+    """Outbox of live events (stock, sales, order status) polled by every worker"""
+    __tablename__ = "evento"
+
+    id_evento = Column(Integer, primary_key=True, autoincrement=True)
+    tipo = Column(String(30), nullable=False)  # stock, venta, pedido, pedido_estado
+    datos = Column(Text, nullable=False)  # JSON payload
+    fecha = Column(DateTime, nullable=False, index=True)
+
+    def __repr__(self):
+        return f"<Evento(id={self.id_evento}, tipo='{self.tipo}')>"
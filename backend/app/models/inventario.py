@@ -2,7 +2,9 @@
 Inventario (Inventory) and related models
 """
 
-from sqlalchemy import Column, Integer, String, Date, Numeric, ForeignKey
+from datetime import date
+
+from sqlalchemy import Column, Integer, String, Date, DateTime, Numeric, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from .base import Base
 
@@ -32,6 +34,7 @@ class Lote(Base):
     fecha_vencimiento = Column(Date, nullable=False)
     cantidad_recibida = Column(Integer, nullable=False)
     costo_unitario_compra = Column(Numeric(10, 2), nullable=False)
+    fecha_ingreso = Column(Date, nullable=False, default=date.today)  # receipt date, orders lots for costing
 
     # Relationships
     producto = relationship("Producto", back_populates="lotes")
@@ -56,3 +59,23 @@ class Inventario(Base):
 
     def __repr__(self):
         return f"<Inventario(id={self.id_inventario}, lote_id={self.id_lote}, stock={self.stock_actual})>"
+
+
+class ReservaStock(Base):
+    """Units of an inventory row held for an open cart until `expira`; they
+    are not available to other carts while the hold is active"""
+    __tablename__ = "reserva_stock"
+    __table_args__ = (
+        Index("ix_reserva_stock_inventario_expira", "id_inventario", "expira"),
+        Index("ix_reserva_stock_carrito", "id_carrito"),
+        Index("ix_reserva_stock_expira", "expira"),
+    )
+
+    id_reserva = Column(Integer, primary_key=True, autoincrement=True)
+    id_carrito = Column(String(36), nullable=False)
+    id_inventario = Column(Integer, ForeignKey("inventario.id_inventario"), nullable=False)
+    cantidad = Column(Integer, nullable=False)
+    expira = Column(DateTime, nullable=False)
+
+    def __repr__(self):
+        return f"<ReservaStock(carrito='{self.id_carrito}', inventario={self.id_inventario}, cantidad={self.cantidad})>"
@@ -53,3 +53,15 @@ class Comprobante(Base):
 
     def __repr__(self):
         return f"<Comprobante(id={self.id_comprobante}, tipo='{self.tipo_comprobante}', nro='{self.nro_comprobante}')>"
+
+
+class SerieComprobante(Base):
+    """Receipt numbering series - one sequence row per receipt type (Boleta, Factura)"""
+    __tablename__ = "serie_comprobante"
+
+    tipo_comprobante = Column(String(20), primary_key=True)
+    serie = Column(String(4), nullable=False, unique=True)  # B001, F001
+    ultimo_numero = Column(Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<SerieComprobante(tipo='{self.tipo_comprobante}', serie='{self.serie}', ultimo={self.ultimo_numero})>"
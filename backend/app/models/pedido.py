@@ -2,7 +2,7 @@
 Pedido (Purchase Order) and related models
 """
 
-from sqlalchemy import Column, Integer, String, Date, ForeignKey, Numeric
+from sqlalchemy import Column, Integer, String, Date, ForeignKey, Numeric, Index
 from sqlalchemy.orm import relationship
 from .base import Base
 
@@ -44,10 +44,16 @@ class Pedido(Base):
     id_usuario = Column(Integer, ForeignKey("usuario.id_usuario"), nullable=False)
     id_estado_pedido = Column(Integer, ForeignKey("estado_pedido.id_estado_pedido"), nullable=False)
     id_motivo_pedido = Column(Integer, ForeignKey("motivo_pedido.id_motivo_pedido"), nullable=False)
-    fecha_solicitud = Column(Date, nullable=False)
+    fecha_solicitud = Column(Date, nullable=False, index=True)
     fecha_entrega_estimada = Column(Date)
     motivo = Column(String(255))  # Additional details about the reason
 
+    # List filters: status or supplier, then date range
+    __table_args__ = (
+        Index("ix_pedido_estado_fecha", "id_estado_pedido", "fecha_solicitud"),
+        Index("ix_pedido_proveedor_fecha", "id_proveedor", "fecha_solicitud"),
+    )
+
     # Relationships
     proveedor = relationship("Proveedor", back_populates="pedidos")
     usuario = relationship("Usuario", back_populates="pedidos")
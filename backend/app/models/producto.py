@@ -2,7 +2,7 @@
 Producto (Product) and related models
 """
 
-from sqlalchemy import Column, Integer, String, Numeric, Boolean, ForeignKey
+from sqlalchemy import Column, Integer, BigInteger, String, Numeric, Boolean, DateTime, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from .base import Base
 
@@ -67,6 +67,8 @@ class Producto(Base):
     lotes = relationship("Lote", back_populates="producto")
     detalles_pedido = relationship("DetallePedido", back_populates="producto")
     detalles_venta = relationship("DetalleVenta", back_populates="producto")
+    historial_precios = relationship("HistorialPrecio", back_populates="producto", cascade="all, delete-orphan")
+    codigos_barras = relationship("CodigoBarras", back_populates="producto", cascade="all, delete-orphan")
 
     def __repr__(self):
         return f"<Producto(id={self.id_producto}, codigo='{self.codigo_interno}', nombre='{self.nombre_comercial}')>"
@@ -106,3 +108,47 @@ class ProductoComponente(Base):
     # Relationships
     producto = relationship("Producto", back_populates="componentes")
     componente = relationship("Componente", back_populates="productos")
+
+
+class HistorialPrecio(Base):
+    """Sale price of a product from valido_desde until its next row; a NULL
+    valido_desde is the price the product had before its history started"""
+    __tablename__ = "historial_precio"
+    __table_args__ = (
+        Index("ix_historial_precio_producto_desde", "id_producto", "valido_desde"),
+    )
+
+    id_historial_precio = Column(Integer, primary_key=True, autoincrement=True)
+    id_producto = Column(Integer, ForeignKey("producto.id_producto"), nullable=False)
+    precio_venta = Column(Numeric(10, 2), nullable=False)
+    valido_desde = Column(DateTime)
+
+    # Relationships
+    producto = relationship("Producto", back_populates="historial_precios")
+
+    def __repr__(self):
+        return f"<HistorialPrecio(producto={self.id_producto}, precio={self.precio_venta}, desde={self.valido_desde})>"
+
+
+class CodigoBarras(Base):
+    """Barcodes of a product (EAN-13, GTIN-14, UPC, ...); numeric codes are
+    stored as 14-digit GTINs. Scans look codes up by hash_codigo, a 64-bit
+    hash of the code, whose unique index is much smaller than one on the
+    string"""
+    __tablename__ = "codigo_barras"
+    __table_args__ = (
+        Index("ux_codigo_barras_hash", "hash_codigo", unique=True),
+        Index("ix_codigo_barras_producto", "id_producto"),
+    )
+
+    id_codigo_barras = Column(Integer, primary_key=True, autoincrement=True)
+    id_producto = Column(Integer, ForeignKey("producto.id_producto"), nullable=False)
+    codigo = Column(String(50), nullable=False)
+    hash_codigo = Column(BigInteger, nullable=False)
+    tipo = Column(String(20), nullable=False)
+
+    # Relationships
+    producto = relationship("Producto", back_populates="codigos_barras")
+
+    def __repr__(self):
+        return f"<CodigoBarras(codigo='{self.codigo}', producto={self.id_producto})>"
@@ -0,0 +1,30 @@
+"""
+Promociones (promotions and discounts)
+"""
+
+from sqlalchemy import Column, Integer, String, Numeric, Boolean, Date, ForeignKey
+from .base import Base
+
+
+class Promocion(Base):
+    """Discount rule for one product, category or component:
+    porcentaje (porcentaje off), nxm (lleva n, paga m) or pack (n units for
+    precio_pack)"""
+    __tablename__ = "promocion"
+
+    id_promocion = Column(Integer, primary_key=True, autoincrement=True)
+    nombre = Column(String(100), nullable=False)
+    tipo = Column(String(20), nullable=False)
+    id_producto = Column(Integer, ForeignKey("producto.id_producto"))
+    id_categoria = Column(Integer, ForeignKey("categoria.id_categoria"))
+    id_componente = Column(Integer, ForeignKey("componente.id_componente"))
+    porcentaje = Column(Numeric(5, 2))
+    lleva = Column(Integer)
+    paga = Column(Integer)
+    precio_pack = Column(Numeric(10, 2))
+    fecha_inicio = Column(Date)
+    fecha_fin = Column(Date)
+    activa = Column(Boolean, default=True, nullable=False)
+
+    def __repr__(self):
+        return f"<Promocion(id={self.id_promocion}, nombre='{self.nombre}', tipo='{self.tipo}')>"
@@ -2,7 +2,7 @@
 Venta (Sale) and related models
 """
 
-from sqlalchemy import Column, Integer, Date, Time, Numeric, ForeignKey
+from sqlalchemy import Column, Integer, String, Date, Time, DateTime, Numeric, ForeignKey
 from sqlalchemy.orm import relationship
 from .base import Base
 
@@ -14,7 +14,7 @@ class Venta(Base):
     id_venta = Column(Integer, primary_key=True, autoincrement=True)
     id_cliente = Column(Integer, ForeignKey("cliente.id_cliente"), nullable=False)
     id_usuario = Column(Integer, ForeignKey("usuario.id_usuario"), nullable=False)
-    fecha_venta = Column(Date, nullable=False)
+    fecha_venta = Column(Date, nullable=False, index=True)
     hora_venta = Column(Time, nullable=False)
     monto_total = Column(Numeric(10, 2), nullable=False)
 
@@ -45,3 +45,30 @@ class DetalleVenta(Base):
 
     def __repr__(self):
         return f"<DetalleVenta(venta_id={self.id_venta}, producto_id={self.id_producto}, cant={self.cantidad})>"
+
+
+class ClaveIdempotencia(Base):
+    """Client-generated Idempotency-Key -> sale mapping, used to replay retried submissions"""
+    __tablename__ = "clave_idempotencia"
+
+    clave = Column(String(64), primary_key=True)
+    id_venta = Column(Integer, ForeignKey("venta.id_venta"), nullable=False)
+    fecha_venta = Column(Date, nullable=False)  # partition key of the sale, so the replay reads one partition
+    fecha_expiracion = Column(DateTime, nullable=False, index=True)
+
+    def __repr__(self):
+        return f"<ClaveIdempotencia(clave='{self.clave}', venta_id={self.id_venta})>"
+
+
+class PeriodoArchivado(Base):
+    """Month of sales moved out of the hot tables into columnar archive files"""
+    __tablename__ = "periodo_archivado"
+
+    periodo = Column(Date, primary_key=True)  # first day of the month
+    partes = Column(Integer, nullable=False, default=0)  # archive files written per table
+    ventas = Column(Integer, nullable=False, default=0)
+    lineas = Column(Integer, nullable=False, default=0)
+    fecha_archivo = Column(DateTime, nullable=False)
+
+    def __repr__(self):
+        return f"<PeriodoArchivado(periodo={self.periodo}, partes={self.partes}, ventas={self.ventas})>"
@@ -0,0 +1,226 @@
+"""
+Monthly RANGE partitioning of venta and detalle_venta (MySQL only, optional)
+
+venta is partitioned by RANGE COLUMNS(fecha_venta), one partition per month
+plus `pmax`. detalle_venta has no date, so it is partitioned by RANGE(id_venta)
+with one partition per closed month, bounded by the highest id_venta sold up
+to the end of that month; the open month stays in `pmax`. Sale queries filter
+venta by fecha_venta and detalle_venta by the id_venta range of the matching
+sales (crud.get_rango_ids_venta), so MySQL can prune both tables.
+
+MySQL does not allow foreign keys on partitioned tables, and every unique key
+must contain the partition column, so enabling partitioning drops the foreign
+keys from/to both tables and widens venta's primary key to
+(id_venta, fecha_venta). The ORM relationships are unaffected.
+
+Enable it at bootstrap with VENTAS_PARTICIONADAS=true (init_database.py), then
+run the maintenance job monthly: python -m app.partitioning
+"""
+
+import argparse
+import logging
+import os
+from datetime import date
+
+from sqlalchemy import text
+
+
+logger = logging.getLogger(__name__)
+
+VENTAS_PARTICIONADAS = os.getenv("VENTAS_PARTICIONADAS", "false").lower() in ("1", "true", "yes")
+MESES_FUTUROS = 3
+PMAX = "pmax"
+
+
+def _inicio_mes(fecha: date) -> date:
+    return fecha.replace(day=1)
+
+
+def _siguiente_mes(fecha: date) -> date:
+    return date(fecha.year + fecha.month // 12, fecha.month % 12 + 1, 1)
+
+
+def _mes_anterior(fecha: date) -> date:
+    return date(fecha.year - (fecha.month == 1), (fecha.month - 2) % 12 + 1, 1)
+
+
+def _nombre(mes: date) -> str:
+    return f"p{mes:%Y%m}"
+
+
+def _mes(nombre: str) -> date:
+    return date(int(nombre[1:5]), int(nombre[5:7]), 1)
+
+
+def particiones(conn, tabla: str):
+    """[(name, LESS THAN value)] in order; empty when the table is not partitioned"""
+    return [
+        (nombre, descripcion)
+        for nombre, descripcion in conn.execute(text(
+            "SELECT PARTITION_NAME, PARTITION_DESCRIPTION FROM information_schema.PARTITIONS "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :tabla AND PARTITION_NAME IS NOT NULL "
+            "ORDER BY PARTITION_ORDINAL_POSITION"
+        ), {"tabla": tabla})
+    ]
+
+
+def _limites_detalle(conn, desde: date, hasta: date):
+    """{month: highest id_venta sold up to the end of that month + 1} for closed
+    months in [desde, hasta), strictly increasing as RANGE requires"""
+    maximos = dict(conn.execute(text(
+        "SELECT DATE_FORMAT(fecha_venta, '%Y-%m-01'), MAX(id_venta) FROM venta "
+        "WHERE fecha_venta < :hasta GROUP BY 1"
+    ), {"hasta": hasta}).all())
+    limites, acumulado, previo = {}, 0, 0
+    for mes_texto in sorted(maximos):
+        acumulado = max(acumulado, maximos[mes_texto])
+        mes = date.fromisoformat(mes_texto)
+        if mes >= desde and acumulado + 1 > previo:
+            limites[mes] = previo = acumulado + 1
+    return limites
+
+
+def _reorganizar_pmax(conn, tabla: str, definiciones):
+    if not definiciones:
+        return
+    nuevas = ", ".join(f"PARTITION {nombre} VALUES LESS THAN ({valor})" for nombre, valor in definiciones)
+    conn.execute(text(
+        f"ALTER TABLE {tabla} REORGANIZE PARTITION {PMAX} INTO "
+        f"({nuevas}, PARTITION {PMAX} VALUES LESS THAN (MAXVALUE))"
+    ))
+    logger.info("%s: added partitions %s", tabla, ", ".join(nombre for nombre, _ in definiciones))
+
+
+# ==================== BOOTSTRAP ====================
+def habilitar(engine, meses_futuros: int = MESES_FUTUROS):
+    """Partition venta and detalle_venta. Returns False when the database is not MySQL"""
+    with engine.begin() as conn:
+        if conn.dialect.name != "mysql":
+            logger.warning("Sales partitioning needs MySQL, skipped on %s", conn.dialect.name)
+            return False
+        if particiones(conn, "venta"):
+            return True
+
+        foraneas = conn.execute(text(
+            "SELECT DISTINCT TABLE_NAME, CONSTRAINT_NAME FROM information_schema.KEY_COLUMN_USAGE "
+            "WHERE TABLE_SCHEMA = DATABASE() AND REFERENCED_TABLE_NAME IS NOT NULL "
+            "AND (TABLE_NAME IN ('venta', 'detalle_venta') OR REFERENCED_TABLE_NAME IN ('venta', 'detalle_venta'))"
+        )).all()
+        for tabla, restriccion in foraneas:
+            conn.execute(text(f"ALTER TABLE `{tabla}` DROP FOREIGN KEY `{restriccion}`"))
+        conn.execute(text("ALTER TABLE venta DROP PRIMARY KEY, ADD PRIMARY KEY (id_venta, fecha_venta)"))
+
+        actual = _inicio_mes(date.today())
+        primera = conn.execute(text("SELECT MIN(fecha_venta) FROM venta")).scalar()
+        mes = min(_inicio_mes(primera), actual) if primera else actual
+        ultimo = actual
+        for _ in range(meses_futuros):
+            ultimo = _siguiente_mes(ultimo)
+
+        definiciones = []
+        while mes <= ultimo:
+            definiciones.append(
+                f"PARTITION {_nombre(mes)} VALUES LESS THAN ('{_siguiente_mes(mes).isoformat()}')"
+            )
+            mes = _siguiente_mes(mes)
+        conn.execute(text(
+            f"ALTER TABLE venta PARTITION BY RANGE COLUMNS(fecha_venta) "
+            f"({', '.join(definiciones)}, PARTITION {PMAX} VALUES LESS THAN (MAXVALUE))"
+        ))
+
+        definiciones = [
+            f"PARTITION {_nombre(mes)} VALUES LESS THAN ({limite})"
+            for mes, limite in _limites_detalle(conn, date.min, actual).items()
+        ]
+        definiciones.append(f"PARTITION {PMAX} VALUES LESS THAN (MAXVALUE)")
+        conn.execute(text(f"ALTER TABLE detalle_venta PARTITION BY RANGE (id_venta) ({', '.join(definiciones)})"))
+    return True
+
+
+# ==================== MAINTENANCE ====================
+def _particion_vacia(conn, tabla: str, nombre: str) -> bool:
+    return conn.execute(text(f"SELECT 1 FROM {tabla} PARTITION ({nombre}) LIMIT 1")).first() is None
+
+
+def _retirar(conn, tabla: str, nombre: str, modo: str):
+    """Exchange an old partition into a standalone table, or drop it if empty"""
+    if modo == "exchange":
+        destino = f"{tabla}_{nombre}"
+        conn.execute(text(f"CREATE TABLE {destino} LIKE {tabla}"))
+        conn.execute(text(f"ALTER TABLE {destino} REMOVE PARTITIONING"))
+        conn.execute(text(f"ALTER TABLE {tabla} EXCHANGE PARTITION {nombre} WITH TABLE {destino}"))
+    elif not _particion_vacia(conn, tabla, nombre):
+        logger.warning("%s.%s still has rows, archive the month first; not dropped", tabla, nombre)
+        return False
+    conn.execute(text(f"ALTER TABLE {tabla} DROP PARTITION {nombre}"))
+    logger.info("%s: %s partition %s", tabla, "exchanged" if modo == "exchange" else "dropped", nombre)
+    return True
+
+
+def mantener(engine, meses_futuros: int = MESES_FUTUROS, retener_meses: int = None, modo: str = "drop"):
+    """Pre-create future venta partitions, split closed months out of
+    detalle_venta's pmax and retire partitions older than `retener_meses`"""
+    if modo not in ("drop", "exchange"):
+        raise ValueError(f"Unknown mode: {modo}")
+    resumen = {"creadas": [], "retiradas": []}
+    with engine.begin() as conn:
+        if conn.dialect.name != "mysql" or not particiones(conn, "venta"):
+            logger.warning("Sales tables are not partitioned, nothing to maintain")
+            return resumen
+
+        actual = _inicio_mes(date.today())
+        ultimo = actual
+        for _ in range(meses_futuros):
+            ultimo = _siguiente_mes(ultimo)
+
+        # venta: one partition per month up to `meses_futuros` ahead
+        existentes = [nombre for nombre, _ in particiones(conn, "venta") if nombre != PMAX]
+        mes = _siguiente_mes(_mes(existentes[-1])) if existentes else actual
+        nuevas = []
+        while mes <= ultimo:
+            nuevas.append((_nombre(mes), f"'{_siguiente_mes(mes).isoformat()}'"))
+            mes = _siguiente_mes(mes)
+        _reorganizar_pmax(conn, "venta", nuevas)
+        resumen["creadas"] += [f"venta.{nombre}" for nombre, _ in nuevas]
+
+        # detalle_venta: months closed since the last split
+        existentes = [nombre for nombre, _ in particiones(conn, "detalle_venta") if nombre != PMAX]
+        desde = _siguiente_mes(_mes(existentes[-1])) if existentes else date.min
+        limite_previo = int(particiones(conn, "detalle_venta")[-2][1]) if existentes else 0
+        nuevas = [
+            (_nombre(mes), limite)
+            for mes, limite in _limites_detalle(conn, desde, actual).items()
+            if limite > limite_previo
+        ]
+        _reorganizar_pmax(conn, "detalle_venta", nuevas)
+        resumen["creadas"] += [f"detalle_venta.{nombre}" for nombre, _ in nuevas]
+
+        if retener_meses is not None:
+            corte = actual
+            for _ in range(retener_meses):
+                corte = _mes_anterior(corte)
+            for tabla in ("venta", "detalle_venta"):
+                # Keep at least one partition besides pmax
+                antiguas = [nombre for nombre, _ in particiones(conn, tabla) if nombre != PMAX][:-1]
+                for nombre in antiguas:
+                    if _mes(nombre) < corte and _retirar(conn, tabla, nombre, modo):
+                        resumen["retiradas"].append(f"{tabla}.{nombre}")
+    return resumen
+
+
+if __name__ == "__main__":
+    from .database import engine
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    parser = argparse.ArgumentParser(description="Maintain the monthly sales partitions")
+    parser.add_argument("--habilitar", action="store_true", help="Partition the sales tables first")
+    parser.add_argument("--meses-futuros", type=int, default=MESES_FUTUROS)
+    parser.add_argument("--retener", type=int, help="Retire partitions older than this many months")
+    parser.add_argument("--modo", choices=("drop", "exchange"), default="drop",
+                        help="drop: remove empty (archived) partitions; exchange: move them to standalone tables")
+    args = parser.parse_args()
+
+    if args.habilitar:
+        habilitar(engine, args.meses_futuros)
+    resultado = mantener(engine, args.meses_futuros, args.retener, args.modo)
+    print(f"{len(resultado['creadas'])} partitions created, {len(resultado['retiradas'])} retired")
@@ -0,0 +1,167 @@
+"""
+Cart pricing and validation
+
+Checkout prices the cart on the server instead of trusting the terminal.
+cargar_productos reads price, IGV flag, requiere_receta and unexpired stock
+for every product of the cart in one statement (producto LEFT JOIN the stock
+per product, both filtered with IN; the stock already excludes units held
+for other carts, see reservations), and calcular_carrito does the rest in
+Decimal: per line subtotal = cantidad x precio_venta, and total = subtotal.
+
+precio_venta is the shelf price and includes IGV, as retail prices in Peru
+must be shown. On lines that afecta_igv the IGV is split out of that
+amount: igv = total x IGV_TASA / (1 + IGV_TASA), rounded half-up to the
+céntimo, and the taxable base is total - igv.
+
+Promotions (see promotions) are taken off the shelf price: a line's
+descuento is taken off its subtotal, total = subtotal - descuento, and the
+IGV is split out of that total.
+
+A sale stores the lines' subtotals net of discounts and the cart total
+(venta.monto_total, pago.monto), all IGV included, so monto_total is the
+sum of detalle_venta.subtotal.
+
+create_venta prices the cart with the same functions and stores that result,
+so a checkout reads the products once.
+"""
+
+import os
+from datetime import date, datetime
+from decimal import Decimal, ROUND_HALF_UP
+
+from sqlalchemy import select, func
+from sqlalchemy.orm import Session
+
+from .models import Producto, Lote, Inventario
+from .promotions import motor_promociones
+from .reservations import reservado
+
+
+IGV_TASA = Decimal(os.getenv("IGV_TASA", "0.18"))
+CENTIMO = Decimal("0.01")
+
+
+class CarritoInvalidoError(Exception):
+    """Raised by create_venta when some line of the cart does not validate"""
+
+    def __init__(self, carrito: dict):
+        self.carrito = carrito
+        super().__init__("; ".join(
+            f"Producto {linea['id_producto']}: {linea['error']}"
+            for linea in carrito["lineas"] if linea["error"]
+        ) or "Venta sin detalles")
+
+
+def redondear(valor: Decimal) -> Decimal:
+    return valor.quantize(CENTIMO, rounding=ROUND_HALF_UP)
+
+
+def cargar_productos(db: Session, producto_ids, hoy: date = None, id_carrito: str = None) -> dict:
+    """id_producto -> row (precio_venta, afecta_igv, requiere_receta, stock, ...);
+    stock is what is available to the cart id_carrito"""
+    if not producto_ids:
+        return {}
+    hoy = hoy or date.today()
+    stock = select(
+        Lote.id_producto,
+        func.sum(Inventario.stock_actual - reservado(datetime.now(), id_carrito)).label("stock")
+    ).join(
+        Inventario, Inventario.id_lote == Lote.id_lote
+    ).where(
+        Lote.id_producto.in_(producto_ids), Lote.fecha_vencimiento > hoy
+    ).group_by(Lote.id_producto).subquery()
+    stmt = select(
+        Producto.id_producto,
+        Producto.nombre_comercial,
+        Producto.precio_venta,
+        Producto.afecta_igv,
+        Producto.requiere_receta,
+        func.coalesce(stock.c.stock, 0).label("stock")
+    ).outerjoin(
+        stock, stock.c.id_producto == Producto.id_producto
+    ).where(Producto.id_producto.in_(producto_ids))
+    return {row.id_producto: row for row in db.execute(stmt)}
+
+
+def _error(detalle, producto, vistos) -> str:
+    if detalle.id_producto in vistos:
+        return "Producto repetido"
+    if producto is None:
+        return "Producto no encontrado"
+    if detalle.cantidad <= 0:
+        return "Cantidad inválida"
+    if detalle.cantidad > producto.stock:
+        return f"Stock insuficiente (disponible: {producto.stock})"
+    # A price sent by the terminal is what the customer was quoted
+    if detalle.precio_unitario_venta is not None and detalle.precio_unitario_venta != producto.precio_venta:
+        return f"Precio desactualizado (actual: {producto.precio_venta})"
+    return None
+
+
+def calcular_carrito(detalles, productos: dict, promociones=None, hoy: date = None) -> dict:
+    """Price and validate cart lines (id_producto, cantidad and optionally the
+    precio_unitario_venta the terminal showed) against cargar_productos,
+    applying the promotions of a MotorPromociones if given"""
+    lineas = []
+    vistos = set()
+    for detalle in detalles:
+        producto = productos.get(detalle.id_producto)
+        error = _error(detalle, producto, vistos)
+        vistos.add(detalle.id_producto)
+        precio = producto.precio_venta if producto is not None else None
+        lineas.append({
+            "id_producto": detalle.id_producto,
+            "nombre_comercial": producto.nombre_comercial if producto is not None else None,
+            "cantidad": detalle.cantidad,
+            "precio_unitario_venta": precio,
+            "subtotal": redondear(detalle.cantidad * precio) if precio is not None else Decimal("0.00"),
+            "descuento": Decimal("0.00"),
+            "id_promocion": None,
+            "igv": Decimal("0.00"),
+            "total": None,
+            "afecta_igv": bool(producto is not None and producto.afecta_igv),
+            "requiere_receta": bool(producto is not None and producto.requiere_receta),
+            "stock_disponible": producto.stock if producto is not None else 0,
+            "error": error
+        })
+
+    aplicadas = {}
+    if promociones is not None:
+        for indice, (descuento, promocion) in promociones.aplicar(lineas, hoy).items():
+            lineas[indice]["descuento"] = descuento
+            lineas[indice]["id_promocion"] = promocion.id_promocion
+            aplicada = aplicadas.setdefault(promocion.id_promocion, {
+                "id_promocion": promocion.id_promocion,
+                "nombre": promocion.nombre,
+                "descuento": Decimal("0.00")
+            })
+            aplicada["descuento"] += descuento
+
+    for linea in lineas:
+        linea["total"] = linea["subtotal"] - linea["descuento"]
+        if linea["afecta_igv"]:
+            # Prices include IGV: split it out of the line's total
+            linea["igv"] = redondear(linea["total"] * IGV_TASA / (1 + IGV_TASA))
+
+    subtotal = sum((linea["subtotal"] for linea in lineas), Decimal("0.00"))
+    descuento = sum((linea["descuento"] for linea in lineas), Decimal("0.00"))
+    igv = sum((linea["igv"] for linea in lineas), Decimal("0.00"))
+    return {
+        "lineas": lineas,
+        "subtotal": subtotal,
+        "descuento": descuento,
+        "promociones": list(aplicadas.values()),
+        "igv": igv,
+        "total": subtotal - descuento,
+        "requiere_receta": any(linea["requiere_receta"] for linea in lineas),
+        "valido": bool(lineas) and not any(linea["error"] for linea in lineas)
+    }
+
+
+def cotizar(db: Session, detalles, id_carrito: str = None) -> dict:
+    motor_promociones.vigente(db)
+    return calcular_carrito(
+        detalles,
+        cargar_productos(db, {detalle.id_producto for detalle in detalles}, id_carrito=id_carrito),
+        motor_promociones
+    )
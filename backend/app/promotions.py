@@ -0,0 +1,271 @@
+"""
+Promotions and discounts
+
+Promotion rules (table promocion) apply to one product, every product of a
+categoria or every product with a componente. The active rules are compiled
+into an in-process index keyed by id_producto: product rules go in directly,
+and categoria / componente rules are expanded to their products with one
+query per junction table, restricted to the categories and components that
+have rules. Pricing a cart then only looks up the rules of its own products,
+however many rules exist.
+
+Rule types:
+  porcentaje  porcentaje off each line's subtotal
+  nxm         lleva n, paga m: in every group of n units the n - m cheapest
+              are free (units of all the lines the rule covers are grouped
+              together, most expensive first)
+  pack        n units for precio_pack: each group's discount is spread over
+              its units by price
+
+A line gets at most one promotion. Percentage discounts do not depend on
+the other lines, so each line only considers its highest percentage in
+effect. Then the candidate giving the largest discount is applied first and
+its lines are taken; the rest are re-evaluated on the lines left (lazily,
+since a rule's discount can only shrink), until no rule gives a discount. fecha_inicio / fecha_fin are checked when a cart is priced, so rules
+start and end without a rebuild.
+
+Each checkout compares the promocion and producto table versions with the
+version the index was compiled at, and recompiles it when promotions or
+product associations changed since.
+"""
+
+import heapq
+import threading
+from collections import defaultdict
+from datetime import date
+from decimal import Decimal, ROUND_HALF_UP
+
+from sqlalchemy import func, or_
+from sqlalchemy.orm import Session
+
+from . import schemas
+from .models import Promocion, ProductoCategoria, ProductoComponente, VersionTabla
+
+
+TIPOS = ("porcentaje", "nxm", "pack")
+TABLAS = ("promocion", "producto")
+
+
+def validar(promocion) -> str:
+    """Error message for an invalid rule, or None"""
+    if promocion.tipo not in TIPOS:
+        return f"Tipo de promoción inválido (use: {', '.join(TIPOS)})"
+    alcances = [promocion.id_producto, promocion.id_categoria, promocion.id_componente]
+    if sum(alcance is not None for alcance in alcances) != 1:
+        return "Indique solo uno de id_producto, id_categoria o id_componente"
+    if promocion.fecha_inicio and promocion.fecha_fin and promocion.fecha_fin < promocion.fecha_inicio:
+        return "fecha_fin anterior a fecha_inicio"
+    if promocion.tipo == "porcentaje":
+        if promocion.porcentaje is None or not 0 < promocion.porcentaje <= 100:
+            return "porcentaje debe estar entre 0 y 100"
+    elif promocion.lleva is None or promocion.lleva < 1:
+        return "lleva debe ser al menos 1"
+    elif promocion.tipo == "nxm":
+        if promocion.paga is None or not 0 <= promocion.paga < promocion.lleva:
+            return "paga debe ser menor que lleva"
+    elif promocion.precio_pack is None or promocion.precio_pack < 0:
+        return "precio_pack requerido"
+    return None
+
+
+def _centimos(valor: Decimal) -> int:
+    return int((valor * 100).to_integral_value(rounding=ROUND_HALF_UP))
+
+
+class _Regla:
+    """A rule as the engine evaluates it, amounts in céntimos"""
+
+    def __init__(self, promocion):
+        self.promocion = promocion
+        self.id_promocion = promocion.id_promocion
+        self.tipo = promocion.tipo
+        self.desde = promocion.fecha_inicio
+        self.hasta = promocion.fecha_fin
+        self.fechada = self.desde is not None or self.hasta is not None
+        # porcentaje in hundredths of a percent (12.5 % = 1250)
+        self.porcentaje = _centimos(promocion.porcentaje) if promocion.porcentaje is not None else 0
+        self.lleva = promocion.lleva or 1
+        self.paga = promocion.paga or 0
+        self.precio_pack = _centimos(promocion.precio_pack) if promocion.precio_pack is not None else 0
+
+    def vigente(self, hoy: date) -> bool:
+        return (self.desde is None or self.desde <= hoy) and (self.hasta is None or self.hasta >= hoy)
+
+    def descuento(self, precio: int, cantidad: int) -> int:
+        """Discount in céntimos of a single line"""
+        if self.tipo == "porcentaje":
+            return (precio * cantidad * self.porcentaje + 5000) // 10000
+        if self.tipo == "nxm":
+            return cantidad // self.lleva * (self.lleva - self.paga) * precio
+        return cantidad // self.lleva * max(self.lleva * precio - self.precio_pack, 0)
+
+    def descuentos(self, precios, cantidades, indices) -> list:
+        """Discount in céntimos of each of the lines at `indices`"""
+        if self.tipo == "porcentaje" or len(indices) == 1:
+            return [self.descuento(precios[i], cantidades[i]) for i in indices]
+
+        lleva = self.lleva
+        # Units of every line, most expensive first, cut in groups of `lleva`
+        unidades = sorted(
+            ((precios[i], posicion) for posicion, i in enumerate(indices) for _ in range(cantidades[i])),
+            reverse=True
+        )
+        montos = [0] * len(indices)
+        for inicio in range(0, len(unidades) - lleva + 1, lleva):
+            grupo = unidades[inicio:inicio + lleva]
+            if self.tipo == "nxm":
+                for precio, posicion in grupo[self.paga:]:
+                    montos[posicion] += precio
+                continue
+            suma = sum(precio for precio, _ in grupo)
+            descuento = suma - self.precio_pack
+            if descuento <= 0:
+                continue
+            # Spread by price; the céntimos left go to the most expensive units
+            partes = [descuento * precio // suma for precio, _ in grupo]
+            for orden in range(descuento - sum(partes)):
+                partes[orden] += 1
+            for parte, (_, posicion) in zip(partes, grupo):
+                montos[posicion] += parte
+        return montos
+
+
+class MotorPromociones:
+    def __init__(self):
+        self._version = None  # catalog version the index was compiled at; None = not compiled
+        # id_producto -> (porcentaje rules, highest first; nxm and pack rules)
+        self._por_producto = {}
+        self._lock = threading.Lock()
+
+    # ---- build ----
+    def compilar(self, promociones, categorias=(), componentes=(), version: int = 0):
+        """Index rules by product; `categorias` and `componentes` are the
+        (id_producto, id_categoria) / (id_producto, id_componente) rows of the
+        categories and components that have rules"""
+        por_producto = defaultdict(list)
+        por_categoria = defaultdict(list)
+        por_componente = defaultdict(list)
+        for promocion in promociones:
+            if not promocion.activa:
+                continue
+            regla = _Regla(promocion)
+            if promocion.id_producto is not None:
+                por_producto[promocion.id_producto].append(regla)
+            elif promocion.id_categoria is not None:
+                por_categoria[promocion.id_categoria].append(regla)
+            else:
+                por_componente[promocion.id_componente].append(regla)
+        for filas, reglas in ((categorias, por_categoria), (componentes, por_componente)):
+            for id_producto, valor in filas:
+                por_producto[id_producto].extend(reglas.get(valor, ()))
+
+        indice = {}
+        for id_producto, reglas in por_producto.items():
+            porcentajes = sorted(
+                (regla for regla in reglas if regla.tipo == "porcentaje"),
+                key=lambda regla: (-regla.porcentaje, regla.id_promocion)
+            )
+            indice[id_producto] = (porcentajes, [regla for regla in reglas if regla.tipo != "porcentaje"])
+        with self._lock:
+            self._por_producto = indice
+            self._version = version
+
+    def _cargar(self, db: Session, version: int):
+        promociones = [
+            schemas.Promocion.model_validate(db_promocion)
+            for db_promocion in db.query(Promocion).filter(
+                Promocion.activa.is_(True),
+                or_(Promocion.fecha_fin.is_(None), Promocion.fecha_fin >= date.today())
+            )
+        ]
+        categorias = {p.id_categoria for p in promociones if p.id_categoria is not None}
+        componentes = {p.id_componente for p in promociones if p.id_componente is not None}
+        self.compilar(
+            promociones,
+            db.query(ProductoCategoria.id_producto, ProductoCategoria.id_categoria).filter(
+                ProductoCategoria.id_categoria.in_(categorias)
+            ).all() if categorias else (),
+            db.query(ProductoComponente.id_producto, ProductoComponente.id_componente).filter(
+                ProductoComponente.id_componente.in_(componentes)
+            ).all() if componentes else (),
+            version
+        )
+
+    def vigente(self, db: Session):
+        """Recompile if promotions or product associations changed"""
+        version = db.query(func.max(VersionTabla.version)).filter(VersionTabla.tabla.in_(TABLAS)).scalar() or 0
+        if self._version is None or version != self._version:
+            self._cargar(db, version)
+
+    # ---- evaluation ----
+    def aplicar(self, lineas, hoy: date = None) -> dict:
+        """Best promotion per line: {line position: (descuento, promocion)}.
+        `lineas` are dicts with id_producto, cantidad and precio_unitario_venta;
+        lines without a price are skipped"""
+        hoy = hoy or date.today()
+        por_producto = self._por_producto
+
+        precios = [0] * len(lineas)
+        cantidades = [0] * len(lineas)
+        mejor = {}  # line position -> (céntimos, rule) of the best rule covering only that line
+        grupos = {}  # nxm / pack rule -> positions of the lines it covers
+        for indice, linea in enumerate(lineas):
+            reglas = por_producto.get(linea["id_producto"])
+            if reglas is None or linea["precio_unitario_venta"] is None or linea["cantidad"] <= 0:
+                continue
+            precios[indice] = precio = _centimos(linea["precio_unitario_venta"])
+            cantidades[indice] = cantidad = linea["cantidad"]
+            porcentajes, grupales = reglas
+            for regla in porcentajes:
+                if not regla.fechada or regla.vigente(hoy):
+                    mejor[indice] = (regla.descuento(precio, cantidad), regla)
+                    break
+            for regla in grupales:
+                indices = grupos.get(regla)
+                if indices is None:
+                    if regla.fechada and not regla.vigente(hoy):
+                        continue
+                    indices = grupos[regla] = []
+                indices.append(indice)
+
+        cola = []
+        for regla, indices in grupos.items():
+            if len(indices) == 1:
+                # Rules of a single line only compete with each other
+                indice = indices[0]
+                monto = regla.descuento(precios[indice], cantidades[indice])
+                if monto > mejor.get(indice, (0,))[0]:
+                    mejor[indice] = (monto, regla)
+                continue
+            montos = regla.descuentos(precios, cantidades, indices)
+            if sum(montos) > 0:
+                cola.append((-sum(montos), regla.id_promocion, indices, montos, regla))
+        for indice, (monto, regla) in mejor.items():
+            if monto > 0:
+                cola.append((-monto, regla.id_promocion, [indice], [monto], regla))
+        heapq.heapify(cola)
+
+        tomadas = set()
+        resultado = {}
+        while cola:
+            _, id_promocion, indices, montos, regla = heapq.heappop(cola)
+            libres = [indice for indice in indices if indice not in tomadas]
+            if len(libres) < len(indices):
+                # A larger promotion took some lines: queue again with the rest
+                if libres:
+                    montos = regla.descuentos(precios, cantidades, libres)
+                    if sum(montos) > 0:
+                        heapq.heappush(cola, (-sum(montos), id_promocion, libres, montos, regla))
+                continue
+            tomadas.update(indices)
+            for indice, monto in zip(indices, montos):
+                if monto > 0:
+                    resultado[indice] = (Decimal(monto).scaleb(-2), regla.promocion)
+        return resultado
+
+    def clear(self):
+        with self._lock:
+            self._version = None
+
+
+motor_promociones = MotorPromociones()
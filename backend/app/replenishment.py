@@ -0,0 +1,259 @@
+"""
+Replenishment suggestions from sales velocity
+
+Daily quantities per product come from detalle_venta in one grouped, streamed
+query over the longest velocity window. Velocity over several trailing
+windows, demand variability and days of cover are then computed with NumPy
+for all products at once, and suggested quantities are grouped by the
+supplier that last supplied each product to emit draft Pedidos in bulk.
+
+Run as a job with: python -m app.replenishment
+"""
+
+import math
+from datetime import date, timedelta
+
+import numpy as np
+from sqlalchemy import select, func, insert
+from sqlalchemy.orm import Session
+
+from . import crud, archive
+from .columnar import stream_columns, scatter_sum
+from .models import (
+    Venta, DetalleVenta, Inventario, Lote,
+    Pedido, DetallePedido, EstadoPedido, MotivoPedido, Compra,
+    Evento,
+)
+
+
+# Trailing windows (days) and their weight in the blended daily velocity
+VENTANAS = (7, 28, 90)
+PESOS = (0.2, 0.5, 0.3)
+LEAD_TIME_DIAS = 7
+DIAS_COBERTURA = 30
+Z_NIVEL_SERVICIO = 1.65  # ~95% service level for the safety stock
+ESTADO_BORRADOR = "Borrador"
+ESTADOS_CERRADOS = ("Entregado", "Cancelado")
+MOTIVO_STOCK_BAJO = "stock bajo"
+
+
+def cargar_ventas_diarias(db: Session, hoy: date, dias: int = max(VENTANAS)):
+    """(id_producto, days before `hoy`, quantity) per product and day, hot and archived"""
+    desde = hoy - timedelta(days=dias)
+    id_min, id_max = crud.get_rango_ids_venta(db, desde + timedelta(days=1), hoy)
+    stmt = select(
+        DetalleVenta.id_producto, Venta.fecha_venta, func.sum(DetalleVenta.cantidad)
+    ).join(Venta, Venta.id_venta == DetalleVenta.id_venta).where(
+        Venta.fecha_venta > desde,
+        Venta.fecha_venta <= hoy,
+        DetalleVenta.id_venta.between(id_min, id_max)
+    ).group_by(DetalleVenta.id_producto, Venta.fecha_venta)
+    producto_ids, fechas, cantidades = stream_columns(db, stmt, (np.int64, "datetime64[D]", np.float64))
+    dias_atras = (np.datetime64(hoy, "D") - fechas).astype(np.int64)
+
+    fechas_archivo, productos_archivo, cantidades_archivo, _ = archive.cargar_detalles(
+        db, desde + timedelta(days=1), hoy
+    )
+    if len(productos_archivo):
+        # Late sales can leave a day split between hot and archived rows, so
+        # regroup the union per (product, day) before computing variances
+        claves = np.concatenate([
+            producto_ids * dias + dias_atras,
+            productos_archivo * dias + (np.datetime64(hoy, "D") - fechas_archivo).astype(np.int64),
+        ])
+        claves, inverso = np.unique(claves, return_inverse=True)
+        cantidades = np.bincount(inverso, weights=np.concatenate([cantidades, cantidades_archivo]))
+        producto_ids, dias_atras = claves // dias, claves % dias
+    return producto_ids, dias_atras, cantidades
+
+
+def cargar_stock_vigente(db: Session, hoy: date):
+    """Stock per product counting only lots that have not expired"""
+    stmt = select(Lote.id_producto, func.sum(Inventario.stock_actual)).join(
+        Lote, Lote.id_lote == Inventario.id_lote
+    ).where(Lote.fecha_vencimiento > hoy).group_by(Lote.id_producto)
+    return stream_columns(db, stmt, (np.int64, np.int64))
+
+
+def cargar_en_pedido(db: Session):
+    """Quantities in open orders (not received, delivered or cancelled), drafts included"""
+    stmt = select(DetallePedido.id_producto, func.sum(DetallePedido.cantidad_solicitada)).join(
+        Pedido, Pedido.id_pedido == DetallePedido.id_pedido
+    ).join(
+        EstadoPedido, EstadoPedido.id_estado_pedido == Pedido.id_estado_pedido
+    ).outerjoin(
+        Compra, Compra.id_pedido == Pedido.id_pedido
+    ).where(
+        Compra.id_compra.is_(None),
+        EstadoPedido.descripcion.notin_(ESTADOS_CERRADOS)
+    ).group_by(DetallePedido.id_producto)
+    return stream_columns(db, stmt, (np.int64, np.int64))
+
+
+def cargar_ultimo_proveedor(db: Session):
+    """Supplier of the most recent order line for every product"""
+    stmt = select(DetallePedido.id_producto, Pedido.id_proveedor).join(
+        Pedido, Pedido.id_pedido == DetallePedido.id_pedido
+    ).order_by(Pedido.fecha_solicitud, Pedido.id_pedido)
+    producto_ids, proveedor_ids = stream_columns(db, stmt, (np.int64, np.int64))
+    # Last occurrence per product = first occurrence in the reversed arrays
+    productos, primeros = np.unique(producto_ids[::-1], return_index=True)
+    return productos, proveedor_ids[::-1][primeros]
+
+
+def calcular_sugerencias(venta_ids, dias_atras, cantidades, stock_ids, stock, pedido_ids, en_pedido,
+                         lead_time_dias: int = LEAD_TIME_DIAS, dias_cobertura: int = DIAS_COBERTURA,
+                         z: float = Z_NIVEL_SERVICIO):
+    """Vectorized reorder computation over every product with sales, stock or open orders"""
+    productos = np.unique(np.concatenate([venta_ids, stock_ids, pedido_ids]))
+    posiciones = np.searchsorted(productos, venta_ids)
+    n = len(productos)
+
+    # Blended daily velocity over the trailing windows
+    velocidad = np.zeros(n)
+    for ventana, peso in zip(VENTANAS, PESOS):
+        en_ventana = dias_atras < ventana
+        velocidad += peso * np.bincount(
+            posiciones[en_ventana], weights=cantidades[en_ventana], minlength=n
+        ) / ventana
+
+    # Daily demand deviation over the longest window (days without sales count as 0)
+    ventana = max(VENTANAS)
+    en_ventana = dias_atras < ventana
+    suma = np.bincount(posiciones[en_ventana], weights=cantidades[en_ventana], minlength=n)
+    suma_cuadrados = np.bincount(posiciones[en_ventana], weights=cantidades[en_ventana] ** 2, minlength=n)
+    media = suma / ventana
+    desviacion = np.sqrt(np.maximum(suma_cuadrados / ventana - media ** 2, 0.0))
+
+    disponible = scatter_sum(productos, stock_ids, stock)
+    pedido = scatter_sum(productos, pedido_ids, en_pedido)
+
+    seguridad = z * desviacion * math.sqrt(lead_time_dias)
+    punto_reorden = velocidad * lead_time_dias + seguridad
+    nivel_objetivo = velocidad * (lead_time_dias + dias_cobertura) + seguridad
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cobertura = np.where(velocidad > 0, disponible / velocidad, np.inf)
+
+    reponer = (velocidad > 0) & (disponible + pedido <= punto_reorden)
+    cantidad = np.ceil(nivel_objetivo - disponible - pedido).astype(np.int64)
+    reponer &= cantidad > 0
+
+    return {
+        "id_producto": productos[reponer],
+        "velocidad_diaria": velocidad[reponer],
+        "stock_disponible": disponible[reponer].astype(np.int64),
+        "en_pedido": pedido[reponer].astype(np.int64),
+        "dias_cobertura": cobertura[reponer],
+        "cantidad_sugerida": cantidad[reponer],
+    }
+
+
+def get_sugerencias(db: Session, hoy: date = None, lead_time_dias: int = LEAD_TIME_DIAS,
+                    dias_cobertura: int = DIAS_COBERTURA):
+    hoy = hoy or date.today()
+    resultado = calcular_sugerencias(
+        *cargar_ventas_diarias(db, hoy),
+        *cargar_stock_vigente(db, hoy),
+        *cargar_en_pedido(db),
+        lead_time_dias=lead_time_dias,
+        dias_cobertura=dias_cobertura,
+    )
+
+    # Supplier that last supplied each suggested product (None if never ordered)
+    proveedor_productos, proveedor_ids = cargar_ultimo_proveedor(db)
+    sugeridos = resultado["id_producto"]
+    proveedores = np.full(len(sugeridos), -1, dtype=np.int64)
+    if len(proveedor_productos):
+        posiciones = np.minimum(np.searchsorted(proveedor_productos, sugeridos), len(proveedor_productos) - 1)
+        encontrados = proveedor_productos[posiciones] == sugeridos
+        proveedores[encontrados] = proveedor_ids[posiciones[encontrados]]
+
+    return [
+        {
+            "id_producto": int(id_producto),
+            "id_proveedor": int(id_proveedor) if id_proveedor >= 0 else None,
+            "velocidad_diaria": round(float(velocidad), 3),
+            "stock_disponible": int(stock),
+            "en_pedido": int(en_pedido),
+            "dias_cobertura": round(float(cobertura), 1),
+            "cantidad_sugerida": int(cantidad),
+        }
+        for id_producto, id_proveedor, velocidad, stock, en_pedido, cobertura, cantidad in zip(
+            sugeridos, proveedores, resultado["velocidad_diaria"], resultado["stock_disponible"],
+            resultado["en_pedido"], resultado["dias_cobertura"], resultado["cantidad_sugerida"]
+        )
+    ]
+
+
+def _get_or_create_id(db: Session, model, pk, descripcion: str):
+    existente = db.query(pk).filter(model.descripcion == descripcion).scalar()
+    if existente is not None:
+        return existente
+    db_obj = model(descripcion=descripcion)
+    db.add(db_obj)
+    db.flush()
+    return getattr(db_obj, pk.key)
+
+
+def generar_pedidos_borrador(db: Session, usuario_id: int, hoy: date = None,
+                             lead_time_dias: int = LEAD_TIME_DIAS, dias_cobertura: int = DIAS_COBERTURA):
+    """Create one draft Pedido per supplier with the suggested quantities"""
+    hoy = hoy or date.today()
+    sugerencias = get_sugerencias(db, hoy, lead_time_dias, dias_cobertura)
+
+    por_proveedor = {}
+    for sugerencia in sugerencias:
+        if sugerencia["id_proveedor"] is not None:
+            por_proveedor.setdefault(sugerencia["id_proveedor"], []).append(sugerencia)
+    if not por_proveedor:
+        return [], sugerencias
+
+    id_estado = _get_or_create_id(db, EstadoPedido, EstadoPedido.id_estado_pedido, ESTADO_BORRADOR)
+    id_motivo = _get_or_create_id(db, MotivoPedido, MotivoPedido.id_motivo_pedido, MOTIVO_STOCK_BAJO)
+
+    proveedores = list(por_proveedor)
+    pedido_ids = crud.insert_returning_ids(db, Pedido, Pedido.id_pedido, [
+        {
+            "id_proveedor": id_proveedor,
+            "id_usuario": usuario_id,
+            "id_estado_pedido": id_estado,
+            "id_motivo_pedido": id_motivo,
+            "fecha_solicitud": hoy,
+            "motivo": "Sugerencia automática de reposición"
+        }
+        for id_proveedor in proveedores
+    ])
+    db.execute(insert(DetallePedido), [
+        {
+            "id_pedido": id_pedido,
+            "id_producto": sugerencia["id_producto"],
+            "cantidad_solicitada": sugerencia["cantidad_sugerida"]
+        }
+        for id_pedido, id_proveedor in zip(pedido_ids, proveedores)
+        for sugerencia in por_proveedor[id_proveedor]
+    ])
+    db.execute(insert(Evento), [
+        crud.evento_row("pedido", {
+            "id_pedido": id_pedido,
+            "id_proveedor": id_proveedor,
+            "id_estado_pedido": id_estado
+        })
+        for id_pedido, id_proveedor in zip(pedido_ids, proveedores)
+    ])
+    db.commit()
+    return pedido_ids, sugerencias
+
+
+if __name__ == "__main__":
+    from .database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        # TODO: Use a dedicated system user
+        pedidos, sugerencias = generar_pedidos_borrador(db, usuario_id=1005)
+        sin_proveedor = sum(1 for s in sugerencias if s["id_proveedor"] is None)
+        print(f"{len(sugerencias)} products to reorder, {len(pedidos)} draft orders created")
+        if sin_proveedor:
+            print(f"{sin_proveedor} products have no previous supplier and were skipped")
+    finally:
+        db.close()
@@ -0,0 +1,230 @@
+"""
+Stock reservations for open carts
+
+While a cashier builds a cart, its units are held so another terminal cannot
+sell them first. A hold is a reserva_stock row (id_carrito, id_inventario,
+cantidad, expira) taken from unexpired lots, earliest expiry first, and
+renewed (replaced) every time the cart changes; a cart that is abandoned
+simply lets its holds expire after RESERVA_TTL_SEGUNDOS.
+
+Available stock is stock_actual minus the active holds of other carts. The
+holds enter the stock queries as a correlated subquery per inventory row
+(pricing.cargar_productos, lotes_disponibles, barcode scans), answered from the
+(id_inventario, expira) index in the same statement, so checking them costs
+no extra round trip. Expired rows are ignored by those queries, so sweeping
+them is only housekeeping: each worker keeps a heap of the expiry times of
+the holds it wrote and deletes the due carts in one statement, at most
+RESERVA_BARRIDO_LOTE at a time, on its next reservation. Holds left by other
+workers are removed by: python -m app.reservations
+
+create_venta converts the cart's holds: inside the sale's transaction it
+locks the product's inventory rows, takes the lots held by the cart first
+and then others by expiry, subtracts the units from stock_actual and drops
+the holds. Batch (offline) sales go through the same conversion without a
+cart, so every sale takes its units out of stock.
+"""
+
+import heapq
+import os
+import threading
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, func, insert, update, literal
+from sqlalchemy.orm import Session
+
+from .models import Inventario, Lote, ReservaStock
+
+
+RESERVA_TTL = timedelta(seconds=int(os.getenv("RESERVA_TTL_SEGUNDOS", "600")))
+BARRIDO_LOTE = int(os.getenv("RESERVA_BARRIDO_LOTE", "500"))
+
+
+class StockInsuficienteError(Exception):
+    """Raised by convertir when stock ran out between pricing and the sale"""
+
+    def __init__(self, faltantes: dict):
+        self.faltantes = faltantes
+        super().__init__(", ".join(f"producto {id_producto}: faltan {falta}" for id_producto, falta in faltantes.items()))
+
+
+def reservado(ahora: datetime, id_carrito: str = None, propio: bool = False, inventario=Inventario):
+    """Units of the enclosing query's Inventario row (or `inventario` alias)
+    held by active holds of other carts (or, with propio, of this cart), as a
+    correlated subquery"""
+    condiciones = [ReservaStock.id_inventario == inventario.id_inventario, ReservaStock.expira > ahora]
+    if propio:
+        condiciones.append(ReservaStock.id_carrito == id_carrito)
+    elif id_carrito:
+        condiciones.append(ReservaStock.id_carrito != id_carrito)
+    return select(func.coalesce(func.sum(ReservaStock.cantidad), 0)).where(
+        *condiciones
+    ).correlate(inventario).scalar_subquery()
+
+
+def lotes_disponibles(db: Session, producto_ids, id_carrito: str = None, ahora: datetime = None,
+                      bloquear: bool = False):
+    """Unexpired inventory rows of the products with the units available to
+    this cart, in the order they are taken: the cart's own holds first, then
+    earliest expiry. With bloquear the rows stay locked until commit"""
+    ahora = ahora or datetime.now()
+    propio = reservado(ahora, id_carrito, propio=True) if id_carrito else literal(0)
+    stmt = select(
+        Inventario.id_inventario,
+        Inventario.id_lote,
+        Lote.id_producto,
+        Inventario.stock_actual,
+        (Inventario.stock_actual - reservado(ahora, id_carrito)).label("disponible")
+    ).join(
+        Lote, Lote.id_lote == Inventario.id_lote
+    ).where(
+        Lote.id_producto.in_(producto_ids), Lote.fecha_vencimiento > ahora.date()
+    ).order_by(Lote.id_producto, propio.desc(), Lote.fecha_vencimiento, Lote.id_lote)
+    if bloquear:
+        stmt = stmt.with_for_update(of=Inventario)
+    return db.execute(stmt).all()
+
+
+def asignar(filas, cantidades: dict):
+    """Split each product's quantity over its rows: ({id_producto:
+    [(row, cantidad)]}, {id_producto: units that did not fit})"""
+    pendientes = dict(cantidades)
+    asignaciones = {}
+    for fila in filas:
+        falta = pendientes.get(fila.id_producto, 0)
+        tomar = min(falta, max(fila.disponible, 0))
+        if tomar:
+            asignaciones.setdefault(fila.id_producto, []).append((fila, tomar))
+            pendientes[fila.id_producto] = falta - tomar
+    return asignaciones, {id_producto: falta for id_producto, falta in pendientes.items() if falta}
+
+
+class BarridoReservas:
+    """Expiry heap of the holds this worker wrote"""
+
+    def __init__(self, lote: int = BARRIDO_LOTE):
+        self._heap = []  # (expira, id_carrito)
+        self._lote = lote
+        self._lock = threading.Lock()
+
+    def programar(self, expira: datetime, id_carrito: str):
+        with self._lock:
+            heapq.heappush(self._heap, (expira, id_carrito))
+
+    def vencidas(self, ahora: datetime):
+        """Carts whose holds were due to expire by now (at most one batch)"""
+        carritos = set()
+        with self._lock:
+            while self._heap and self._heap[0][0] <= ahora and len(carritos) < self._lote:
+                carritos.add(heapq.heappop(self._heap)[1])
+        return carritos
+
+    def barrer(self, db: Session, ahora: datetime = None) -> int:
+        """Delete the due holds in the caller's transaction; holds renewed
+        since (a later expira) are kept"""
+        ahora = ahora or datetime.now()
+        carritos = self.vencidas(ahora)
+        if not carritos:
+            return 0
+        return db.query(ReservaStock).filter(
+            ReservaStock.id_carrito.in_(carritos), ReservaStock.expira <= ahora
+        ).delete(synchronize_session=False)
+
+    def clear(self):
+        with self._lock:
+            self._heap = []
+
+
+barrido_reservas = BarridoReservas()
+
+
+def reservar(db: Session, id_carrito: str, detalles) -> datetime:
+    """Replace the cart's holds with holds for these lines (as many units as
+    are available) and return when they expire"""
+    ahora = datetime.now()
+    barrido_reservas.barrer(db, ahora)
+    db.query(ReservaStock).filter(ReservaStock.id_carrito == id_carrito).delete(synchronize_session=False)
+
+    cantidades = {}
+    for detalle in detalles:
+        if detalle.cantidad > 0:
+            cantidades[detalle.id_producto] = cantidades.get(detalle.id_producto, 0) + detalle.cantidad
+    expira = ahora + RESERVA_TTL
+    if cantidades:
+        asignaciones, _ = asignar(lotes_disponibles(db, cantidades, id_carrito, ahora, bloquear=True), cantidades)
+        filas = [
+            {"id_carrito": id_carrito, "id_inventario": fila.id_inventario, "cantidad": cantidad, "expira": expira}
+            for tomadas in asignaciones.values() for fila, cantidad in tomadas
+        ]
+        if filas:
+            db.execute(insert(ReservaStock), filas)
+    db.commit()
+    if cantidades:
+        barrido_reservas.programar(expira, id_carrito)
+    return expira
+
+
+def liberar(db: Session, id_carrito: str) -> int:
+    liberadas = db.query(ReservaStock).filter(ReservaStock.id_carrito == id_carrito).delete(synchronize_session=False)
+    db.commit()
+    return liberadas
+
+
+def descontar(db: Session, id_carrito: str, lineas) -> tuple:
+    """Take the sold units that are available out of stock_actual in the
+    caller's transaction, the cart's held lots first. Returns the changed rows
+    as (id_inventario, id_lote, new stock_actual) and {id_producto: units that
+    did not fit}"""
+    ahora = datetime.now()
+    cantidades = {linea["id_producto"]: linea["cantidad"] for linea in lineas}
+    asignaciones, faltantes = asignar(lotes_disponibles(db, cantidades, id_carrito, ahora, bloquear=True), cantidades)
+    cambios = []
+    for id_producto, tomadas in asignaciones.items():
+        for fila, cantidad in tomadas:
+            resultado = db.execute(
+                update(Inventario).where(
+                    Inventario.id_inventario == fila.id_inventario,
+                    Inventario.stock_actual >= cantidad
+                ).values(stock_actual=Inventario.stock_actual - cantidad)
+            )
+            if resultado.rowcount != 1:
+                faltantes[id_producto] = faltantes.get(id_producto, 0) + cantidad
+            else:
+                cambios.append((fila.id_inventario, fila.id_lote, fila.stock_actual - cantidad))
+    return cambios, faltantes
+
+
+def convertir(db: Session, id_carrito: str, lineas) -> list:
+    """Take the sold units out of stock_actual in the caller's transaction,
+    the cart's held lots first, and drop its holds. Returns the changed rows
+    as (id_inventario, id_lote, new stock_actual), or raises StockInsuficienteError
+    with the products that no longer fit"""
+    cambios, faltantes = descontar(db, id_carrito, lineas)
+    if faltantes:
+        raise StockInsuficienteError(faltantes)
+    if id_carrito:
+        db.query(ReservaStock).filter(ReservaStock.id_carrito == id_carrito).delete(synchronize_session=False)
+    return cambios
+
+
+def barrer_todo(db: Session, lote: int = BARRIDO_LOTE) -> int:
+    """Delete every expired hold, one batch per transaction"""
+    total = 0
+    while True:
+        ids = db.scalars(
+            select(ReservaStock.id_reserva).where(ReservaStock.expira <= datetime.now()).limit(lote)
+        ).all()
+        if not ids:
+            return total
+        db.query(ReservaStock).filter(ReservaStock.id_reserva.in_(ids)).delete(synchronize_session=False)
+        db.commit()
+        total += len(ids)
+
+
+if __name__ == "__main__":
+    from .database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        print(f"{barrer_todo(db)} expired stock reservations deleted")
+    finally:
+        db.close()
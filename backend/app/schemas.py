@@ -1,5 +1,5 @@
-from pydantic import BaseModel, ConfigDict
-from typing import Optional, List
+from pydantic import BaseModel, ConfigDict, Field
+from typing import Optional, List, Dict
 from datetime import date, time, datetime
 from decimal import Decimal
 
@@ -167,11 +167,79 @@ class ProductoUpdate(BaseModel):
     precio_venta: Optional[Decimal] = None
     afecta_igv: Optional[bool] = None
     requiere_receta: Optional[bool] = None
+    # Replace the product's associations (omit to leave them unchanged)
+    categorias: Optional[List[int]] = None
+    presentaciones: Optional[List[int]] = None
+    componentes: Optional[List[int]] = None
 
 class Producto(ProductoBase):
     id_producto: int
     model_config = ConfigDict(from_attributes=True)
 
+class ProductoCompleto(Producto):
+    categorias: List[Categoria]
+    presentaciones: List[Presentacion]
+    componentes: List[Componente]
+
+class PrecioProducto(BaseModel):
+    id_producto: int
+    precio_venta: Decimal
+
+class ReglaPrecio(BaseModel):
+    # Products in the categoria and/or with the componente
+    id_categoria: Optional[int] = None
+    id_componente: Optional[int] = None
+    porcentaje: Decimal = Decimal("0")  # 5 = +5 %
+    monto: Decimal = Decimal("0")  # added after the percentage
+
+class ActualizacionPrecios(BaseModel):
+    # Rules apply in order, then the explicit prices
+    reglas: List[ReglaPrecio] = []
+    precios: List[PrecioProducto] = []
+
+class ResultadoPrecios(BaseModel):
+    actualizados: int
+    valido_desde: datetime
+
+class HistorialPrecio(BaseModel):
+    id_producto: int
+    precio_venta: Decimal
+    valido_desde: Optional[datetime] = None
+    model_config = ConfigDict(from_attributes=True)
+
+class CodigoBarrasCreate(BaseModel):
+    codigo: str
+
+class CodigoBarras(BaseModel):
+    id_producto: int
+    codigo: str
+    tipo: str
+    model_config = ConfigDict(from_attributes=True)
+
+class Escaneo(BaseModel):
+    # What the code says
+    codigo: str
+    gtin: Optional[str] = None
+    codigo_lote: Optional[str] = None
+    fecha_vencimiento: Optional[date] = None
+    serie: Optional[str] = None
+    # What it resolves to
+    id_producto: int
+    codigo_interno: str
+    nombre_comercial: str
+    precio_venta: Decimal
+    afecta_igv: bool
+    requiere_receta: bool
+    stock: int  # unexpired stock of the product
+    id_lote: Optional[int] = None
+    vencimiento_lote: Optional[date] = None
+    stock_lote: Optional[int] = None
+
+class FacetasProducto(BaseModel):
+    total: int
+    ids: List[int]
+    facetas: Dict[str, Dict[str, int]]  # faceta -> valor -> productos
+
 
 # ==================== INVENTARIO ====================
 class UbicacionEstanteBase(BaseModel):
@@ -198,6 +266,7 @@ class LoteCreate(LoteBase):
 
 class Lote(LoteBase):
     id_lote: int
+    fecha_ingreso: date
     model_config = ConfigDict(from_attributes=True)
 
 
@@ -277,6 +346,16 @@ class Pedido(PedidoBase):
     id_usuario: int
     model_config = ConfigDict(from_attributes=True)
 
+# List row; the extra fields are present when requested with include=
+class PedidoLista(Pedido):
+    razon_social: Optional[str] = None
+    estado_pedido: Optional[str] = None
+
+class ResumenEstadoPedido(BaseModel):
+    id_estado_pedido: int
+    estado: str
+    cantidad: int
+
 class ProveedorInfo(BaseModel):
     razon_social: Optional[str] = None
     ruc: Optional[str] = None
@@ -332,6 +411,15 @@ class Compra(CompraBase):
     id_compra: int
     model_config = ConfigDict(from_attributes=True)
 
+class CompraLista(Compra):
+    razon_social: Optional[str] = None
+    estado_pedido: Optional[str] = None
+
+class ResumenEstadoCompra(BaseModel):
+    estado: str
+    cantidad: int
+    monto_total: Decimal
+
 
 # ==================== VENTA ====================
 class MetodoPagoBase(BaseModel):
@@ -348,7 +436,8 @@ class MetodoPago(MetodoPagoBase):
 class DetalleVentaItem(BaseModel):
     id_producto: int
     cantidad: int
-    precio_unitario_venta: Decimal
+    # Priced by the server; when sent it must match the current price
+    precio_unitario_venta: Optional[Decimal] = None
 
 class VentaBase(BaseModel):
     id_cliente: int
@@ -357,7 +446,8 @@ class VentaCreate(VentaBase):
     detalles: List[DetalleVentaItem]
     id_metodo_pago: int
     tipo_comprobante: str
-    nro_comprobante: str
+    nro_comprobante: Optional[str] = None  # Assigned by the backend when omitted
+    id_carrito: Optional[str] = None  # Cart whose stock reservations the sale converts
 
 class Venta(VentaBase):
     id_venta: int
@@ -367,6 +457,12 @@ class Venta(VentaBase):
     monto_total: Decimal
     model_config = ConfigDict(from_attributes=True)
 
+class VentaLista(Venta):
+    cliente_nombre: Optional[str] = None
+    tipo_comprobante: Optional[str] = None
+    nro_comprobante: Optional[str] = None
+    metodo_pago: Optional[str] = None
+
 
 class ComprobanteBase(BaseModel):
     tipo_comprobante: str
@@ -376,3 +472,201 @@ class Comprobante(ComprobanteBase):
     id_comprobante: int
     id_venta: int
     model_config = ConfigDict(from_attributes=True)
+
+
+# Response for a newly registered sale, including its receipt number
+class VentaRegistrada(Venta):
+    comprobante: Optional[ComprobanteBase] = None
+
+
+# ==================== PROMOCION ====================
+class PromocionBase(BaseModel):
+    nombre: str
+    tipo: str  # porcentaje, nxm, pack
+    # Exactly one scope
+    id_producto: Optional[int] = None
+    id_categoria: Optional[int] = None
+    id_componente: Optional[int] = None
+    porcentaje: Optional[Decimal] = None  # porcentaje: 10 = 10 % off
+    lleva: Optional[int] = None  # nxm and pack: units per group
+    paga: Optional[int] = None  # nxm: units paid per group (2x1: lleva 2, paga 1)
+    precio_pack: Optional[Decimal] = None  # pack: price of a group
+    fecha_inicio: Optional[date] = None
+    fecha_fin: Optional[date] = None
+    activa: bool = True
+
+class PromocionCreate(PromocionBase):
+    pass
+
+class Promocion(PromocionBase):
+    id_promocion: int
+    model_config = ConfigDict(from_attributes=True)
+
+class PromocionAplicada(BaseModel):
+    id_promocion: int
+    nombre: str
+    descuento: Decimal
+
+
+# Cart pricing (checkout)
+class CarritoCreate(BaseModel):
+    detalles: List[DetalleVentaItem]
+    id_carrito: Optional[str] = None  # Stock held for this cart counts as available
+
+class LineaCarrito(BaseModel):
+    id_producto: int
+    nombre_comercial: Optional[str] = None
+    cantidad: int
+    precio_unitario_venta: Optional[Decimal] = None
+    subtotal: Decimal
+    descuento: Decimal = Decimal("0.00")
+    id_promocion: Optional[int] = None
+    igv: Decimal  # Included in total
+    total: Decimal
+    afecta_igv: bool
+    requiere_receta: bool
+    stock_disponible: int
+    error: Optional[str] = None
+
+class Carrito(BaseModel):
+    lineas: List[LineaCarrito]
+    subtotal: Decimal
+    descuento: Decimal = Decimal("0.00")
+    promociones: List[PromocionAplicada] = []
+    igv: Decimal  # Included in total (prices include IGV)
+    total: Decimal
+    requiere_receta: bool
+    valido: bool
+    expira: Optional[datetime] = None  # When the cart's stock reservations expire
+
+
+# Full sale for the detail page and receipt printing
+class ClienteVentaInfo(BaseModel):
+    nro_doc: str
+    tipo_doc: str
+    nombres: str
+    apellido_paterno: str
+    apellido_materno: Optional[str] = None
+
+class DetalleVentaInfo(BaseModel):
+    id_producto: int
+    nombre_comercial: str
+    cantidad: int
+    precio_unitario_venta: Decimal
+    subtotal: Decimal
+
+class PagoInfo(BaseModel):
+    id_metodo_pago: int
+    metodo_pago: str
+    fecha_hora: datetime
+    monto: Decimal
+
+class VentaDetalle(Venta):
+    cliente: Optional[ClienteVentaInfo] = None
+    detalles: List[DetalleVentaInfo]
+    pago: Optional[PagoInfo] = None
+    comprobante: Optional[ComprobanteBase] = None
+
+
+
+# ==================== VENTA BATCH ====================
+# Sales queued by an offline POS terminal and posted back together
+class VentaBatchItem(VentaCreate):
+    fecha_hora: Optional[datetime] = None  # When the sale happened on the terminal
+    idempotency_key: Optional[str] = Field(None, max_length=64)  # Same limit as the Idempotency-Key header
+
+class VentaBatchCreate(BaseModel):
+    ventas: List[VentaBatchItem]
+    atomico: bool = False  # All-or-nothing: register no sale if any of them is invalid
+
+class VentaBatchResultado(BaseModel):
+    indice: int
+    id_venta: Optional[int] = None
+    nro_comprobante: Optional[str] = None
+    replay: bool = False
+    error: Optional[str] = None
+    advertencia: Optional[str] = None  # Registered, but stock did not cover every unit
+
+class VentaBatchRespuesta(BaseModel):
+    registradas: int
+    resultados: List[VentaBatchResultado]
+
+
+
+# ==================== SYNC ====================
+class CambiosCatalogoTablas(BaseModel):
+    producto: List[Producto] = []
+    cliente: List[Cliente] = []
+    proveedor: List[Proveedor] = []
+    categoria: List[Categoria] = []
+    presentacion: List[Presentacion] = []
+    componente: List[Componente] = []
+    metodo_pago: List[MetodoPago] = []
+
+class CambiosCatalogo(BaseModel):
+    version: int  # Pass as `since` on the next call
+    completo: bool  # False when more changes remain after `version`
+    cambios: CambiosCatalogoTablas
+    eliminados: Dict[str, List[int]]
+
+
+
+# ==================== REPOSICION ====================
+class SugerenciaReposicion(BaseModel):
+    id_producto: int
+    id_proveedor: Optional[int] = None  # Last supplier; None if never ordered
+    velocidad_diaria: float
+    stock_disponible: int
+    en_pedido: int
+    dias_cobertura: float
+    cantidad_sugerida: int
+
+class PedidosReposicion(BaseModel):
+    pedidos: List[int]
+    sugerencias: List[SugerenciaReposicion]
+
+
+
+# ==================== ANALYTICS ====================
+class ProductoAnalytics(BaseModel):
+    id_producto: int
+    nombre_comercial: Optional[str] = None
+    cantidad: int
+    ingresos: float
+    margen: Optional[float] = None  # None when the product has no lots to cost it
+    clase_abc: str
+
+class CategoriaAnalytics(BaseModel):
+    id_categoria: int
+    nombre_categoria: Optional[str] = None
+    ingresos: float
+    margen: float
+
+class ResumenVentas(BaseModel):
+    desde: date
+    hasta: date
+    ingresos_total: float
+    costo_total: float
+    margen_total: float
+    ingresos_sin_costo: float
+    productos_vendidos: int
+    abc: Dict[str, int]
+    top_productos: List[ProductoAnalytics]
+    categorias: List[CategoriaAnalytics]
+
+
+# ==================== COSTO DE VENTAS ====================
+class CostoVentaPeriodo(BaseModel):
+    periodo: str  # YYYY-MM
+    id: int  # id_producto or id_categoria, depending on the grouping
+    nombre: Optional[str] = None
+    cantidad: int
+    costo: float
+    cantidad_sin_costo: int
+
+class ProcesoCosto(BaseModel):
+    metodo: str
+    lotes_procesados: int
+    lineas_procesadas: int
+    ultimo_id_lote: int
+    ultimo_id_venta: int
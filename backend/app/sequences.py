@@ -0,0 +1,150 @@
+"""
+Server-side receipt (Comprobante) numbering
+
+Each worker process reserves a block of numbers per series with one atomic
+UPDATE on the serie_comprobante row and hands them out from memory, so a sale
+does not pay an extra round-trip for its number and two workers can never
+receive the same one. Numbers left in a block when a worker stops are skipped.
+
+A series without its row yet (new database, new receipt type) is created on
+first use, continuing after the highest number already issued in it.
+"""
+
+import os
+import threading
+
+from sqlalchemy import update, select, insert, func
+from sqlalchemy.exc import IntegrityError
+
+from .database import engine
+from .models import SerieComprobante, Comprobante
+
+
+# Numbers reserved per refill
+BLOCK_SIZE = int(os.getenv("COMPROBANTE_BLOCK_SIZE", "50"))
+
+# Series created on first use for each receipt type
+SERIES_DEFECTO = {"Boleta": "B001", "Factura": "F001"}
+
+
+class SerieDesconocidaError(Exception):
+    """Raised when there is no serie_comprobante row for a receipt type"""
+
+
+class NumeroReservadoError(Exception):
+    """Raised when a client supplies a number from a server-allocated series"""
+
+
+class ComprobanteAllocator:
+    def __init__(self, bind, block_size: int = BLOCK_SIZE):
+        self._bind = bind
+        self._block_size = block_size
+        self._lock = threading.Lock()
+        # tipo_comprobante -> [serie, next number, last number of the block]
+        self._blocks = {}
+        # Series numbered by the server, loaded on first check
+        self._series = None
+
+    def next_numero(self, tipo_comprobante: str) -> str:
+        with self._lock:
+            block = self._blocks.get(tipo_comprobante)
+            if block is None or block[1] > block[2]:
+                block = self._reserve_block(tipo_comprobante)
+                self._blocks[tipo_comprobante] = block
+            serie, numero, _ = block
+            block[1] += 1
+        return f"{serie}-{numero:06d}"
+
+    def es_asignada(self, nro_comprobante: str) -> bool:
+        """Whether the number belongs to a series this allocator hands out"""
+        with self._lock:
+            if self._series is None:
+                with self._bind.connect() as conn:
+                    self._series = set(SERIES_DEFECTO.values()) | set(
+                        conn.execute(select(SerieComprobante.serie)).scalars()
+                    )
+            series = self._series
+        return nro_comprobante.split("-", 1)[0] in series
+
+    def reset(self):
+        """Drop the reserved blocks (e.g. after the series were edited by hand)"""
+        with self._lock:
+            self._blocks.clear()
+            self._series = None
+
+    def _reserve_block(self, tipo_comprobante: str):
+        try:
+            return self._update_block(tipo_comprobante)
+        except SerieDesconocidaError:
+            if tipo_comprobante not in SERIES_DEFECTO:
+                raise
+            self._crear_serie(tipo_comprobante, SERIES_DEFECTO[tipo_comprobante])
+            return self._update_block(tipo_comprobante)
+
+    def _crear_serie(self, tipo_comprobante: str, serie: str):
+        # Longest then greatest number is the highest one even past the
+        # six-digit padding
+        nro = Comprobante.nro_comprobante
+        with self._bind.begin() as conn:
+            ultimo = conn.execute(
+                select(nro).where(nro.like(f"{serie}-%"))
+                .order_by(func.length(nro).desc(), nro.desc()).limit(1)
+            ).scalar()
+            try:
+                ultimo_numero = int(ultimo.split("-", 1)[1]) if ultimo else 0
+            except ValueError:
+                ultimo_numero = 0
+            try:
+                with conn.begin_nested():
+                    conn.execute(insert(SerieComprobante).values(
+                        tipo_comprobante=tipo_comprobante, serie=serie, ultimo_numero=ultimo_numero
+                    ))
+            except IntegrityError:
+                # Another worker created it first
+                pass
+        self._series = None
+
+    def _update_block(self, tipo_comprobante: str):
+        condition = SerieComprobante.tipo_comprobante == tipo_comprobante
+        nuevo_ultimo = SerieComprobante.ultimo_numero + self._block_size
+
+        with self._bind.begin() as conn:
+            if conn.dialect.name == "mysql":
+                # LAST_INSERT_ID(expr) makes the new value available as the
+                # statement's lastrowid, so the UPDATE alone returns it
+                result = conn.execute(
+                    update(SerieComprobante).where(condition)
+                    .values(ultimo_numero=func.last_insert_id(nuevo_ultimo))
+                )
+                if result.rowcount == 0:
+                    raise SerieDesconocidaError(tipo_comprobante)
+                ultimo = result.lastrowid
+                serie = conn.execute(
+                    select(SerieComprobante.serie).where(condition)
+                ).scalar_one()
+            elif conn.dialect.update_returning:
+                row = conn.execute(
+                    update(SerieComprobante).where(condition)
+                    .values(ultimo_numero=nuevo_ultimo)
+                    .returning(SerieComprobante.serie, SerieComprobante.ultimo_numero)
+                ).first()
+                if row is None:
+                    raise SerieDesconocidaError(tipo_comprobante)
+                serie, ultimo = row
+            else:
+                # The UPDATE holds the row lock until commit, so the read
+                # below sees our own increment
+                result = conn.execute(
+                    update(SerieComprobante).where(condition)
+                    .values(ultimo_numero=nuevo_ultimo)
+                )
+                if result.rowcount == 0:
+                    raise SerieDesconocidaError(tipo_comprobante)
+                serie, ultimo = conn.execute(
+                    select(SerieComprobante.serie, SerieComprobante.ultimo_numero).where(condition)
+                ).one()
+
+        return [serie, ultimo - self._block_size + 1, ultimo]
+
+
+comprobante_allocator = ComprobanteAllocator(engine)
@@ -0,0 +1,43 @@
+"""
+Fast JSON path for large list endpoints
+
+Returning ORM objects makes FastAPI validate every row against the
+response_model (from_attributes) and then encode it again with the stdlib
+json module. List endpoints instead select only the schema's columns as
+plain rows and return a FastJSONResponse, which FastAPI sends untouched; the
+response_model stays on the route for the OpenAPI schema.
+
+The output is byte-for-byte what Pydantic would produce: orjson writes
+date/time in ISO format like Pydantic does, and Decimal goes through str()
+(Pydantic's JSON mode), so amounts such as "12.50" keep their scale.
+"""
+
+from decimal import Decimal
+
+import orjson
+from fastapi.responses import JSONResponse
+
+
+def _default(obj):
+    if isinstance(obj, Decimal):
+        return str(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def a_json(content) -> bytes:
+    return orjson.dumps(content, default=_default)
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content) -> bytes:
+        return a_json(content)
+
+
+def columnas(model, schema):
+    """Model columns named like the schema's fields, in the schema's field order"""
+    return [getattr(model, nombre) for nombre in schema.model_fields]
+
+
+def filas(rows):
+    """Result rows as dicts keyed by column name"""
+    return [row._asdict() for row in rows]
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the NumPy sales analytics, replenishment and costing computations
+Generates synthetic columnar data (no database needed) and times the pure
+computation functions used by the API
+"""
+
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+# Add backend directory to path
+backend_dir = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from app.analytics import calcular_resumen
+from app.replenishment import calcular_sugerencias
+from app.costing import costear_fifo, costear_promedio, _estado_vacio, PROMEDIO, FIFO
+
+
+def timeit(fn, repeat=5):
+    """Best of `repeat` runs, in milliseconds"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def bench_analytics(filas, productos=50_000, lotes=200_000, categorias=200, seed=0):
+    rng = np.random.default_rng(seed)
+    producto_ids = rng.integers(1, productos + 1, filas)
+    cantidades = rng.integers(1, 10, filas)
+    subtotales = cantidades * rng.integers(100, 20_000, filas)
+    lote_productos = rng.integers(1, productos + 1, lotes)
+    lote_cantidades = rng.integers(10, 500, lotes).astype(np.float64)
+    lote_costos = rng.uniform(0.5, 150.0, lotes)
+    categoria_productos = np.repeat(np.arange(1, productos + 1), 2)
+    categoria_ids = rng.integers(1, categorias + 1, len(categoria_productos))
+
+    ms = timeit(lambda: calcular_resumen(
+        producto_ids, cantidades, subtotales, lote_productos, lote_cantidades, lote_costos,
+        categoria_productos, categoria_ids,
+    ))
+    print(f"  analytics  {filas:>10,d} detail rows  {ms:8.1f} ms")
+
+
+def bench_replenishment(productos=50_000, dias=90, densidad=0.5, seed=0):
+    rng = np.random.default_rng(seed)
+    filas = int(productos * dias * densidad)
+    venta_ids = rng.integers(1, productos + 1, filas)
+    dias_atras = rng.integers(0, dias, filas)
+    cantidades = rng.integers(1, 20, filas).astype(np.float64)
+    stock_ids = np.arange(1, productos + 1)
+    stock = rng.integers(0, 500, productos)
+    vacio = np.empty(0, dtype=np.int64)
+
+    ms = timeit(lambda: calcular_sugerencias(venta_ids, dias_atras, cantidades, stock_ids, stock, vacio, vacio),
+                repeat=3)
+    print(f"  reposicion {filas:>10,d} daily rows   {ms:8.1f} ms  ({productos:,d} SKUs)")
+
+
+def bench_costing(filas, productos=50_000, lotes=200_000, seed=0):
+    rng = np.random.default_rng(seed)
+    lote_ids = np.arange(1, lotes + 1)
+    lote_fechas = np.sort(rng.integers(19_000, 20_000, lotes))
+    lote_productos = rng.integers(1, productos + 1, lotes)
+    lote_cantidades = rng.integers(10, 500, lotes)
+    lote_costos = rng.integers(50, 15_000, lotes).astype(np.float64)
+    venta_productos = rng.integers(1, productos + 1, filas)
+    venta_cantidades = rng.integers(1, 10, filas)
+
+    ms = timeit(lambda: costear_promedio(_estado_vacio(PROMEDIO), lote_productos, lote_cantidades, lote_costos,
+                                         venta_productos, venta_cantidades), repeat=3)
+    print(f"  promedio   {filas:>10,d} sale lines   {ms:8.1f} ms")
+    ms = timeit(lambda: costear_fifo(_estado_vacio(FIFO), lote_ids, lote_fechas, lote_productos, lote_cantidades,
+                                     lote_costos, venta_productos, venta_cantidades), repeat=3)
+    print(f"  fifo       {filas:>10,d} sale lines   {ms:8.1f} ms")
+
+
+def main():
+    print("=" * 60)
+    print("ANALYTICS BENCHMARK")
+    print("=" * 60)
+    for filas in (100_000, 1_000_000, 5_000_000):
+        bench_analytics(filas)
+    bench_replenishment()
+    bench_costing(5_000_000)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the product facet index
+Builds the bitmaps from synthetic catalog columns (no database needed) and
+times facet queries and single-product updates
+"""
+
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+# Add backend directory to path
+backend_dir = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from app.facets import IndiceFacetas
+
+
+def timeit(fn, repeat=200):
+    """Best of `repeat` runs, in microseconds"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1_000_000
+
+
+class _Producto:
+    def __init__(self, id_producto, requiere_receta, afecta_igv):
+        self.id_producto = id_producto
+        self.requiere_receta = requiere_receta
+        self.afecta_igv = afecta_igv
+
+
+def bench(productos, categorias=200, presentaciones=50, componentes=1_000, seed=0):
+    rng = np.random.default_rng(seed)
+    ids = np.arange(1, productos + 1)
+    banderas = {"requiere_receta": rng.random(productos) < 0.3, "afecta_igv": rng.random(productos) < 0.8}
+
+    def relacion(por_producto, valores):
+        filas = productos * por_producto
+        return rng.integers(1, productos + 1, filas), rng.integers(1, valores + 1, filas)
+
+    relaciones = {
+        "categoria": relacion(2, categorias),
+        "presentacion": relacion(1, presentaciones),
+        "componente": relacion(3, componentes),
+    }
+    indice = IndiceFacetas()
+    start = time.perf_counter()
+    indice.construir(ids, banderas, relaciones, version=0)
+    build_ms = (time.perf_counter() - start) * 1000
+    print(f"  {productos:>9,d} products  build {build_ms:8.1f} ms")
+
+    consultas = {
+        "no filter": {},
+        "1 categoria": {"categoria": [1]},
+        "2 categorias + receta": {"categoria": [1, 2], "requiere_receta": False},
+        "categoria + presentacion + igv": {"categoria": [3], "presentacion": [1], "afecta_igv": True},
+    }
+    for nombre, filtros in consultas.items():
+        resultado = indice.filtrar(filtros)
+        us = timeit(lambda: indice.filtrar(filtros), repeat=20)
+        print(f"    {nombre:<32} {resultado['total']:>9,d} ids  {us:10.0f} us")
+
+    version = iter(range(1, 1_000_000))
+    us = timeit(lambda: indice.guardar(_Producto(1, True, False), next(version), {"categoria": [5, 6]}))
+    print(f"    {'update one product':<32} {'':>13}  {us:10.0f} us")
+
+
+def main():
+    print("=" * 60)
+    print("FACET INDEX BENCHMARK")
+    print("=" * 60)
+    for productos in (5_000, 20_000, 100_000):
+        bench(productos)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the monthly sales partitions (MySQL)
+Runs the report-style sales queries with and without the partition filters,
+printing the partitions each one reads (EXPLAIN) and its median time.
+Run it once on an unpartitioned database and again after
+`python -m app.partitioning --habilitar` to compare.
+"""
+
+import statistics
+import sys
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+from sqlalchemy import select, func, and_
+
+# Add backend directory to path
+backend_dir = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from app import crud, partitioning
+from app.database import engine, SessionLocal
+from app.models import Venta, DetalleVenta, ClaveIdempotencia
+
+
+REPETICIONES = 5
+
+
+def consultas(db, desde: date, hasta: date):
+    id_min, id_max = crud.get_rango_ids_venta(db, desde, hasta)
+    lineas = select(DetalleVenta.id_producto, func.sum(DetalleVenta.cantidad)).join(
+        Venta, Venta.id_venta == DetalleVenta.id_venta
+    ).group_by(DetalleVenta.id_producto)
+    return {
+        "ventas del rango (sin filtro)": select(func.count()).select_from(Venta).where(
+            func.date(Venta.fecha_venta).between(desde, hasta)  # function on the key: no pruning
+        ),
+        "ventas del rango": select(func.count()).select_from(Venta).where(
+            Venta.fecha_venta.between(desde, hasta)
+        ),
+        "lineas por producto (solo fecha)": lineas.where(Venta.fecha_venta.between(desde, hasta)),
+        "lineas por producto (fecha + ids)": lineas.where(
+            Venta.fecha_venta.between(desde, hasta),
+            DetalleVenta.id_venta.between(id_min, id_max)
+        ),
+    }
+
+
+def consultas_venta(db):
+    """Single-sale reads (get_venta, get_venta_by_idempotency_key) on the latest
+    sale, with and without its partition key"""
+    ultima = db.query(Venta.id_venta, Venta.fecha_venta).order_by(Venta.id_venta.desc()).first()
+    if ultima is None:
+        return {}
+    id_venta, fecha_venta = ultima
+    resultado = {
+        "venta por id": select(Venta).where(Venta.id_venta == id_venta),
+        "venta por id + fecha": select(Venta).where(Venta.id_venta == id_venta, Venta.fecha_venta == fecha_venta),
+    }
+    clave = db.query(ClaveIdempotencia.clave).order_by(ClaveIdempotencia.id_venta.desc()).limit(1).scalar()
+    if clave is not None:
+        resultado["venta por clave (id + fecha)"] = select(Venta.id_venta).join(
+            ClaveIdempotencia, and_(
+                ClaveIdempotencia.id_venta == Venta.id_venta,
+                ClaveIdempotencia.fecha_venta == Venta.fecha_venta
+            )
+        ).where(ClaveIdempotencia.clave == clave)
+    return resultado
+
+
+def explicar(db, stmt):
+    """Partitions read per table according to EXPLAIN"""
+    sql = stmt.compile(engine, compile_kwargs={"literal_binds": True})
+    filas = db.connection().exec_driver_sql(f"EXPLAIN {sql}").mappings().all()
+    return "; ".join(f"{fila['table']}: {fila.get('partitions') or '-'}" for fila in filas)
+
+
+def medir(db, stmt):
+    tiempos = []
+    for _ in range(REPETICIONES):
+        inicio = time.perf_counter()
+        db.execute(stmt).all()
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    return statistics.median(tiempos)
+
+
+def main():
+    print("=" * 60)
+    print("PARTITION PRUNING BENCHMARK")
+    print("=" * 60)
+    if engine.dialect.name != "mysql":
+        print("This benchmark needs MySQL (partitioning is MySQL only)")
+        return
+
+    db = SessionLocal()
+    try:
+        with engine.connect() as conn:
+            total = {tabla: len(partitioning.particiones(conn, tabla)) for tabla in ("venta", "detalle_venta")}
+        print(f"Partitions: venta={total['venta']}, detalle_venta={total['detalle_venta']}")
+
+        hasta = date.today()
+        for dias in (7, 31, 90):
+            desde = hasta - timedelta(days=dias)
+            print(f"\nRange: last {dias} days")
+            for nombre, stmt in consultas(db, desde, hasta).items():
+                print(f"  {nombre:<36} {medir(db, stmt):8.1f} ms   {explicar(db, stmt)}")
+
+        print("\nSingle sale")
+        for nombre, stmt in consultas_venta(db).items():
+            print(f"  {nombre:<36} {medir(db, stmt):8.1f} ms   {explicar(db, stmt)}")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the promotion engine
+Compiles thousands of synthetic rules (no database needed) and times pricing
+50-line carts with and without promotions
+"""
+
+import random
+import sys
+import time
+from decimal import Decimal
+from pathlib import Path
+
+# Add backend directory to path
+backend_dir = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from app import schemas
+from app.pricing import calcular_carrito
+from app.promotions import MotorPromociones
+
+
+def timeit(fn, repeat=200):
+    """Best of `repeat` runs, in microseconds"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1_000_000
+
+
+class _Producto:
+    def __init__(self, id_producto, precio_venta):
+        self.id_producto = id_producto
+        self.nombre_comercial = f"Producto {id_producto}"
+        self.precio_venta = precio_venta
+        self.afecta_igv = id_producto % 5 != 0
+        self.requiere_receta = False
+        self.stock = 1_000
+
+
+def _reglas(rng, cantidad, productos, categorias, componentes):
+    reglas = []
+    for id_promocion in range(1, cantidad + 1):
+        alcance = rng.random()
+        regla = {"id_promocion": id_promocion, "nombre": f"Promo {id_promocion}"}
+        # Mostly product promotions, some for a whole category or component
+        if alcance < 0.8:
+            regla["id_producto"] = rng.randint(1, productos)
+        elif alcance < 0.9:
+            regla["id_categoria"] = rng.randint(1, categorias)
+        else:
+            regla["id_componente"] = rng.randint(1, componentes)
+        tipo = rng.choice(("porcentaje", "nxm", "pack"))
+        if tipo == "porcentaje":
+            regla["porcentaje"] = Decimal(rng.choice((5, 10, 15, 20)))
+        elif tipo == "nxm":
+            regla["lleva"], regla["paga"] = rng.choice(((2, 1), (3, 2), (4, 3)))
+        else:
+            regla["lleva"], regla["precio_pack"] = rng.choice(((2, Decimal("9.90")), (3, Decimal("14.90"))))
+        reglas.append(schemas.Promocion(tipo=tipo, **regla))
+    return reglas
+
+
+def bench(reglas, productos=20_000, categorias=200, componentes=1_000, lineas=50, seed=0):
+    rng = random.Random(seed)
+    catalogo = {
+        id_producto: _Producto(id_producto, Decimal(rng.randint(100, 5_000)) / 100)
+        for id_producto in range(1, productos + 1)
+    }
+    promociones = _reglas(rng, reglas, productos, categorias, componentes)
+    filas_categoria = [(id_producto, rng.randint(1, categorias)) for id_producto in catalogo for _ in range(2)]
+    filas_componente = [(id_producto, rng.randint(1, componentes)) for id_producto in catalogo for _ in range(3)]
+
+    motor = MotorPromociones()
+    start = time.perf_counter()
+    motor.compilar(promociones, filas_categoria, filas_componente, version=1)
+    build_ms = (time.perf_counter() - start) * 1000
+    print(f"  {reglas:>7,d} rules  compile {build_ms:8.1f} ms")
+
+    carritos = [
+        [
+            schemas.DetalleVentaItem(id_producto=id_producto, cantidad=rng.randint(1, 4))
+            for id_producto in rng.sample(range(1, productos + 1), lineas)
+        ]
+        for _ in range(20)
+    ]
+    for nombre, motor_carrito in (("without promotions", None), ("with promotions", motor)):
+        us = min(timeit(lambda: calcular_carrito(carrito, catalogo, motor_carrito), repeat=50) for carrito in carritos)
+        peor = max(timeit(lambda: calcular_carrito(carrito, catalogo, motor_carrito), repeat=50) for carrito in carritos)
+        print(f"    {lineas}-line cart {nombre:<20} best {us:8.0f} us  worst cart {peor:8.0f} us")
+
+    tiempos, tocadas, aplicadas = [], [], []
+    for carrito in carritos:
+        lineas_carrito = calcular_carrito(carrito, catalogo)["lineas"]
+        tiempos.append(timeit(lambda: motor.aplicar(lineas_carrito), repeat=50))
+        tocadas.append(sum(
+            sum(map(len, motor._por_producto.get(linea["id_producto"], ()))) for linea in lineas_carrito
+        ))
+        aplicadas.append(len(motor.aplicar(lineas_carrito)))
+    print(f"    engine only (aplicar)               best {min(tiempos):8.0f} us  worst cart {max(tiempos):8.0f} us  "
+          f"(~{sum(tocadas) // len(tocadas)} rules looked up, ~{sum(aplicadas) // len(aplicadas)} lines discounted)")
+
+
+def main():
+    print("=" * 60)
+    print("PROMOTION ENGINE BENCHMARK")
+    print("=" * 60)
+    for reglas in (1_000, 5_000, 20_000):
+        bench(reglas)
+
+
+if __name__ == "__main__":
+    main()
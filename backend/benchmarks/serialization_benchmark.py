@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the list endpoint serialization paths
+Compares FastAPI's default handling (validate ORM objects against the
+response_model, then encode with json) with the FastJSONResponse path
+(plain rows encoded by orjson) on synthetic products and sales
+"""
+
+import sys
+import time
+from datetime import date, time as dtime
+from decimal import Decimal
+from pathlib import Path
+from typing import List
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+
+# Add backend directory to path
+backend_dir = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from app import schemas
+from app.models import Producto, Venta
+from app.serialization import FastJSONResponse
+
+
+def timeit(fn, repeat=5):
+    """Best of `repeat` runs, in milliseconds"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def productos(n):
+    return [
+        {
+            "id_producto": i, "codigo_interno": f"P{i:06d}", "nombre_comercial": f"Producto {i}",
+            "precio_venta": Decimal(f"{i % 500}.{i % 100:02d}"), "afecta_igv": i % 2 == 0, "requiere_receta": False,
+        }
+        for i in range(n)
+    ]
+
+
+def ventas(n):
+    return [
+        {
+            "id_venta": i, "id_cliente": 10000 + i % 300, "id_usuario": 1005, "fecha_venta": date(2025, 1 + i % 12, 1 + i % 28),
+            "hora_venta": dtime(8 + i % 12, i % 60), "monto_total": Decimal(f"{i % 900}.{i % 100:02d}"),
+        }
+        for i in range(n)
+    ]
+
+
+def bench(nombre, model, schema, rows):
+    # Rows come from the DB in the schema's field order (serialization.columnas)
+    rows = [{campo: row[campo] for campo in schema.model_fields} for row in rows]
+    objetos = [model(**row) for row in rows]
+    adapter = TypeAdapter(List[schema])
+
+    def pydantic_path():
+        validated = adapter.validate_python(objetos, from_attributes=True)
+        return JSONResponse(jsonable_encoder(adapter.dump_python(validated, mode="json"))).body
+
+    def fast_path():
+        return FastJSONResponse(rows).body
+
+    assert pydantic_path() == fast_path()
+    lento, rapido = timeit(pydantic_path), timeit(fast_path)
+    print(f"  {nombre:<10} {len(rows):>7,d} rows   response_model {lento:8.1f} ms   FastJSONResponse {rapido:7.1f} ms"
+          f"   x{lento / rapido:.1f}")
+
+
+def main():
+    print("=" * 60)
+    print("SERIALIZATION BENCHMARK")
+    print("=" * 60)
+    for n in (1_000, 10_000, 100_000):
+        bench("productos", Producto, schemas.Producto, productos(n))
+        bench("ventas", Venta, schemas.Venta, ventas(n))
+
+
+if __name__ == "__main__":
+    main()
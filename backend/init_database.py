@@ -11,11 +11,29 @@ from pathlib import Path
 backend_dir = Path(__file__).parent
 sys.path.insert(0, str(backend_dir))
 
+from sqlalchemy import inspect
+
 from app.database import engine, SessionLocal
 from app.models import Base
+from app import partitioning
 from app.models import *
 
 
+def create_missing_indexes():
+    """create_all skips tables that already exist: add indexes declared since"""
+    inspector = inspect(engine)
+    creados = []
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existentes = {index["name"] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existentes:
+                index.create(bind=engine)
+                creados.append(index.name)
+    return creados
+
+
 def create_tables():
     """Create all database tables"""
     print("=" * 60)
@@ -27,6 +45,16 @@ def create_tables():
     Base.metadata.create_all(bind=engine)
     print("✓ All tables created successfully!")
 
+    for index_name in create_missing_indexes():
+        print(f"✓ Added index {index_name}")
+
+    if partitioning.VENTAS_PARTICIONADAS:
+        print("Partitioning venta and detalle_venta by month...")
+        if partitioning.habilitar(engine):
+            print("✓ Sales tables partitioned")
+        else:
+            print("⚠ Partitioning needs MySQL, tables left unpartitioned")
+
     print("\nCreated tables:")
     for table_name in sorted(Base.metadata.tables.keys()):
         print(f"  • {table_name}")
@@ -1220,6 +1248,18 @@ def populate_sample_data():
         db.commit()
         print(f"   ✓ {len(comprobantes_data)} receipts created")
 
+        # 29. SERIES COMPROBANTE (continue after the sample receipts)
+        print("29. Creating receipt numbering series...")
+        series_data = [
+            {"tipo_comprobante": "Boleta", "serie": "B001", "ultimo_numero": 1236},
+            {"tipo_comprobante": "Factura", "serie": "F001", "ultimo_numero": 1235}
+        ]
+        for data in series_data:
+            if not db.query(SerieComprobante).filter_by(tipo_comprobante=data["tipo_comprobante"]).first():
+                db.add(SerieComprobante(**data))
+        db.commit()
+        print(f"   ✓ {len(series_data)} receipt series created")
+
         print()
         print("=" * 60)
         print("✅ SAMPLE DATA POPULATED SUCCESSFULLY!")
@@ -29,15 +29,15 @@ def print_section(title):
     print(f"{Colors.BLUE}{'=' * 70}{Colors.END}\n")
 
 
-def test_endpoint(method, endpoint, data=None, expected_status=200, description=""):
+def test_endpoint(method, endpoint, data=None, expected_status=200, description="", headers=None):
     """Test an API endpoint"""
     url = f"{BASE_URL}{endpoint}"
     
     try:
         if method == "GET":
-            response = requests.get(url, timeout=5)
+            response = requests.get(url, headers=headers, timeout=5)
         elif method == "POST":
-            response = requests.post(url, json=data, timeout=5)
+            response = requests.post(url, json=data, headers=headers, timeout=5)
         elif method == "PUT":
             response = requests.put(url, json=data, timeout=5)
         elif method == "PATCH":
@@ -157,7 +157,27 @@ def run_tests():
     _, success = test_endpoint("GET", "/api/productos/search/?q=Paracetamol", 
                                description="Search products")
     results["passed" if success else "failed"] += 1
+
+    _, success = test_endpoint("GET", "/api/productos/facetas?requiere_receta=false",
+                               description="Product facets")
+    results["passed" if success else "failed"] += 1
+
+    _, success = test_endpoint("GET", "/api/productos/4001/precio",
+                               description="Current price of product #4001")
+    results["passed" if success else "failed"] += 1
+
+    resp, success = test_endpoint("GET", "/api/scan/P-005", description="Scan by codigo_interno")
+    if success:
+        success = resp.json()["id_producto"] == 4005
+    results["passed" if success else "failed"] += 1
     
+    # Revalidate a product with its ETag
+    resp, success = test_endpoint("GET", "/api/productos/4001", description="Product with ETag")
+    if success and resp.headers.get("ETag"):
+        _, success = test_endpoint("GET", "/api/productos/4001", expected_status=304,
+                                   description="Not modified", headers={"If-None-Match": resp.headers["ETag"]})
+    results["passed" if success else "failed"] += 1
+
     # Test supplier contacts
     _, success = test_endpoint("GET", "/api/proveedores/2001/contactos/", 
                                description="Supplier contacts")
@@ -248,6 +268,93 @@ def run_tests():
                                  "Create product with relationships")
     results["passed" if success else "failed"] += 1
     
+    # A repricing changes several products under one catalog version; paging
+    # the sync feed with a smaller limit must still return all of them
+    resp, success = test_endpoint("GET", "/api/sync?since=0", description="Catalog snapshot")
+    if success:
+        since = resp.json()["version"]
+        productos = {p["id_producto"]: p["precio_venta"] for p in resp.json()["cambios"]["producto"]}
+        precios = [{"id_producto": i, "precio_venta": productos[i]} for i in (4001, 4002, 4003)]
+        _, success = test_endpoint("POST", "/api/productos/precios", {"precios": precios}, 200,
+                                   "Reprice three products")
+    sincronizados = set()
+    while success:
+        resp, success = test_endpoint("GET", f"/api/sync?since={since}&limit=1", description="Sync page")
+        if success:
+            sincronizados.update(p["id_producto"] for p in resp.json()["cambios"]["producto"])
+            since = resp.json()["version"]
+            if resp.json()["completo"]:
+                break
+    if success:
+        success = {4001, 4002, 4003} <= sincronizados
+    results["passed" if success else "failed"] += 1
+
+    # Price the cart on the server (prices, IGV and stock)
+    carrito = {"detalles": [{"id_producto": 4005, "cantidad": 1}]}
+    resp, success = test_endpoint("POST", "/api/ventas/cotizar", carrito, 200, "Price a cart")
+    if success:
+        success = resp.json()["valido"]
+    results["passed" if success else "failed"] += 1
+
+    # Hold the cart's stock, then release it
+    resp, success = test_endpoint("PUT", "/api/reservas/test-api", carrito, 200, "Reserve cart stock")
+    if success:
+        success = resp.json()["expira"] is not None
+        test_endpoint("DELETE", "/api/reservas/test-api", None, 200, "Release reservation")
+    results["passed" if success else "failed"] += 1
+
+    # A promotion on the product is applied when pricing the cart
+    promocion = {"nombre": "Test 10%", "tipo": "porcentaje", "id_producto": 4005, "porcentaje": "10"}
+    resp, success = test_endpoint("POST", "/api/promociones/", promocion, 201, "Create promotion")
+    if success:
+        id_promocion = resp.json()["id_promocion"]
+        resp, success = test_endpoint("POST", "/api/ventas/cotizar", carrito, 200, "Price a cart with promotion")
+        if success:
+            success = resp.json()["lineas"][0]["id_promocion"] == id_promocion
+        test_endpoint("DELETE", f"/api/promociones/{id_promocion}", None, 200, "Delete promotion")
+    results["passed" if success else "failed"] += 1
+
+    # Create a sale twice with the same Idempotency-Key
+    ts = str(int(datetime.now().timestamp()))[-6:]
+    new_venta = {
+        "id_cliente": 10009,
+        "detalles": [{"id_producto": 4005, "cantidad": 1}],
+        "id_metodo_pago": 800001,
+        "tipo_comprobante": "Boleta",
+        "nro_comprobante": f"B999-{ts}"
+    }
+    headers = {"Idempotency-Key": f"test-venta-{ts}"}
+    first, success = test_endpoint("POST", "/api/ventas/", new_venta, 201,
+                                   "Create sale with Idempotency-Key", headers)
+    results["passed" if success else "failed"] += 1
+    replay, success = test_endpoint("POST", "/api/ventas/", new_venta, 201,
+                                    "Replay sale with same key", headers)
+    if success and first is not None:
+        success = replay.json()["id_venta"] == first.json()["id_venta"]
+    results["passed" if success else "failed"] += 1
+    
+    # Numbers in a server-numbered series cannot be supplied by the client
+    _, success = test_endpoint("POST", "/api/ventas/", {**new_venta, "nro_comprobante": "B001-999999"}, 400,
+                               "Reject receipt number from an allocated series")
+    results["passed" if success else "failed"] += 1
+    
+    # Batch keys longer than the idempotency_key column are rejected up front
+    lote = {"ventas": [{**new_venta, "nro_comprobante": None, "idempotency_key": "k" * 65,
+                        "detalles": [{"id_producto": 4005, "cantidad": 1, "precio_unitario_venta": "10.50"}]}]}
+    _, success = test_endpoint("POST", "/api/ventas/batch", lote, 422, "Reject over-long batch key")
+    results["passed" if success else "failed"] += 1
+    
+    # Offline sales already happened: one over the current stock is still stored
+    producto, success = test_endpoint("GET", "/api/productos/4005", None, 200, "Get price for batch sale")
+    if success:
+        detalle = {"id_producto": 4005, "cantidad": 100000, "precio_unitario_venta": producto.json()["precio_venta"]}
+        lote = {"ventas": [{**new_venta, "nro_comprobante": f"B998-{ts}", "detalles": [detalle]}]}
+        respuesta, success = test_endpoint("POST", "/api/ventas/batch", lote, 200, "Store batch sale over stock")
+        if success:
+            resultado = respuesta.json()["resultados"][0]
+            success = resultado["id_venta"] is not None and resultado["advertencia"] is not None
+    results["passed" if success else "failed"] += 1
+    
     # Print results
     print_section("RESULTS SUMMARY")
     
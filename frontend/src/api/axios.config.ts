@@ -7,6 +7,9 @@ const api = axios.create({
 		'Content-Type': 'application/json',
 	},
 	timeout: 10000, // 10 seconds
+	// Send the API's cookies cross-origin (db_primario keeps reads on the
+	// primary database right after a write)
+	withCredentials: true,
 });
 
 // Request interceptor (for future auth tokens)
@@ -1,9 +1,13 @@
 import api from '../axios.config';
-import type { Compra } from '@/types';
+import type { Compra, ListaFiltros, ResumenEstadoCompra } from '@/types';
 
 export const comprasService = {
 	// Get all compras
-	getAll: () => api.get<Compra[]>('/compras/'),
+	getAll: (filtros: ListaFiltros = {}) => api.get<Compra[]>('/compras/', { params: filtros }),
+
+	// Purchase count and amount per status
+	getResumen: (filtros: ListaFiltros = {}) =>
+		api.get<ResumenEstadoCompra[]>('/compras/resumen', { params: filtros }),
 
 	// Get compra by ID
 	getById: (id: number) => api.get<Compra>(`/compras/${id}`),
@@ -1,9 +1,13 @@
 import api from '../axios.config';
-import type { Pedido, EstadoPedido, MotivoPedido } from '@/types';
+import type { Pedido, EstadoPedido, MotivoPedido, ListaFiltros, ResumenEstadoPedido } from '@/types';
 
 export const pedidosService = {
 	// Get all pedidos
-	getAll: () => api.get<Pedido[]>('/pedidos/'),
+	getAll: (filtros: ListaFiltros = {}) => api.get<Pedido[]>('/pedidos/', { params: filtros }),
+
+	// Order count per status
+	getResumen: (filtros: ListaFiltros = {}) =>
+		api.get<ResumenEstadoPedido[]>('/pedidos/resumen', { params: filtros }),
 
 	// Get pedido by ID
 	getById: (id: number) => api.get<Pedido>(`/pedidos/${id}`),
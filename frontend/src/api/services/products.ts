@@ -1,7 +1,9 @@
 import api from '../axios.config';
 import type {
 	Producto,
+	ProductoCompleto,
 	ProductoCreate,
+	ProductoUpdate,
 	Categoria,
 	Presentacion,
 	Componente,
@@ -11,14 +13,16 @@ export const productsService = {
 	// Products
 	getAll: () => api.get<Producto[]>('/productos/'),
 
-	getById: (id: number) => api.get<Producto>(`/productos/${id}`),
+	getById: (id: number) => api.get<ProductoCompleto>(`/productos/${id}`),
+
+	getAllDetalle: () => api.get<ProductoCompleto[]>('/productos/detalle'),
 
 	search: (query: string) =>
 		api.get<Producto[]>(`/productos/search/?q=${query}`),
 
 	create: (data: ProductoCreate) => api.post<Producto>('/productos/', data),
 
-	update: (id: number, data: Partial<ProductoCreate>) =>
+	update: (id: number, data: ProductoUpdate) =>
 		api.put<Producto>(`/productos/${id}`, data),
 
 	delete: (id: number) => api.delete(`/productos/${id}`),
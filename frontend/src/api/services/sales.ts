@@ -1,12 +1,29 @@
 import api from '../axios.config';
-import type { Venta, MetodoPago } from '@/types';
+import type { Venta, VentaCreate, VentaDetalle, MetodoPago, DetalleVentaItem, Carrito } from '@/types';
 
 export const salesService = {
 	// Sales
 	getAll: (skip = 0, limit = 100) =>
 		api.get<Venta[]>('/ventas/', { params: { skip, limit } }),
 
-	getById: (id: number) => api.get<Venta>(`/ventas/${id}`),
+	// fecha (the sale date) lets a partitioned venta table read one partition
+	getById: (id: number, fecha?: string) =>
+		api.get<VentaDetalle>(`/ventas/${id}`, { params: { fecha } }),
+
+	create: (data: VentaCreate) => api.post<Venta>('/ventas/', data),
+
+	// Server-side prices, IGV and stock for the cart being built
+	cotizar: (detalles: DetalleVentaItem[]) => api.post<Carrito>('/ventas/cotizar', { detalles }),
+
+	// Hold the cart's stock (replacing previous holds) and price it
+	reservar: (idCarrito: string, detalles: DetalleVentaItem[]) =>
+		api.put<Carrito>(`/reservas/${idCarrito}`, { detalles, id_carrito: idCarrito }),
+
+	liberar: (idCarrito: string) => api.delete(`/reservas/${idCarrito}`),
+
+	// Several full sales at once (receipt printing)
+	getDetalles: (ids: number[], desde?: string, hasta?: string) =>
+		api.get<VentaDetalle[]>('/ventas/detalle', { params: { ids: ids.join(','), desde, hasta } }),
 
 	// Payment methods
 	getPaymentMethods: () => api.get<MetodoPago[]>('/metodos-pago/'),
@@ -4,13 +4,14 @@ import { Package, Plus, Eye, Edit, FileText } from 'lucide-react';
 import toast from 'react-hot-toast';
 
 import { comprasService } from '@/api/services';
-import type { Compra } from '@/types';
+import type { Compra, ResumenEstadoCompra } from '@/types';
 import { Card, Table, Button, Spinner, Badge, SearchBar } from '@/components/common';
 
 const ComprasList = () => {
 	const navigate = useNavigate();
 	const [compras, setCompras] = useState<Compra[]>([]);
 	const [filteredCompras, setFilteredCompras] = useState<Compra[]>([]);
+	const [resumen, setResumen] = useState<ResumenEstadoCompra[]>([]);
 	const [loading, setLoading] = useState(true);
 	const [searchQuery, setSearchQuery] = useState('');
 	const [filterStatus, setFilterStatus] = useState<'all' | string>('all');
@@ -19,9 +20,13 @@ const ComprasList = () => {
 	const fetchCompras = async () => {
 		try {
 			setLoading(true);
-			const response = await comprasService.getAll();
+			const [response, resumenResponse] = await Promise.all([
+				comprasService.getAll(),
+				comprasService.getResumen(),
+			]);
 			setCompras(response.data);
 			setFilteredCompras(response.data);
+			setResumen(resumenResponse.data);
 		} catch (error) {
 			toast.error('Error al cargar compras');
 			console.error('Error fetching compras:', error);
@@ -89,12 +94,14 @@ const ComprasList = () => {
 		}).format(numAmount);
 	};
 
-	// Calculate statistics
+	// Statistics (counted by the server over every purchase)
+	const contar = (estado: string) =>
+		resumen.find(r => r.estado.toLowerCase() === estado)?.cantidad ?? 0;
 	const stats = {
-		total: compras.length,
-		pagadas: compras.filter(c => c.estado.toLowerCase() === 'pagado').length,
-		pendientes: compras.filter(c => c.estado.toLowerCase() === 'pendiente').length,
-		totalMonto: compras.reduce((sum, c) => sum + parseFloat(c.monto_total.toString()), 0),
+		total: resumen.reduce((total, r) => total + r.cantidad, 0),
+		pagadas: contar('pagado'),
+		pendientes: contar('pendiente'),
+		totalMonto: resumen.reduce((sum, r) => sum + parseFloat(r.monto_total.toString()), 0),
 	};
 
 	// Table columns
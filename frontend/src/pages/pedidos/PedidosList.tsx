@@ -4,13 +4,14 @@ import { Package, Plus, Eye, Edit } from 'lucide-react';
 import toast from 'react-hot-toast';
 
 import { pedidosService } from '@/api/services';
-import type { Pedido } from '@/types';
+import type { Pedido, ResumenEstadoPedido } from '@/types';
 import { Card, Table, Button, Spinner, Badge, SearchBar } from '@/components/common';
 
 const PedidosList = () => {
 	const navigate = useNavigate();
 	const [pedidos, setPedidos] = useState<Pedido[]>([]);
 	const [filteredPedidos, setFilteredPedidos] = useState<Pedido[]>([]);
+	const [resumen, setResumen] = useState<ResumenEstadoPedido[]>([]);
 	const [loading, setLoading] = useState(true);
 	const [searchQuery, setSearchQuery] = useState('');
 	const [filterStatus, setFilterStatus] = useState<'all' | number>('all');
@@ -19,9 +20,13 @@ const PedidosList = () => {
 	const fetchPedidos = async () => {
 		try {
 			setLoading(true);
-			const response = await pedidosService.getAll();
+			const [response, resumenResponse] = await Promise.all([
+				pedidosService.getAll(),
+				pedidosService.getResumen(),
+			]);
 			setPedidos(response.data);
 			setFilteredPedidos(response.data);
+			setResumen(resumenResponse.data);
 		} catch (error) {
 			toast.error('Error al cargar pedidos');
 			console.error('Error fetching pedidos:', error);
@@ -79,12 +84,14 @@ const PedidosList = () => {
 		});
 	};
 
-	// Calculate statistics
+	// Statistics (counted by the server over every order)
+	const contar = (estadoId: number) =>
+		resumen.find(r => r.id_estado_pedido === estadoId)?.cantidad ?? 0;
 	const stats = {
-		total: pedidos.length,
-		entregados: pedidos.filter(p => p.id_estado_pedido === 60001).length,
-		enProceso: pedidos.filter(p => p.id_estado_pedido === 60002).length,
-		cancelados: pedidos.filter(p => p.id_estado_pedido === 60003).length,
+		total: resumen.reduce((total, r) => total + r.cantidad, 0),
+		entregados: contar(60001),
+		enProceso: contar(60002),
+		cancelados: contar(60003),
 	};
 
 	// Table columns
@@ -7,7 +7,7 @@ import toast from 'react-hot-toast';
 import { ArrowLeft, Plus, Trash2 } from 'lucide-react';
 
 import { productsService } from '@/api/services';
-import type { Producto, Categoria, Presentacion, Componente } from '@/types';
+import type { ProductoCompleto, Categoria, Presentacion, Componente } from '@/types';
 import { Button, Card, Input, Spinner, Modal } from '@/components/common';
 
 // Validation schema
@@ -95,7 +95,7 @@ const ProductForm = () => {
 			try {
 				setInitialLoading(true);
 				const response = await productsService.getById(Number(id));
-				const product: Producto = response.data;
+				const product: ProductoCompleto = response.data;
 
 				// Set form values
 				setValue('codigo_interno', product.codigo_interno);
@@ -109,8 +109,9 @@ const ProductForm = () => {
 				setValue('afecta_igv', product.afecta_igv);
 				setValue('requiere_receta', product.requiere_receta);
 
-				// TODO: Load related data (categorias, presentaciones, componentes)
-				// This would require additional API calls to get the relationships
+				setSelectedCategorias(product.categorias.map(c => c.id_categoria));
+				setSelectedPresentaciones(product.presentaciones.map(p => p.id_presentacion));
+				setSelectedComponentes(product.componentes.map(c => c.id_componente));
 			} catch (error) {
 				toast.error('Error al cargar producto');
 				console.error('Error loading product:', error);
@@ -1,5 +1,5 @@
 import { useEffect, useState } from 'react';
-import { useNavigate, useParams } from 'react-router-dom';
+import { useNavigate, useParams, useSearchParams } from 'react-router-dom';
 import {
 	ArrowLeft,
 	ShoppingCart,
@@ -16,20 +16,15 @@ import toast from 'react-hot-toast';
 
 import { salesService } from '@/api/services';
 import { Card, Button, Spinner, Badge } from '@/components/common';
-
-interface SaleDetails {
-	id_venta: number;
-	id_cliente: number;
-	id_usuario: number;
-	fecha_venta: string;
-	hora_venta: string;
-	monto_total: number | string;
-}
+import type { VentaDetalle } from '@/types';
 
 const SaleDetails = () => {
 	const navigate = useNavigate();
 	const { id } = useParams<{ id: string }>();
-	const [venta, setVenta] = useState<SaleDetails | null>(null);
+	// Sale date from the history list; lets the backend read a single partition
+	const [searchParams] = useSearchParams();
+	const fecha = searchParams.get('fecha') ?? undefined;
+	const [venta, setVenta] = useState<VentaDetalle | null>(null);
 	const [loading, setLoading] = useState(true);
 	const [showDeleteConfirm, setShowDeleteConfirm] = useState(false);
 	const [deleting, setDeleting] = useState(false);
@@ -41,7 +36,7 @@ const SaleDetails = () => {
 
 			try {
 				setLoading(true);
-				const response = await salesService.getById(Number(id));
+				const response = await salesService.getById(Number(id), fecha);
 				setVenta(response.data);
 			} catch (error) {
 				toast.error('Error al cargar detalles de la venta');
@@ -53,7 +48,7 @@ const SaleDetails = () => {
 		};
 
 		void fetchVenta();
-	}, [id, navigate]);
+	}, [id, fecha, navigate]);
 
 	// Handle delete
 	const handleDelete = async () => {
@@ -233,8 +228,15 @@ const SaleDetails = () => {
 										onClick={() => navigate(`/customers/edit/${venta.id_cliente}`)}
 										className="font-semibold text-primary-600 hover:text-primary-800"
 									>
-										Ver Cliente #{venta.id_cliente}
+										{venta.cliente
+											? `${venta.cliente.nombres} ${venta.cliente.apellido_paterno}`
+											: `Ver Cliente #${venta.id_cliente}`}
 									</button>
+									{venta.cliente && (
+										<p className="text-sm text-gray-600">
+											{venta.cliente.tipo_doc} {venta.cliente.nro_doc}
+										</p>
+									)}
 								</div>
 							</div>
 
@@ -260,42 +262,69 @@ const SaleDetails = () => {
 						</div>
 					</Card>
 
-					{/* Products Sold - Note */}
+					{/* Products Sold */}
 					<Card title="Productos Vendidos">
-						<div className="bg-blue-50 border border-blue-200 rounded-lg p-6">
+						{venta.detalles.length === 0 ? (
+							<div className="flex items-center gap-3 text-gray-600">
+								<Package size={20} />
+								<p>Sin productos registrados</p>
+							</div>
+						) : (
+							<div className="overflow-x-auto">
+								<table className="w-full text-sm">
+									<thead>
+										<tr className="border-b border-gray-200 text-left text-gray-600">
+											<th className="py-2">Producto</th>
+											<th className="py-2 text-right">Cantidad</th>
+											<th className="py-2 text-right">Precio Unit.</th>
+											<th className="py-2 text-right">Subtotal</th>
+										</tr>
+									</thead>
+									<tbody>
+										{venta.detalles.map((detalle) => (
+											<tr key={detalle.id_producto} className="border-b border-gray-100">
+												<td className="py-2 font-medium text-gray-800">
+													{detalle.nombre_comercial}
+												</td>
+												<td className="py-2 text-right">{detalle.cantidad}</td>
+												<td className="py-2 text-right">
+													{formatCurrency(detalle.precio_unitario_venta)}
+												</td>
+												<td className="py-2 text-right font-semibold">
+													{formatCurrency(detalle.subtotal)}
+												</td>
+											</tr>
+										))}
+									</tbody>
+								</table>
+							</div>
+						)}
+					</Card>
+
+					{/* Payment Information */}
+					<Card title="Información de Pago">
+						<div className="grid grid-cols-1 md:grid-cols-2 gap-4">
 							<div className="flex items-start gap-3">
-								<Package className="text-blue-600 mt-1" size={24} />
+								<CreditCard className="text-primary-600 mt-1" size={20} />
 								<div>
-									<p className="font-medium text-blue-900 mb-2">
-										Detalles de productos disponibles en el backend
-									</p>
-									<p className="text-sm text-blue-800">
-										El backend tiene la información detallada de los productos vendidos
-										en la tabla <code className="bg-blue-100 px-1 rounded">detalle_venta</code>.
-										Puedes consultar directamente la base de datos o actualizar el frontend
-										para mostrar estos detalles.
+									<p className="text-sm text-gray-600">Método de Pago</p>
+									<p className="font-semibold text-gray-800">
+										{venta.pago ? venta.pago.metodo_pago : 'Sin pago registrado'}
 									</p>
+									{venta.pago && (
+										<p className="text-sm text-gray-600">{formatCurrency(venta.pago.monto)}</p>
+									)}
 								</div>
 							</div>
-						</div>
-					</Card>
 
-					{/* Payment Information - Note */}
-					<Card title="Información de Pago">
-						<div className="bg-green-50 border border-green-200 rounded-lg p-6">
 							<div className="flex items-start gap-3">
-								<FileText className="text-green-600 mt-1" size={24} />
+								<FileText className="text-primary-600 mt-1" size={20} />
 								<div>
-									<p className="font-medium text-green-900 mb-2">
-										Comprobante y método de pago
-									</p>
-									<p className="text-sm text-green-800">
-										El backend almacena el comprobante en la tabla{' '}
-										<code className="bg-green-100 px-1 rounded">comprobante</code> y el
-										método de pago en la tabla{' '}
-										<code className="bg-green-100 px-1 rounded">pago</code>. Esta
-										información puede ser consultada para mostrar los detalles completos
-										del pago.
+									<p className="text-sm text-gray-600">Comprobante</p>
+									<p className="font-semibold text-gray-800">
+										{venta.comprobante
+											? `${venta.comprobante.tipo_comprobante} ${venta.comprobante.nro_comprobante}`
+											: 'Sin comprobante'}
 									</p>
 								</div>
 							</div>
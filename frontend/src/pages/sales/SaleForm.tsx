@@ -6,7 +6,7 @@ import { z } from 'zod';
 
 import { salesService, customersService, productsService } from '@/api/services';
 import { Card, Button, Input, Select } from '@/components/common';
-import type { Customer, Product } from '@/types';
+import type { Customer, Product, Carrito } from '@/types';
 
 const saleFormSchema = z.object({
 	id_cliente: z.number().min(1, 'Cliente es requerido'),
@@ -55,6 +55,9 @@ const SaleForm = () => {
 	});
 
 	const [errors, setErrors] = useState<Partial<Record<keyof SaleFormData, string>>>({});
+	const [carrito, setCarrito] = useState<Carrito | null>(null);
+	// Stock reservations of this form are held under this id until the sale converts them
+	const [idCarrito] = useState(() => crypto.randomUUID());
 
 	// Load customers and products
 	useEffect(() => {
@@ -140,7 +143,36 @@ const SaleForm = () => {
 		);
 	};
 
-	// Calculate total
+	// Hold the cart's stock and price it on the server (IGV, stock) whenever it changes
+	useEffect(() => {
+		if (productItems.length === 0) {
+			setCarrito(null);
+			salesService.liberar(idCarrito).catch(() => undefined);
+			return;
+		}
+		let cancelled = false;
+		salesService
+			.reservar(idCarrito, productItems.map(({ id_producto, cantidad }) => ({ id_producto, cantidad })))
+			.then(response => {
+				if (!cancelled) setCarrito(response.data);
+			})
+			.catch(error => console.error('Error pricing cart:', error));
+		return () => {
+			cancelled = true;
+		};
+	}, [productItems, idCarrito]);
+
+	// Release the holds when leaving the form without selling
+	useEffect(() => {
+		return () => {
+			salesService.liberar(idCarrito).catch(() => undefined);
+		};
+	}, [idCarrito]);
+
+	const lineError = (id_producto: number) =>
+		carrito?.lineas.find(linea => linea.id_producto === id_producto)?.error;
+
+	// Calculate total (until the server's pricing arrives)
 	const calculateTotal = () => {
 		return productItems.reduce(
 			(sum, item) => sum + item.cantidad * item.precio_unitario_venta,
@@ -166,12 +198,17 @@ const SaleForm = () => {
 			};
 
 			// Validate
-			saleFormSchema.parse(submitData);
+			const venta = saleFormSchema.parse(submitData);
 			setErrors({});
 
+			if (carrito && !carrito.valido) {
+				toast.error('Revisa los productos marcados antes de registrar la venta');
+				return;
+			}
+
 			setSubmitting(true);
 
-			const response = await salesService.create(submitData);
+			const response = await salesService.create({ ...venta, id_carrito: idCarrito });
 
 			toast.success('Venta registrada exitosamente');
 			navigate(`/sales/${response.data.id_venta}`);
@@ -375,6 +412,11 @@ const SaleForm = () => {
 												<p className="text-sm text-gray-600">
 													S/ {item.precio_unitario_venta.toFixed(2)} c/u
 												</p>
+												{lineError(item.id_producto) && (
+													<p className="text-sm text-red-600">
+														{lineError(item.id_producto)}
+													</p>
+												)}
 											</div>
 											<div className="flex items-center gap-4">
 												<div className="flex items-center gap-2">
@@ -428,13 +470,36 @@ const SaleForm = () => {
 										{productItems.reduce((sum, item) => sum + item.cantidad, 0)}
 									</span>
 								</div>
+								{carrito && (
+									<>
+										<div className="flex justify-between text-sm">
+											<span className="text-gray-600">Subtotal:</span>
+											<span className="font-medium">S/ {carrito.subtotal}</span>
+										</div>
+										{carrito.promociones.map((promocion) => (
+											<div key={promocion.id_promocion} className="flex justify-between text-sm">
+												<span className="text-gray-600">{promocion.nombre}:</span>
+												<span className="font-medium text-green-600">- S/ {promocion.descuento}</span>
+											</div>
+										))}
+										<div className="flex justify-between text-sm">
+											<span className="text-gray-600">IGV (incluido):</span>
+											<span className="font-medium">S/ {carrito.igv}</span>
+										</div>
+									</>
+								)}
 								<div className="pt-3 border-t border-gray-200">
 									<div className="flex justify-between">
 										<span className="font-medium text-gray-800">Total:</span>
 										<span className="text-2xl font-bold text-green-600">
-											S/ {calculateTotal().toFixed(2)}
+											S/ {carrito ? carrito.total : calculateTotal().toFixed(2)}
 										</span>
 									</div>
+									{carrito?.requiere_receta && (
+										<p className="mt-2 text-sm text-amber-600">
+											Incluye productos que requieren receta médica
+										</p>
+									)}
 								</div>
 							</div>
 						</Card>
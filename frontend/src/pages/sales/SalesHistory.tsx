@@ -135,7 +135,7 @@ const SalesHistory = () => {
 					<button
 						onClick={e => {
 							e.stopPropagation();
-							navigate(`/sales/${row.id_venta}`);
+							navigate(`/sales/${row.id_venta}?fecha=${row.fecha_venta}`);
 						}}
 						className="text-primary-600 hover:text-primary-800"
 						title="Ver detalles"
@@ -299,7 +299,7 @@ const SalesHistory = () => {
 				<Table
 					data={filteredVentas}
 					columns={columns}
-					onRowClick={row => navigate(`/sales/${row.id_venta}`)}
+					onRowClick={row => navigate(`/sales/${row.id_venta}?fecha=${row.fecha_venta}`)}
 					emptyMessage="No se encontraron ventas"
 				/>
 			</Card>
@@ -102,6 +102,12 @@ export interface Producto {
 	requiere_receta: boolean;
 }
 
+export interface ProductoCompleto extends Producto {
+	categorias: Categoria[];
+	presentaciones: Presentacion[];
+	componentes: Componente[];
+}
+
 export interface ProductoCreate {
 	codigo_interno: string;
 	nombre_comercial: string;
@@ -119,6 +125,9 @@ export interface ProductoUpdate {
 	precio_venta?: number;
 	afecta_igv?: boolean;
 	requiere_receta?: boolean;
+	categorias?: number[];
+	presentaciones?: number[];
+	componentes?: number[];
 }
 
 // ==================== INVENTARIO ====================
@@ -200,6 +209,28 @@ export interface Compra {
 	fecha_pago?: string;
 }
 
+// Grouped counts from /pedidos/resumen and /compras/resumen
+export interface ResumenEstadoPedido {
+	id_estado_pedido: number;
+	estado: string;
+	cantidad: number;
+}
+
+export interface ResumenEstadoCompra {
+	estado: string;
+	cantidad: number;
+	monto_total: number | string;
+}
+
+// Server-side list filters
+export interface ListaFiltros {
+	estado?: number | string;
+	proveedor?: number;
+	desde?: string;
+	hasta?: string;
+	q?: string;
+}
+
 export interface CompraCreate {
 	id_pedido: number;
 	fecha_recepcion: string;
@@ -220,7 +251,7 @@ export interface MetodoPago {
 export interface DetalleVentaItem {
 	id_producto: number;
 	cantidad: number;
-	precio_unitario_venta: number;
+	precio_unitario_venta?: number; // Priced by the server; if sent it must match
 }
 
 export interface Venta {
@@ -238,6 +269,42 @@ export interface VentaCreate {
 	id_metodo_pago: number;
 	tipo_comprobante: string;
 	nro_comprobante: string;
+	id_carrito?: string;
+}
+
+// Cart priced by the server (POST /ventas/cotizar); amounts are decimal strings
+export interface LineaCarrito {
+	id_producto: number;
+	nombre_comercial: string | null;
+	cantidad: number;
+	precio_unitario_venta: string | null;
+	subtotal: string;
+	descuento: string;
+	id_promocion: number | null;
+	igv: string;
+	total: string;
+	afecta_igv: boolean;
+	requiere_receta: boolean;
+	stock_disponible: number;
+	error: string | null;
+}
+
+export interface PromocionAplicada {
+	id_promocion: number;
+	nombre: string;
+	descuento: string;
+}
+
+export interface Carrito {
+	lineas: LineaCarrito[];
+	subtotal: string;
+	descuento: string;
+	promociones: PromocionAplicada[];
+	igv: string;
+	total: string;
+	requiere_receta: boolean;
+	valido: boolean;
+	expira?: string | null;
 }
 
 export interface Comprobante {
@@ -247,6 +314,36 @@ export interface Comprobante {
 	nro_comprobante: string;
 }
 
+export interface DetalleVentaInfo {
+	id_producto: number;
+	nombre_comercial: string;
+	cantidad: number;
+	precio_unitario_venta: number | string;
+	subtotal: number | string;
+}
+
+export interface VentaDetalle extends Omit<Venta, 'monto_total'> {
+	monto_total: number | string;
+	cliente: {
+		nro_doc: string;
+		tipo_doc: string;
+		nombres: string;
+		apellido_paterno: string;
+		apellido_materno?: string | null;
+	} | null;
+	detalles: DetalleVentaInfo[];
+	pago: {
+		id_metodo_pago: number;
+		metodo_pago: string;
+		fecha_hora: string;
+		monto: number | string;
+	} | null;
+	comprobante: {
+		tipo_comprobante: string;
+		nro_comprobante: string;
+	} | null;
+}
+
 // ==================== UTILITY TYPES ====================
 
 // For pagination